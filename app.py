@@ -3,7 +3,10 @@ import logging
 from flask import Flask, render_template, request, send_file, jsonify
 from werkzeug.utils import secure_filename
 from dotenv import load_dotenv
-from src.ai_engine import AIEngine
+from src.engine_registry import get_engine
+from src.scheduler import PRIORITY_INTERACTIVE, priority_context
+from src.tracing import configure_tracing_from_env, span
+from src.uploads import DEFAULT_CHUNK_SIZE, InvalidUpload, UploadTooLarge, require_image, save_stream
 import uuid
 from pathlib import Path
 
@@ -17,8 +20,12 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# 請求追蹤（TRACING_EXPORTER，預設停用）
+configure_tracing_from_env(service_name="comic-translator-web")
+
 app = Flask(__name__)
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 限制 16MB
+app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 限制 16MB（依 Content-Length 在讀取內容前就拒絕）
+app.config['MAX_FILE_SIZE'] = 15 * 1024 * 1024  # 單一檔案上限（扣除表單欄位的空間）
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['OUTPUT_FOLDER'] = 'outputs'
 
@@ -33,6 +40,11 @@ ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'webp'}
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+@app.errorhandler(413)
+def request_entity_too_large(e):
+    limit_mb = app.config['MAX_CONTENT_LENGTH'] / 1024 / 1024
+    return jsonify({'error': f'檔案過大，最大限制: {limit_mb:.0f}MB'}), 413
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -54,23 +66,37 @@ def upload_file():
     if not allowed_file(file.filename):
         return jsonify({'error': '不支援的檔案格式，請使用 PNG, JPG, JPEG 或 WebP'}), 400
 
+    input_path = None
     try:
         # 生成唯一的檔案名稱
         file_ext = file.filename.rsplit('.', 1)[1].lower()
         unique_filename = f"{uuid.uuid4().hex}.{file_ext}"
 
-        # 儲存上傳的檔案
+        # 分塊串流儲存上傳的檔案，第一個區塊就驗證檔頭，超過上限立即中止
         input_path = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
-        file.save(input_path)
+        try:
+            save_stream(
+                file.stream,
+                input_path,
+                app.config['MAX_FILE_SIZE'],
+                chunk_size=DEFAULT_CHUNK_SIZE,
+                validate=require_image
+            )
+        except UploadTooLarge as e:
+            return jsonify({'error': str(e)}), 413
+        except InvalidUpload as e:
+            return jsonify({'error': str(e)}), 400
+
+        # 取得共用的 AI 引擎（連線池跨請求重用，設定檔或金鑰變更時才重建）並處理圖片
+        logger.info(f"開始處理圖片: {unique_filename}")
+        ai_engine = get_engine()
 
-        # 輸出檔案路徑（固定為 jpg）
-        output_filename = f"{uuid.uuid4().hex}.jpg"
+        # 輸出檔案路徑（副檔名依輸出格式設定，預設 jpg）
+        output_filename = f"{uuid.uuid4().hex}{ai_engine.output_extension}"
         output_path = os.path.join(app.config['OUTPUT_FOLDER'], output_filename)
-
-        # 初始化 AI 引擎並處理圖片
-        logger.info(f"開始處理圖片: {unique_filename}")
-        ai_engine = AIEngine()
-        success = ai_engine.process_image(input_path, output_path)
+        # 使用者正在等結果：以互動優先等級取得配額，同機的 CLI 批次會保留額度給此請求
+        with span("HTTP POST /upload", upload=unique_filename), priority_context(PRIORITY_INTERACTIVE):
+            success = ai_engine.process_image(input_path, output_path)
 
         if success:
             logger.info(f"處理成功: {output_filename}")
@@ -88,7 +114,7 @@ def upload_file():
     except Exception as e:
         logger.error(f"處理失敗: {e}")
         # 清理檔案
-        if os.path.exists(input_path):
+        if input_path and os.path.exists(input_path):
             os.remove(input_path)
         return jsonify({'error': f'處理失敗: {str(e)}'}), 500
 
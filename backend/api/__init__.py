@@ -1 +1,8 @@
 """API 套件"""
+import sys
+from pathlib import Path
+
+# 將專案根目錄加入模組路徑，讓路由與服務層都能匯入 src 下的共用模組
+_PROJECT_ROOT = str(Path(__file__).resolve().parent.parent.parent)
+if _PROJECT_ROOT not in sys.path:
+    sys.path.append(_PROJECT_ROOT)
@@ -1,4 +1,5 @@
 """Core 模組"""
 from .config import Settings, get_settings
+from .dependencies import get_client_id
 
-__all__ = ["Settings", "get_settings"]
+__all__ = ["Settings", "get_settings", "get_client_id"]
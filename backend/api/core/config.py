@@ -20,13 +20,71 @@ class Settings(BaseSettings):
 
     # 檔案上傳設定
     max_file_size: int = 10 * 1024 * 1024  # 10MB
+    upload_chunk_size: int = 1024 * 1024  # 串流寫入的區塊大小（1MB）
     upload_dir: str = "uploads"
     output_dir: str = "outputs"
     allowed_extensions: set[str] = {".png", ".jpg", ".jpeg", ".webp"}
 
+    # 批次壓縮檔設定
+    max_archive_size: int = 500 * 1024 * 1024  # 500MB
+    max_archive_pages: int = 500
+    allowed_archive_extensions: set[str] = {".zip", ".cbz"}
+
+    # 翻譯工作佇列設定
+    job_db_path: str = "jobs.sqlite"
+    job_workers: int = 2
+    # 額外保留給互動工作（/api/translate）的工作者數，批次佔滿一般工作者時單頁請求不必排隊
+    job_interactive_workers: int = 1
+    # 同一優先等級內各用戶端（X-Client-Id 標頭，未提供時為來源 IP）的公平排程權重，例如 "alice=3,bob=1"
+    scheduler_weights: Optional[str] = None
+
+    # 自適應並行度（AIMD）：依 429 / 503 與延遲調整同時呼叫數，上限不超過工作者總數
+    adaptive_concurrency: bool = False
+    adaptive_min_concurrency: int = 1
+    adaptive_initial_concurrency: int = 2
+
     # Gemini API 設定
     gemini_api_key: Optional[str] = None
+    # 額外的 API Key（逗號分隔），與 gemini_api_key 組成金鑰池，依負載平均分配並各自計算配額
+    gemini_api_keys: Optional[str] = None
     gemini_model: str = "gemini-3-pro-image-preview"
+    # 翻譯後端清單（格式同 TRANSLATION_BACKENDS，例如 "gemini:gemini-3-pro-image-preview,gemini:gemini-2.5-flash-image"）
+    # 未設定時只使用 gemini_model 的單一 Gemini 後端
+    translation_backends: Optional[str] = None
+    # 路由策略: fallback / latency / cost
+    translation_routing: str = "fallback"
+
+    # 輸出圖片設定（格式: jpeg / webp / png）
+    output_format: str = "jpeg"
+    output_quality: int = 90
+    output_progressive: bool = True
+    output_restore_size: bool = True
+
+    # 長條漫畫分塊設定
+    tiling_enabled: bool = False
+    tile_height: int = 1600
+    tile_overlap: int = 96
+
+    # 追蹤設定（none / file / otlp）
+    tracing_exporter: str = "none"
+    tracing_file: str = "traces.jsonl"
+    otel_exporter_otlp_endpoint: Optional[str] = None
+    otel_service_name: str = "comic-translator-api"
+
+    # 翻譯結果快取設定（與 CLI、Flask 共用相同的環境變數與目錄）
+    translation_cache_enabled: bool = True
+    translation_cache_dir: Optional[str] = None
+    translation_cache_max_mb: int = 1024
+
+    # 近似重複頁面（感知雜湊）：沿用相似頁面的翻譯，需啟用翻譯快取；門檻為允許的最大漢明距離
+    dedupe_enabled: bool = False
+    dedupe_threshold: int = 4
+
+    # 無文字頁面（off / log / skip）：skip 時空白頁、跨頁大圖等不送出，直接以原圖輸出
+    textless_mode: str = "off"
+
+    # 對話框區域模式：只送出文字區域、翻譯後貼回原圖（其餘參數依 REGION_* 環境變數）
+    region_mode: bool = False
 
     model_config = SettingsConfigDict(
         env_file=".env",
@@ -0,0 +1,16 @@
+"""
+共用的路由相依項目
+"""
+from fastapi import Request
+
+
+# 用戶端可自行標示身分的標頭（用於公平排程的流量名稱）
+CLIENT_ID_HEADER = "X-Client-Id"
+
+
+def get_client_id(request: Request) -> str:
+    """取得用戶端 ID（X-Client-Id 標頭，未提供時為來源 IP）"""
+    client_id = request.headers.get(CLIENT_ID_HEADER, "").strip()
+    if client_id:
+        return client_id[:128]
+    return request.client.host if request.client else "anonymous"
@@ -0,0 +1,139 @@
+"""
+自訂 ASGI 中介軟體
+"""
+import json
+from typing import Optional
+
+from starlette.exceptions import HTTPException
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.tracing import span, tracer
+
+
+class _BodyTooLarge(HTTPException):
+    """
+    請求內容超過上限（內部使用）
+
+    繼承 HTTPException，讓 FastAPI 解析表單途中拋出時仍會轉成 413，而不是 400。
+    """
+
+    def __init__(self, limit: int):
+        super().__init__(status_code=413, detail=f"檔案過大。最大限制: {limit / 1024 / 1024:.1f}MB")
+
+
+class MaxBodySizeMiddleware:
+    """
+    限制請求內容大小
+
+    - 有 Content-Length 時，在讀取任何內容之前就直接回應 413
+    - 沒有 Content-Length（chunked）時，邊接收邊累計，超過上限立即中止
+
+    以純 ASGI 實作，不會把請求內容緩衝到記憶體。
+    """
+
+    def __init__(self, app: ASGIApp, max_body_size: int, path_limits: Optional[dict[str, int]] = None):
+        self.app = app
+        self.max_body_size = max_body_size
+        # 特定路徑前綴的上限（例如批次壓縮檔），最長前綴優先
+        self.path_limits = sorted((path_limits or {}).items(), key=lambda item: len(item[0]), reverse=True)
+
+    def _limit_for(self, path: str) -> int:
+        for prefix, limit in self.path_limits:
+            if path.startswith(prefix):
+                return limit
+        return self.max_body_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        limit = self._limit_for(scope["path"])
+        headers = dict(scope.get("headers") or [])
+        content_length = headers.get(b"content-length")
+        if content_length is not None:
+            try:
+                if int(content_length) > limit:
+                    await self._reject(send, limit)
+                    return
+            except ValueError:
+                pass
+
+        received = 0
+        response_started = False
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise _BodyTooLarge(limit)
+            return message
+
+        async def tracking_send(message: Message) -> None:
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except _BodyTooLarge:
+            if not response_started:
+                await self._reject(send, limit)
+
+    @staticmethod
+    async def _reject(send: Send, limit: int) -> None:
+        body = json.dumps(
+            {"detail": f"檔案過大。最大限制: {limit / 1024 / 1024:.1f}MB"},
+            ensure_ascii=False
+        ).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"connection", b"close"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+class TracingMiddleware:
+    """
+    在 API 入口建立追蹤的根 span
+
+    沿用請求的 traceparent 標頭（上游已有 trace 時串接），並在回應標頭附上 traceparent，
+    讓客戶端可以用它查詢該請求在服務層、佇列與引擎中的所有 span。
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not tracer.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        incoming = headers.get(b"traceparent")
+        parent = incoming.decode("latin-1") if incoming else None
+
+        with span(
+            f"HTTP {scope['method']} {scope['path']}",
+            parent=parent,
+            **{"http.method": scope["method"], "http.target": scope["path"]}
+        ) as request_span:
+
+            async def traced_send(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    request_span.set_attribute("http.status_code", message["status"])
+                    message.setdefault("headers", [])
+                    message["headers"] = list(message["headers"]) + [
+                        (b"traceparent", request_span.traceparent.encode("latin-1"))
+                    ]
+                await send(message)
+
+            await self.app(scope, receive, traced_send)
@@ -7,11 +7,21 @@ from contextlib import asynccontextmanager
 from pathlib import Path
 
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
 
 from .core.config import get_settings
-from .routers import translation_router
+from .core.middleware import MaxBodySizeMiddleware, TracingMiddleware
+from .routers import batches_router, jobs_router, translation_router
+from .schemas.job import JobStatus
+from .schemas.translation import TranslationConfig
+from .services import job_events, job_queue, translation_service
+from src.key_pool import parse_api_keys
+from src.metrics import METRIC_PREFIX, metrics
+from src.scheduler import parse_weights
+from src.tracing import configure_tracing, tracer
 
 
 # 配置日誌
@@ -21,6 +31,9 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# multipart 表單中除了檔案內容以外的額外空間（邊界、標頭、文字欄位）
+MULTIPART_OVERHEAD = 64 * 1024
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -32,13 +45,52 @@ async def lifespan(app: FastAPI):
     settings = get_settings()
     logger.info(f"啟動 {settings.app_name} v{settings.app_version}")
 
+    # 追蹤匯出（預設停用）
+    try:
+        configure_tracing(
+            exporter=settings.tracing_exporter,
+            path=settings.tracing_file,
+            endpoint=settings.otel_exporter_otlp_endpoint,
+            service_name=settings.otel_service_name
+        )
+    except ValueError as e:
+        logger.warning(f"追蹤設定無效，停用追蹤: {e}")
+
     # 建立必要的目錄
     Path(settings.upload_dir).mkdir(parents=True, exist_ok=True)
     Path(settings.output_dir).mkdir(parents=True, exist_ok=True)
 
+    # 環境變數已提供 API Key 時直接配置，讓重啟前排隊的工作可以繼續處理
+    env_keys = parse_api_keys(settings.gemini_api_key) + parse_api_keys(settings.gemini_api_keys)
+    if env_keys and not translation_service.is_configured():
+        try:
+            translation_service.configure(TranslationConfig(api_key=env_keys[0], api_keys=env_keys[1:]))
+        except Exception as e:
+            logger.warning(f"以環境變數配置翻譯服務失敗: {e}")
+
+    # 啟動背景翻譯工作者
+    job_queue.start(
+        db_path=settings.job_db_path,
+        workers=settings.job_workers,
+        handler=translation_service.run_job,
+        ready=translation_service.is_configured,
+        interactive_workers=settings.job_interactive_workers,
+        weights=parse_weights(settings.scheduler_weights)
+    )
+
+    # 佇列深度在輸出指標時才向資料庫查詢
+    for job_status in (JobStatus.QUEUED, JobStatus.RUNNING):
+        metrics.register_gauge(
+            f"{METRIC_PREFIX}_queue_depth",
+            lambda job_status=job_status: job_queue.store.count(job_status),
+            status=job_status.value
+        )
+
     yield
 
     # 關閉時
+    job_queue.stop()
+    tracer.configure(None)
     logger.info("應用程式關閉")
 
 
@@ -58,6 +110,14 @@ def create_app() -> FastAPI:
         redoc_url="/api/redoc" if settings.debug else None,
     )
 
+    # 限制請求大小：超過上限時在接收完內容前就回應 413（保留 multipart 表單欄位的空間）
+    # 先註冊的中介軟體位於內層，讓 413 回應也會經過 CORS 加上標頭
+    app.add_middleware(
+        MaxBodySizeMiddleware,
+        max_body_size=settings.max_file_size + MULTIPART_OVERHEAD,
+        path_limits={"/api/translate/batch": settings.max_archive_size + MULTIPART_OVERHEAD}
+    )
+
     # 設定 CORS 中介軟體
     app.add_middleware(
         CORSMiddleware,
@@ -65,23 +125,50 @@ def create_app() -> FastAPI:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["traceparent"],
     )
 
     # 設定 GZip 壓縮中介軟體
     app.add_middleware(GZipMiddleware, minimum_size=1000)
 
+    # 追蹤根 span（最外層，涵蓋所有中介軟體與路由的耗時）
+    app.add_middleware(TracingMiddleware)
+
     # 註冊路由
     app.include_router(translation_router)
+    app.include_router(jobs_router)
+    app.include_router(batches_router)
 
-    @app.get("/api/health")
-    async def health_check():
-        """健康檢查端點"""
+    def health_payload() -> dict:
+        """健康檢查內容（限流狀態等會查詢 SQLite，於執行緒池中呼叫）"""
         return {
             "status": "healthy",
             "app_name": settings.app_name,
-            "version": settings.app_version
+            "version": settings.app_version,
+            "cache": translation_service.cache_stats(),
+            "rate_limit": translation_service.rate_limit_status(),
+            "backends": translation_service.backend_stats(),
+            "api_keys": translation_service.key_stats(),
+            "concurrency": translation_service.concurrency_stats(),
+            "dedupe": translation_service.dedupe_stats(),
+            "textless": translation_service.textless_stats(),
+            "event_streams": job_events.subscriber_count()
         }
 
+    @app.get("/api/health")
+    async def health_check():
+        """健康檢查端點"""
+        return await run_in_threadpool(health_payload)
+
+    @app.get("/api/metrics", response_class=PlainTextResponse)
+    async def get_metrics():
+        """Prometheus 格式的處理指標（分段耗時、請求數、失敗類別、位元組數、快取命中、佇列深度）"""
+        # 佇列深度量表在輸出時查詢 SQLite，不在事件迴圈中執行
+        return PlainTextResponse(
+            await run_in_threadpool(metrics.render_prometheus),
+            media_type="text/plain; version=0.0.4; charset=utf-8"
+        )
+
     return app
 
 
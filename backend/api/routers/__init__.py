@@ -1,4 +1,6 @@
 """Routers 模組"""
 from .translation import router as translation_router
+from .jobs import router as jobs_router
+from .batches import router as batches_router
 
-__all__ = ["translation_router"]
+__all__ = ["translation_router", "jobs_router", "batches_router"]
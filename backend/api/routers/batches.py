@@ -0,0 +1,203 @@
+"""
+批次翻譯路由
+上傳一個 ZIP/CBZ，取得逐頁翻譯後的 CBZ
+"""
+import logging
+import uuid
+import zipfile
+from pathlib import Path
+from typing import Annotated
+from urllib.parse import quote
+
+from fastapi import APIRouter, Depends, File, HTTPException, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+
+from src.scheduler import PRIORITY_BATCH, normalize_priority
+from src.uploads import UploadTooLarge, save_stream
+from ..core.config import Settings, get_settings
+from ..core.dependencies import get_client_id
+from ..schemas.job import BatchResponse
+from ..services.batch_service import batch_service
+from ..services.job_events import SSE_HEADERS, batch_topic, event_stream, job_events
+from ..services.translation_service import translation_service
+
+
+router = APIRouter(prefix="/api", tags=["batches"])
+logger = logging.getLogger(__name__)
+
+
+@router.post("/translate/batch", response_model=BatchResponse, status_code=status.HTTP_202_ACCEPTED)
+async def translate_batch(
+    file: Annotated[UploadFile, File(description="要翻譯的 ZIP/CBZ 壓縮檔")],
+    extra_prompt: str = "",
+    priority: str = PRIORITY_BATCH,
+    settings: Annotated[Settings, Depends(get_settings)] = None,
+    client_id: Annotated[str, Depends(get_client_id)] = None
+) -> BatchResponse:
+    """
+    建立批次翻譯工作
+
+    壓縮檔中的每一頁都會成為一筆翻譯工作，由背景工作者並行處理；
+    可立即下載 archive_url，翻譯後的頁面會依頁序陸續串流輸出。
+
+    Args:
+        file: 上傳的壓縮檔
+        extra_prompt: 額外的提示詞（套用到每一頁）
+        priority: 優先等級（預設 batch；大量補翻可用 background）
+        settings: 應用程式設定
+        client_id: 用戶端 ID（同一等級內依用戶端公平排程）
+
+    Returns:
+        批次摘要
+    """
+    if not translation_service.is_configured():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="請先設定翻譯配置（呼叫 /api/translation/config）"
+        )
+
+    try:
+        priority = normalize_priority(priority, PRIORITY_BATCH)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    file_ext = Path(file.filename).suffix.lower()
+    if file_ext not in settings.allowed_archive_extensions:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"不支援的壓縮檔格式: {file_ext}。允許的格式: {settings.allowed_archive_extensions}"
+        )
+
+    upload_dir = Path(settings.upload_dir)
+    upload_dir.mkdir(parents=True, exist_ok=True)
+    archive_path = upload_dir / f"{uuid.uuid4().hex}{file_ext}"
+
+    try:
+        await run_in_threadpool(
+            save_stream,
+            file.file,
+            str(archive_path),
+            settings.max_archive_size,
+            settings.upload_chunk_size
+        )
+        batch = await run_in_threadpool(
+            batch_service.create_batch,
+            str(archive_path),
+            file.filename,
+            extra_prompt,
+            settings,
+            priority,
+            client_id
+        )
+        return BatchResponse.from_batch(batch)
+
+    except UploadTooLarge:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"壓縮檔過大。最大限制: {settings.max_archive_size / 1024 / 1024}MB"
+        )
+    except zipfile.BadZipFile:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="不是有效的 ZIP/CBZ 壓縮檔"
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception as e:
+        logger.error(f"建立批次翻譯工作時發生錯誤: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"建立批次翻譯工作失敗: {str(e)}"
+        )
+    finally:
+        # 頁面已解出，原始壓縮檔不再需要
+        try:
+            archive_path.unlink(missing_ok=True)
+        except Exception as e:
+            logger.warning(f"清理暫存檔案失敗: {e}")
+
+
+@router.get("/batches/{batch_id}", response_model=BatchResponse)
+async def get_batch(batch_id: str) -> BatchResponse:
+    """
+    查詢批次翻譯狀態
+
+    Args:
+        batch_id: 批次 ID
+
+    Returns:
+        批次摘要與各頁狀態
+    """
+    batch = await run_in_threadpool(batch_service.get_batch, batch_id)
+    if batch is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"找不到批次: {batch_id}"
+        )
+    return BatchResponse.from_batch(batch)
+
+
+@router.get("/batches/{batch_id}/events")
+async def stream_batch_events(batch_id: str) -> StreamingResponse:
+    """
+    以 Server-Sent Events 推送批次中各頁的進度
+
+    連線後先送出批次摘要（snapshot），之後推送各頁的狀態與處理分段事件，
+    所有頁面結束後關閉連線。
+
+    Args:
+        batch_id: 批次 ID
+
+    Returns:
+        text/event-stream 串流
+    """
+    subscription = job_events.subscribe(batch_topic(batch_id))
+    batch = await run_in_threadpool(batch_service.get_batch, batch_id)
+    if batch is None:
+        job_events.unsubscribe(subscription)
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"找不到批次: {batch_id}"
+        )
+    return StreamingResponse(
+        event_stream(
+            subscription,
+            BatchResponse.from_batch(batch).model_dump(mode="json"),
+            batch["jobs"],
+            lambda: batch_service.get_batch(batch_id)["jobs"]
+        ),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
+
+
+@router.get("/batches/{batch_id}/archive")
+async def get_batch_archive(batch_id: str) -> StreamingResponse:
+    """
+    下載翻譯後的 CBZ
+
+    頁面依頁序在完成時立即串流輸出，連線會保持到最後一頁處理完畢。
+
+    Args:
+        batch_id: 批次 ID
+
+    Returns:
+        CBZ 串流
+    """
+    batch = await run_in_threadpool(batch_service.get_batch, batch_id)
+    if batch is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"找不到批次: {batch_id}"
+        )
+
+    download_name = f"{Path(batch['filename']).stem}_translated.cbz"
+    return StreamingResponse(
+        batch_service.iter_archive(batch_id),
+        media_type="application/vnd.comicbook+zip",
+        headers={"Content-Disposition": f"attachment; filename*=UTF-8''{quote(download_name)}"}
+    )
@@ -0,0 +1,68 @@
+"""
+翻譯工作狀態查詢路由
+"""
+from fastapi import APIRouter, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+
+from ..schemas.job import JobResponse
+from ..services.job_events import SSE_HEADERS, event_stream, job_events, job_topic
+from ..services.job_queue import job_queue
+
+
+router = APIRouter(prefix="/api", tags=["jobs"])
+
+
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str) -> JobResponse:
+    """
+    查詢翻譯工作狀態
+
+    Args:
+        job_id: 工作 ID
+
+    Returns:
+        工作狀態（完成時包含結果 URL）
+    """
+    job = await run_in_threadpool(job_queue.get, job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"找不到工作: {job_id}"
+        )
+    return JobResponse.from_job(job)
+
+
+@router.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str) -> StreamingResponse:
+    """
+    以 Server-Sent Events 推送工作進度
+
+    連線後先送出目前狀態（snapshot），之後推送 started / stage / succeeded / failed 事件，
+    工作結束後關閉連線。事件格式見 services/job_events.py。
+
+    Args:
+        job_id: 工作 ID
+
+    Returns:
+        text/event-stream 串流
+    """
+    # 先訂閱再讀取快照，兩者之間發生的事件不會遺漏
+    subscription = job_events.subscribe(job_topic(job_id))
+    job = await run_in_threadpool(job_queue.get, job_id)
+    if job is None:
+        job_events.unsubscribe(subscription)
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"找不到工作: {job_id}"
+        )
+    return StreamingResponse(
+        event_stream(
+            subscription,
+            JobResponse.from_job(job).model_dump(mode="json"),
+            [job],
+            lambda: list(filter(None, [job_queue.store.get(job_id)]))
+        ),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
@@ -3,19 +3,26 @@
 遵循 RESTful API 設計原則
 """
 import logging
-import os
+import mimetypes
+import uuid
 from pathlib import Path
 from typing import Annotated
 
 from fastapi import APIRouter, Depends, File, HTTPException, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import FileResponse
 
+from src.scheduler import PRIORITY_INTERACTIVE, normalize_priority
+from src.tracing import span
+from src.uploads import InvalidUpload, UploadTooLarge, require_image, save_stream
 from ..core.config import Settings, get_settings
+from ..core.dependencies import get_client_id
+from ..schemas.job import JobResponse
 from ..schemas.translation import (
     ConfigResponse,
-    TranslationConfig,
-    TranslationResponse
+    TranslationConfig
 )
+from ..services.job_queue import job_queue
 from ..services.translation_service import translation_service
 
 
@@ -40,6 +47,8 @@ async def set_config(
     """
     try:
         translation_service.configure(config)
+        # 喚醒等待配置完成的背景工作者
+        job_queue.notify()
         return ConfigResponse(ok=True, message="配置已成功更新")
 
     except Exception as e:
@@ -50,22 +59,30 @@ async def set_config(
         )
 
 
-@router.post("/translate", response_model=TranslationResponse, status_code=status.HTTP_200_OK)
+@router.post("/translate", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED)
 async def translate_image(
     file: Annotated[UploadFile, File(description="要翻譯的圖片")],
     extra_prompt: str = "",
-    settings: Annotated[Settings, Depends(get_settings)] = None
-) -> TranslationResponse:
+    priority: str = PRIORITY_INTERACTIVE,
+    settings: Annotated[Settings, Depends(get_settings)] = None,
+    client_id: Annotated[str, Depends(get_client_id)] = None
+) -> JobResponse:
     """
-    翻譯單張圖片
+    建立單張圖片的翻譯工作
+
+    圖片存檔後立即回傳工作 ID，翻譯由背景工作者處理，
+    請以 GET /api/jobs/{job_id} 查詢狀態與結果 URL。
+    預設為互動優先等級，排在批次頁面之前。
 
     Args:
         file: 上傳的圖片檔案
         extra_prompt: 額外的提示詞
+        priority: 優先等級（interactive / batch / background）
         settings: 應用程式設定
+        client_id: 用戶端 ID（同一等級內依用戶端公平排程）
 
     Returns:
-        翻譯結果
+        排隊中的工作
     """
     # 檢查服務是否已配置
     if not translation_service.is_configured():
@@ -74,6 +91,11 @@ async def translate_image(
             detail="請先設定翻譯配置（呼叫 /api/translation/config）"
         )
 
+    try:
+        priority = normalize_priority(priority, PRIORITY_INTERACTIVE)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
     # 驗證檔案格式
     file_ext = Path(file.filename).suffix.lower()
     if file_ext not in settings.allowed_extensions:
@@ -82,20 +104,6 @@ async def translate_image(
             detail=f"不支援的檔案格式: {file_ext}。允許的格式: {settings.allowed_extensions}"
         )
 
-    # 驗證檔案大小
-    file_size = 0
-    content = await file.read()
-    file_size = len(content)
-
-    if file_size > settings.max_file_size:
-        raise HTTPException(
-            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-            detail=f"檔案過大（{file_size / 1024 / 1024:.2f}MB）。最大限制: {settings.max_file_size / 1024 / 1024}MB"
-        )
-
-    # 重置檔案指標
-    await file.seek(0)
-
     try:
         # 建立暫存目錄
         upload_dir = Path(settings.upload_dir)
@@ -103,48 +111,70 @@ async def translate_image(
         upload_dir.mkdir(parents=True, exist_ok=True)
         output_dir.mkdir(parents=True, exist_ok=True)
 
-        # 儲存上傳的檔案
-        input_path = upload_dir / file.filename
-        with open(input_path, "wb") as f:
-            f.write(content)
+        # 以工作 ID 命名，避免同名檔案互相覆蓋；檔案保留到工作完成後才清理
+        job_id = uuid.uuid4().hex
+        input_path = upload_dir / f"{job_id}{file_ext}"
+
+        # 分塊串流寫入磁碟，邊寫邊驗證大小與檔頭（在執行緒池中執行，不阻塞事件迴圈）
+        with span("upload.save", job_id=job_id) as save_span:
+            written = await run_in_threadpool(
+                save_stream,
+                file.file,
+                str(input_path),
+                settings.max_file_size,
+                settings.upload_chunk_size,
+                require_image
+            )
+            save_span.set_attribute("bytes", written)
+    except UploadTooLarge:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"檔案過大。最大限制: {settings.max_file_size / 1024 / 1024}MB"
+        )
+    except InvalidUpload as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception as e:
+        logger.error(f"儲存上傳檔案時發生錯誤: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"儲存上傳檔案失敗: {str(e)}"
+        )
 
+    try:
         # 設定輸出路徑
-        output_filename = f"{Path(file.filename).stem}_translated{file_ext}"
+        output_filename = f"{Path(file.filename).stem}_{job_id[:8]}_translated{translation_service.output_extension()}"
         output_path = output_dir / output_filename
 
-        # 執行翻譯
-        success = translation_service.translate_image(
+        # 佇列以 SQLite 儲存，寫入可能等待工作者持有的鎖，在執行緒池中執行
+        job = await run_in_threadpool(
+            _submit_job,
+            filename=file.filename,
             input_path=str(input_path),
             output_path=str(output_path),
-            extra_prompt=extra_prompt
+            output_url=f"/api/outputs/{output_filename}",
+            extra_prompt=extra_prompt,
+            job_id=job_id,
+            priority=priority,
+            flow=client_id
         )
-
-        if success:
-            return TranslationResponse(
-                success=True,
-                filename=file.filename,
-                output_url=f"/api/outputs/{output_filename}"
-            )
-        else:
-            return TranslationResponse(
-                success=False,
-                filename=file.filename,
-                error="AI 處理失敗，未能生成翻譯圖片"
-            )
+        return JobResponse.from_job(job)
 
     except Exception as e:
-        logger.error(f"翻譯圖片時發生錯誤: {e}")
+        logger.error(f"建立翻譯工作時發生錯誤: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"翻譯失敗: {str(e)}"
+            detail=f"建立翻譯工作失敗: {str(e)}"
         )
-    finally:
-        # 清理暫存檔案
-        try:
-            if input_path.exists():
-                input_path.unlink()
-        except Exception as e:
-            logger.warning(f"清理暫存檔案失敗: {e}")
+
+
+def _submit_job(**kwargs) -> dict:
+    """建立工作並附上排隊位置（同步，於執行緒池中呼叫）"""
+    job = job_queue.submit(**kwargs)
+    job["queue_position"] = job_queue.store.queue_position(job)
+    return job
 
 
 @router.get("/outputs/{filename}", response_class=FileResponse)
@@ -172,6 +202,6 @@ async def get_output(
 
     return FileResponse(
         path=output_path,
-        media_type=f"image/{output_path.suffix.lstrip('.')}",
+        media_type=mimetypes.guess_type(output_path.name)[0] or "application/octet-stream",
         filename=filename
     )
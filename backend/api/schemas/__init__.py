@@ -5,10 +5,14 @@ from .translation import (
     TranslationResponse,
     ConfigResponse
 )
+from .job import BatchResponse, JobResponse, JobStatus
 
 __all__ = [
     "TranslationConfig",
     "TranslationRequest",
     "TranslationResponse",
-    "ConfigResponse"
+    "ConfigResponse",
+    "BatchResponse",
+    "JobResponse",
+    "JobStatus"
 ]
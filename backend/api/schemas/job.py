@@ -0,0 +1,95 @@
+"""
+翻譯工作相關的 Pydantic Schema
+"""
+from enum import Enum
+
+from pydantic import BaseModel, Field
+
+from src.scheduler import PRIORITY_CLASSES, PRIORITY_INTERACTIVE
+
+
+class JobStatus(str, Enum):
+    """工作狀態"""
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+class JobResponse(BaseModel):
+    """翻譯工作回應 Schema"""
+
+    job_id: str = Field(..., description="工作 ID")
+    status: JobStatus = Field(..., description="工作狀態")
+    filename: str = Field(..., description="檔案名稱")
+    output_url: str | None = Field(None, description="輸出檔案 URL（完成後才提供）")
+    error: str | None = Field(None, description="錯誤訊息")
+    attempts: int = Field(default=0, description="呼叫 AI 的嘗試次數（含重試）")
+    queue_position: int | None = Field(None, description="排隊位置（從 1 開始）")
+    priority: str = Field(default=PRIORITY_INTERACTIVE, description="優先等級（interactive / batch / background）")
+    created_at: float = Field(..., description="建立時間（Unix 時間戳）")
+    started_at: float | None = Field(None, description="開始處理時間（Unix 時間戳）")
+    finished_at: float | None = Field(None, description="完成時間（Unix 時間戳）")
+
+    @classmethod
+    def from_job(cls, job: dict) -> "JobResponse":
+        """由工作佇列的紀錄建立回應"""
+        succeeded = job["status"] == JobStatus.SUCCEEDED.value
+        return cls(
+            job_id=job["id"],
+            status=job["status"],
+            filename=job["filename"],
+            output_url=job["output_url"] if succeeded else None,
+            error=job.get("error"),
+            attempts=job.get("attempts") or 0,
+            queue_position=job.get("queue_position"),
+            priority=PRIORITY_CLASSES[job.get("priority") or 0],
+            created_at=job["created_at"],
+            started_at=job.get("started_at"),
+            finished_at=job.get("finished_at"),
+        )
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "job_id": "3f2c9a7e1b8d4c6f9e0a1b2c3d4e5f60",
+                "status": "queued",
+                "filename": "page_001.jpg",
+                "output_url": None,
+                "error": None,
+                "attempts": 0,
+                "queue_position": 3,
+                "priority": "interactive",
+                "created_at": 1760000000.0,
+                "started_at": None,
+                "finished_at": None
+            }
+        }
+
+
+class BatchResponse(BaseModel):
+    """批次翻譯回應 Schema"""
+
+    batch_id: str = Field(..., description="批次 ID")
+    filename: str = Field(..., description="壓縮檔名稱")
+    status: str = Field(..., description="批次狀態（queued / running / completed）")
+    total_pages: int = Field(..., description="總頁數")
+    succeeded: int = Field(default=0, description="已完成頁數")
+    failed: int = Field(default=0, description="失敗頁數")
+    archive_url: str = Field(..., description="翻譯後 CBZ 的下載 URL（頁面完成時依序串流輸出）")
+    pages: list[JobResponse] = Field(default_factory=list, description="各頁工作狀態")
+
+    @classmethod
+    def from_batch(cls, batch: dict) -> "BatchResponse":
+        """由批次服務的摘要建立回應"""
+        return cls(
+            batch_id=batch["id"],
+            filename=batch["filename"],
+            status=batch["status"],
+            total_pages=batch["total_pages"],
+            succeeded=batch["counts"][JobStatus.SUCCEEDED.value],
+            failed=batch["counts"][JobStatus.FAILED.value],
+            archive_url=f"/api/batches/{batch['id']}/archive",
+            pages=[JobResponse.from_job(job) for job in batch["jobs"]],
+        )
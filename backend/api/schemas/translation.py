@@ -9,6 +9,7 @@ class TranslationConfig(BaseModel):
     """翻譯配置 Schema"""
 
     api_key: str = Field(..., min_length=1, description="Gemini API Key")
+    api_keys: list[str] = Field(default_factory=list, description="額外的 Gemini API Key（與 api_key 組成金鑰池）")
     name_mapping: dict[str, str] = Field(default_factory=dict, description="人名對照表")
     global_prompt: str = Field(default="", description="全域額外指示")
 
@@ -20,6 +21,12 @@ class TranslationConfig(BaseModel):
             raise ValueError("API Key 不可為空")
         return v.strip()
 
+    @field_validator('api_keys')
+    @classmethod
+    def validate_api_keys(cls, v: list[str]) -> list[str]:
+        """去除空白與空值"""
+        return [key.strip() for key in v if key and not key.isspace()]
+
 
 class TranslationRequest(BaseModel):
     """翻譯請求 Schema"""
@@ -41,6 +48,7 @@ class TranslationResponse(BaseModel):
     filename: str = Field(..., description="檔案名稱")
     output_url: str | None = Field(None, description="輸出檔案 URL")
     error: str | None = Field(None, description="錯誤訊息")
+    attempts: int = Field(default=0, description="呼叫 AI 的嘗試次數（含重試）")
 
     class Config:
         json_schema_extra = {
@@ -48,7 +56,8 @@ class TranslationResponse(BaseModel):
                 "success": True,
                 "filename": "page_001.jpg",
                 "output_url": "/outputs/page_001_translated.jpg",
-                "error": None
+                "error": None,
+                "attempts": 1
             }
         }
 
@@ -1,4 +1,16 @@
 """Services 模組"""
 from .translation_service import translation_service, TranslationService
+from .job_events import job_events, JobEventBus
+from .job_queue import job_queue, JobQueue
+from .batch_service import batch_service, BatchService
 
-__all__ = ["translation_service", "TranslationService"]
+__all__ = [
+    "translation_service",
+    "TranslationService",
+    "job_events",
+    "JobEventBus",
+    "job_queue",
+    "JobQueue",
+    "batch_service",
+    "BatchService"
+]
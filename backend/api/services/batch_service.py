@@ -0,0 +1,208 @@
+"""
+批次翻譯服務
+將上傳的 ZIP/CBZ 拆成逐頁的翻譯工作，並在頁面完成時依頁序串流輸出翻譯後的 CBZ
+"""
+import asyncio
+import logging
+import os
+import shutil
+import uuid
+import zipfile
+from pathlib import Path
+from typing import AsyncIterator, Optional
+
+from src.archive import StreamingZipWriter, list_zip_pages, output_name_for
+from src.uploads import require_image, save_stream
+from ..core.config import Settings
+from ..schemas.job import JobStatus
+from .job_events import EVENT_RESYNC, HEARTBEAT_SECONDS, TERMINAL_EVENTS, Subscription, batch_topic, job_events
+from .job_queue import job_queue
+from .translation_service import translation_service
+
+
+logger = logging.getLogger(__name__)
+
+_TERMINAL_STATUSES = (JobStatus.SUCCEEDED.value, JobStatus.FAILED.value)
+
+
+class BatchService:
+    """批次翻譯服務"""
+
+    def create_batch(
+        self,
+        archive_path: str,
+        filename: str,
+        extra_prompt: str,
+        settings: Settings,
+        priority: Optional[str] = None,
+        flow: str = ""
+    ) -> dict:
+        """
+        解開壓縮檔中的頁面並逐頁排入工作佇列
+
+        Args:
+            archive_path: 已上傳的壓縮檔路徑
+            filename: 原始檔名
+            extra_prompt: 額外的提示詞
+            settings: 應用程式設定
+            priority: 各頁工作的優先等級（預設 batch）
+            flow: 公平排程的流量名稱（用戶端 ID）
+
+        Returns:
+            批次摘要
+
+        Raises:
+            ValueError: 壓縮檔內容不符合限制
+            zipfile.BadZipFile: 不是有效的 ZIP 檔
+        """
+        batch_id = uuid.uuid4().hex
+        page_dir = Path(settings.upload_dir) / batch_id
+        output_dir = Path(settings.output_dir)
+        page_dir.mkdir(parents=True, exist_ok=True)
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        pages = []
+        try:
+            with zipfile.ZipFile(archive_path) as zf:
+                infos = list_zip_pages(zf)
+                if not infos:
+                    raise ValueError("壓縮檔中沒有支援的圖片（PNG、JPG、JPEG、WebP）")
+                if len(infos) > settings.max_archive_pages:
+                    raise ValueError(f"頁數過多（{len(infos)} 頁）。最大限制: {settings.max_archive_pages} 頁")
+
+                for index, info in enumerate(infos):
+                    # 以宣告的解壓縮大小先行過濾，實際寫入時仍會邊寫邊檢查（防止壓縮炸彈）
+                    if info.file_size > settings.max_file_size:
+                        raise ValueError(f"頁面過大: {info.filename}")
+
+                    ext = os.path.splitext(info.filename)[1].lower()
+                    input_path = page_dir / f"{index:04d}{ext}"
+                    with zf.open(info) as member:
+                        save_stream(
+                            member,
+                            str(input_path),
+                            settings.max_file_size,
+                            settings.upload_chunk_size,
+                            require_image
+                        )
+                    pages.append((index, info.filename, input_path, ext))
+        except Exception:
+            # 頁數、大小或格式不符時，已解出的頁面不會再被使用
+            shutil.rmtree(page_dir, ignore_errors=True)
+            raise
+
+        self._store().create_batch(batch_id, filename, len(pages))
+        output_ext = translation_service.output_extension()
+        for index, page_name, input_path, ext in pages:
+            output_filename = f"{batch_id[:8]}_{index:04d}_translated{output_ext}"
+            job_queue.submit(
+                filename=page_name,
+                input_path=str(input_path),
+                output_path=str(output_dir / output_filename),
+                output_url=f"/api/outputs/{output_filename}",
+                extra_prompt=extra_prompt,
+                batch_id=batch_id,
+                page_index=index,
+                priority=priority,
+                flow=flow
+            )
+
+        logger.info(f"批次 {batch_id} 已建立，共 {len(pages)} 頁")
+        return self.get_batch(batch_id)
+
+    def get_batch(self, batch_id: str) -> Optional[dict]:
+        """取得批次摘要與各頁狀態（不存在時回傳 None）"""
+        batch = self._store().get_batch(batch_id)
+        if batch is None:
+            return None
+
+        jobs = self._store().list_batch_jobs(batch_id)
+        counts = {status.value: 0 for status in JobStatus}
+        for job in jobs:
+            counts[job["status"]] += 1
+
+        if jobs and all(job["status"] in _TERMINAL_STATUSES for job in jobs):
+            status = "completed"
+        elif counts[JobStatus.QUEUED.value] == len(jobs):
+            status = "queued"
+        else:
+            status = "running"
+
+        return {
+            **batch,
+            "status": status,
+            "counts": counts,
+            "jobs": jobs,
+        }
+
+    async def iter_archive(self, batch_id: str) -> AsyncIterator[bytes]:
+        """
+        依頁序產生翻譯後的 CBZ 位元組
+
+        每頁完成時立即輸出，不需等待整個批次；失敗的頁面會列在 failed.txt。
+        （非同步產生器：等待頁面完成時只等候工作事件，不佔用執行緒池；
+        只有資料庫查詢與讀檔在執行緒中執行）
+        """
+        writer = StreamingZipWriter()
+        failed = []
+        subscription = job_events.subscribe(batch_topic(batch_id))
+        try:
+            jobs = await asyncio.to_thread(self._store().list_batch_jobs, batch_id)
+            for job in jobs:
+                job, subscription = await self._wait_job(job["id"], batch_id, subscription)
+                if job is None:
+                    continue
+
+                if job["status"] == JobStatus.SUCCEEDED.value and os.path.exists(job["output_path"]):
+                    # 壓縮檔內保留原始頁面路徑，副檔名改為實際輸出格式
+                    entry_name = output_name_for(job["filename"], Path(job["output_path"]).suffix)
+                    data = await asyncio.to_thread(Path(job["output_path"]).read_bytes)
+                    yield writer.add(entry_name, data)
+                else:
+                    failed.append(f"{job['filename']}: {job.get('error') or '翻譯失敗'}")
+
+            if failed:
+                yield writer.add("failed.txt", "\n".join(failed).encode("utf-8"))
+            yield writer.close()
+        finally:
+            job_events.unsubscribe(subscription)
+
+    async def _wait_job(
+        self,
+        job_id: str,
+        batch_id: str,
+        subscription: Subscription
+    ) -> tuple[Optional[dict], Subscription]:
+        """
+        等待單一工作結束（成功或失敗）
+
+        收到該工作的結束事件時重新查詢；心跳逾時也會查詢一次，
+        涵蓋由其他行程處理、或事件遺失的工作。
+
+        Returns:
+            (工作紀錄（不存在時為 None）, 目前的訂閱；事件積壓時會換成新的訂閱)
+        """
+        while True:
+            job = await asyncio.to_thread(self._store().get, job_id)
+            if job is None or job["status"] in _TERMINAL_STATUSES:
+                return job, subscription
+            while True:
+                event = await subscription.get(HEARTBEAT_SECONDS)
+                if event is None:
+                    break
+                if event["type"] == EVENT_RESYNC:
+                    job_events.unsubscribe(subscription)
+                    subscription = job_events.subscribe(batch_topic(batch_id))
+                    break
+                if event["type"] in TERMINAL_EVENTS and event["job_id"] == job_id:
+                    break
+
+    @staticmethod
+    def _store():
+        if job_queue.store is None:
+            raise RuntimeError("工作佇列尚未啟動")
+        return job_queue.store
+
+
+# 建立服務單例
+batch_service = BatchService()
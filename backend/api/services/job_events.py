@@ -0,0 +1,238 @@
+"""
+翻譯工作進度事件（行程內發布 / 訂閱，以 Server-Sent Events 推送）
+
+背景工作者在工作排入、開始處理、每個處理分段完成、成功或失敗時發布事件，
+/api/jobs/{job_id}/events 與 /api/batches/{batch_id}/events 即時推送給前端，不必輪詢。
+
+每個連線只是事件迴圈上的一個 asyncio.Queue：閒置時不佔用執行緒，也不查詢資料庫
+（只在每次心跳時以一次查詢確認狀態，涵蓋由其他行程處理、或事件遺失的工作）。
+工作者執行緒以 call_soon_threadsafe 投遞事件；沒有訂閱者時發布幾乎沒有成本。
+訂閱端消化太慢、待送事件超過上限時，該連線會收到 resync 事件並結束，
+瀏覽器自動重新連線後會先收到最新的狀態快照。
+
+事件類型：
+- snapshot: 連線時的目前狀態（單頁為 JobResponse，批次為 BatchResponse）
+- queued / started / succeeded / failed: 工作狀態變化（附 JobResponse）
+- stage: 處理分段完成（stage、seconds，分段名稱見 src/metrics.py）
+- resync: 事件積壓，請重新連線
+"""
+import asyncio
+import itertools
+import json
+import logging
+import threading
+import time
+from typing import AsyncIterator, Callable, Optional
+
+from src.metrics import METRIC_PREFIX, metrics
+from ..schemas.job import JobResponse, JobStatus
+
+
+logger = logging.getLogger(__name__)
+
+EVENT_SNAPSHOT = "snapshot"
+EVENT_QUEUED = "queued"
+EVENT_STARTED = "started"
+EVENT_STAGE = "stage"
+EVENT_SUCCEEDED = "succeeded"
+EVENT_FAILED = "failed"
+EVENT_RESYNC = "resync"
+TERMINAL_EVENTS = (EVENT_SUCCEEDED, EVENT_FAILED)
+
+# 每個連線最多積壓的事件數
+MAX_PENDING_EVENTS = 256
+# 心跳間隔（秒）：保持連線不被代理伺服器關閉，並順便確認工作狀態
+HEARTBEAT_SECONDS = 15.0
+# 瀏覽器斷線後重新連線的等待時間（毫秒）
+RECONNECT_MS = 2000
+
+# 避免代理伺服器緩衝或快取事件串流
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",
+}
+
+
+def job_topic(job_id: str) -> str:
+    return f"job:{job_id}"
+
+
+def batch_topic(batch_id: str) -> str:
+    return f"batch:{batch_id}"
+
+
+def format_sse(event_type: str, data: dict, event_id: Optional[int] = None) -> str:
+    """組成一則 Server-Sent Event"""
+    lines = [] if event_id is None else [f"id: {event_id}"]
+    lines.append(f"event: {event_type}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False)}")
+    return "\n".join(lines) + "\n\n"
+
+
+class Subscription:
+    """單一連線的事件佇列（只在所屬的事件迴圈中讀寫）"""
+
+    def __init__(self, topics: tuple[str, ...], loop: asyncio.AbstractEventLoop, max_pending: int):
+        self.topics = topics
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+        self.overflowed = False
+
+    def put(self, event: dict) -> None:
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # 積壓的事件全部丟棄，改由重新連線時的快照補上
+            self.overflowed = True
+
+    async def get(self, timeout: float) -> Optional[dict]:
+        """取得下一則事件；逾時回傳 None，積壓時回傳 resync 事件"""
+        if self.overflowed:
+            return {"type": EVENT_RESYNC}
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class JobEventBus:
+    """
+    工作事件的發布 / 訂閱（執行緒安全）
+
+    主題為 job:<id> 與 batch:<id>；批次頁面的事件同時發布到兩個主題。
+    """
+
+    def __init__(self, max_pending: int = MAX_PENDING_EVENTS):
+        self.max_pending = max_pending
+        self._subscribers: dict[str, set[Subscription]] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def subscribe(self, *topics: str) -> Subscription:
+        """訂閱主題（須在事件迴圈中呼叫，結束時呼叫 unsubscribe）"""
+        subscription = Subscription(topics, asyncio.get_running_loop(), self.max_pending)
+        with self._lock:
+            for topic in topics:
+                self._subscribers.setdefault(topic, set()).add(subscription)
+        metrics.add_gauge(f"{METRIC_PREFIX}_event_streams", 1)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        removed = False
+        with self._lock:
+            for topic in subscription.topics:
+                subscribers = self._subscribers.get(topic)
+                if subscribers is None or subscription not in subscribers:
+                    continue
+                subscribers.discard(subscription)
+                removed = True
+                if not subscribers:
+                    del self._subscribers[topic]
+        if removed:
+            metrics.add_gauge(f"{METRIC_PREFIX}_event_streams", -1)
+
+    def _subscribers_for(self, job: dict) -> set[Subscription]:
+        topics = [job_topic(job["id"])]
+        if job.get("batch_id"):
+            topics.append(batch_topic(job["batch_id"]))
+        with self._lock:
+            return set().union(*(self._subscribers.get(topic, ()) for topic in topics))
+
+    def publish(self, event_type: str, record: dict, **data) -> None:
+        """
+        發布工作事件（可在任何執行緒呼叫）
+
+        Args:
+            event_type: 事件類型
+            record: 工作紀錄
+            data: 事件附帶的欄位
+        """
+        subscribers = self._subscribers_for(record)
+        if not subscribers:
+            return
+        event = {
+            "id": next(self._ids),
+            "type": event_type,
+            "job_id": record["id"],
+            "batch_id": record.get("batch_id"),
+            "page_index": record.get("page_index"),
+            "timestamp": time.time(),
+            **data,
+        }
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.put, event)
+            except RuntimeError:
+                # 事件迴圈已關閉（服務結束中）
+                pass
+
+    def publish_status(self, event_type: str, job: dict) -> None:
+        """發布狀態變化事件（附上工作狀態；沒有訂閱者時不建立回應）"""
+        if self._subscribers_for(job):
+            self.publish(event_type, job, job=_job_payload(job))
+
+    def subscriber_count(self) -> int:
+        """目前開啟的串流連線數"""
+        with self._lock:
+            return len(set().union(*self._subscribers.values())) if self._subscribers else 0
+
+
+def _job_payload(job: dict) -> dict:
+    return JobResponse.from_job(job).model_dump(mode="json")
+
+
+async def event_stream(
+    subscription: Subscription,
+    snapshot: dict,
+    jobs: list[dict],
+    refresh: Callable[[], list[dict]],
+    heartbeat: float = HEARTBEAT_SECONDS
+) -> AsyncIterator[str]:
+    """
+    產生 SSE 串流：先送出快照，再推送事件，直到所有工作結束
+
+    Args:
+        subscription: 已訂閱的連線（串流結束時取消訂閱）
+        snapshot: 連線時的狀態快照
+        jobs: 快照中的工作紀錄（用來判斷哪些工作尚未結束）
+        refresh: 心跳時重新讀取這些工作的函式（於執行緒中呼叫）
+        heartbeat: 心跳間隔（秒）
+    """
+    terminal = (JobStatus.SUCCEEDED.value, JobStatus.FAILED.value)
+    pending = {job["id"] for job in jobs if job["status"] not in terminal}
+    try:
+        yield f"retry: {RECONNECT_MS}\n\n"
+        yield format_sse(EVENT_SNAPSHOT, snapshot)
+        while pending:
+            event = await subscription.get(heartbeat)
+            if event is None:
+                # 心跳時確認狀態：其他行程處理的工作不會在本行程發布事件
+                for job in await asyncio.to_thread(refresh):
+                    if job["id"] in pending and job["status"] in terminal:
+                        pending.discard(job["id"])
+                        yield format_sse(job["status"], {
+                            "type": job["status"],
+                            "job_id": job["id"],
+                            "batch_id": job.get("batch_id"),
+                            "page_index": job.get("page_index"),
+                            "timestamp": time.time(),
+                            "job": _job_payload(job),
+                        })
+                yield ": ping\n\n"
+                continue
+            if event["type"] == EVENT_RESYNC:
+                yield format_sse(EVENT_RESYNC, event)
+                return
+            yield format_sse(event["type"], event, event["id"])
+            if event["type"] in TERMINAL_EVENTS:
+                pending.discard(event["job_id"])
+    finally:
+        job_events.unsubscribe(subscription)
+
+
+metrics.describe(f"{METRIC_PREFIX}_event_streams", "目前開啟的工作進度事件串流（SSE）連線數")
+
+# 建立事件匯流排單例
+job_events = JobEventBus()
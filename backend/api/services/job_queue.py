@@ -0,0 +1,453 @@
+"""
+翻譯工作佇列
+以 SQLite 持久化待處理的圖片，由固定數量的背景執行緒依序取出處理，
+讓 /api/translate 立即回傳工作 ID，不會因 Gemini 呼叫阻塞事件迴圈；
+服務重啟後，尚未完成的工作會重新排入佇列。
+
+取工作的順序：先依優先等級（interactive > batch > background），
+同一等級內依 FairQueue 的標籤在各流量（使用者）間加權公平分配；
+另可保留幾個只處理互動工作的工作者，批次佔滿一般工作者時單頁請求仍不必等待。
+
+工作排入、開始、各處理分段完成與結束時發布進度事件（見 job_events.py），由 SSE 端點推送給前端。
+"""
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+
+from src.scheduler import (
+    PRIORITY_BATCH, PRIORITY_CLASSES, PRIORITY_INTERACTIVE, FairQueue, normalize_priority, priority_context,
+    priority_rank
+)
+from src.metrics import stage_listener
+from src.tracing import current_traceparent, span, tracer
+from ..schemas.job import JobStatus
+from .job_events import EVENT_FAILED, EVENT_QUEUED, EVENT_STAGE, EVENT_STARTED, EVENT_SUCCEEDED, job_events
+
+
+logger = logging.getLogger(__name__)
+
+# 工作者沒有收到通知時，重新檢查佇列的間隔（秒）
+_POLL_INTERVAL = 2.0
+
+
+class JobStore:
+    """工作狀態的 SQLite 儲存層（每次操作使用獨立連線，可跨執行緒使用）"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        with self._connection() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    filename TEXT NOT NULL,
+                    input_path TEXT NOT NULL,
+                    output_path TEXT NOT NULL,
+                    output_url TEXT NOT NULL,
+                    extra_prompt TEXT NOT NULL DEFAULT '',
+                    error TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL
+                )
+                """
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS batches (
+                    id TEXT PRIMARY KEY,
+                    filename TEXT NOT NULL,
+                    total_pages INTEGER NOT NULL,
+                    created_at REAL NOT NULL
+                )
+                """
+            )
+            self._migrate(conn)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_batch ON jobs (batch_id, page_index)")
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_jobs_schedule ON jobs (status, priority, vtag, created_at)"
+            )
+
+    @staticmethod
+    def _migrate(conn: sqlite3.Connection) -> None:
+        """為舊版資料庫補上後來新增的欄位"""
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+        if "batch_id" not in columns:
+            conn.execute("ALTER TABLE jobs ADD COLUMN batch_id TEXT")
+        if "page_index" not in columns:
+            conn.execute("ALTER TABLE jobs ADD COLUMN page_index INTEGER")
+        if "trace_parent" not in columns:
+            conn.execute("ALTER TABLE jobs ADD COLUMN trace_parent TEXT")
+        if "priority" not in columns:
+            conn.execute(
+                f"ALTER TABLE jobs ADD COLUMN priority INTEGER NOT NULL DEFAULT {priority_rank(PRIORITY_BATCH)}"
+            )
+            # 舊版的單頁工作視為互動請求
+            conn.execute(
+                "UPDATE jobs SET priority = ? WHERE batch_id IS NULL", (priority_rank(PRIORITY_INTERACTIVE),)
+            )
+        if "flow" not in columns:
+            conn.execute("ALTER TABLE jobs ADD COLUMN flow TEXT NOT NULL DEFAULT ''")
+        if "vtag" not in columns:
+            conn.execute("ALTER TABLE jobs ADD COLUMN vtag REAL NOT NULL DEFAULT 0")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @contextmanager
+    def _connection(self) -> Iterator[sqlite3.Connection]:
+        """取得自動關閉的連線（autocommit 模式）"""
+        conn = self._connect()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def create(
+        self,
+        job_id: str,
+        filename: str,
+        input_path: str,
+        output_path: str,
+        output_url: str,
+        extra_prompt: str = "",
+        batch_id: Optional[str] = None,
+        page_index: Optional[int] = None,
+        trace_parent: Optional[str] = None,
+        priority: int = 0,
+        flow: str = "",
+        vtag: float = 0.0
+    ) -> dict:
+        """新增一筆排隊中的工作（priority 為優先順位，vtag 為公平排程標籤）"""
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, status, filename, input_path, output_path, output_url, "
+                "extra_prompt, created_at, batch_id, page_index, trace_parent, priority, flow, vtag) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, JobStatus.QUEUED.value, filename, input_path, output_path,
+                 output_url, extra_prompt, time.time(), batch_id, page_index, trace_parent,
+                 priority, flow, vtag)
+            )
+        return self.get(job_id)
+
+    def create_batch(self, batch_id: str, filename: str, total_pages: int) -> None:
+        """新增批次紀錄"""
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT INTO batches (id, filename, total_pages, created_at) VALUES (?, ?, ?, ?)",
+                (batch_id, filename, total_pages, time.time())
+            )
+
+    def get_batch(self, batch_id: str) -> Optional[dict]:
+        """取得批次紀錄（不存在時回傳 None）"""
+        with self._connection() as conn:
+            row = conn.execute("SELECT * FROM batches WHERE id = ?", (batch_id,)).fetchone()
+        return dict(row) if row else None
+
+    def list_batch_jobs(self, batch_id: str) -> list[dict]:
+        """依頁序列出批次中的所有工作"""
+        with self._connection() as conn:
+            rows = conn.execute(
+                "SELECT * FROM jobs WHERE batch_id = ? ORDER BY page_index", (batch_id,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """取得工作（不存在時回傳 None）"""
+        with self._connection() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def queue_position(self, job: dict) -> Optional[int]:
+        """取得排隊中工作的位置（從 1 開始，依目前的排程順序），非排隊狀態回傳 None"""
+        if job["status"] != JobStatus.QUEUED.value:
+            return None
+        with self._connection() as conn:
+            (ahead,) = conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = ? AND (priority, vtag, created_at) < (?, ?, ?)",
+                (JobStatus.QUEUED.value, job["priority"], job["vtag"], job["created_at"])
+            ).fetchone()
+        return ahead + 1
+
+    def queued_flows(self) -> list[dict]:
+        """各等級、各流量排隊中工作的標籤範圍（重啟時還原公平排程狀態用）"""
+        with self._connection() as conn:
+            rows = conn.execute(
+                "SELECT priority, flow, MIN(vtag) AS first_tag, MAX(vtag) AS last_tag FROM jobs "
+                "WHERE status = ? GROUP BY priority, flow",
+                (JobStatus.QUEUED.value,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def claim_next(self, max_priority: Optional[int] = None) -> Optional[dict]:
+        """
+        依排程順序取出下一筆工作並標記為處理中（原子操作）
+
+        Args:
+            max_priority: 只取優先順位不大於此值的工作（None 代表不限）
+        """
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = ? AND priority <= ? "
+                "ORDER BY priority, vtag, created_at LIMIT 1",
+                (JobStatus.QUEUED.value, len(PRIORITY_CLASSES) if max_priority is None else max_priority)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            started_at = time.time()
+            conn.execute(
+                "UPDATE jobs SET status = ?, started_at = ? WHERE id = ?",
+                (JobStatus.RUNNING.value, started_at, row["id"])
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+        job = dict(row)
+        job["status"] = JobStatus.RUNNING.value
+        job["started_at"] = started_at
+        return job
+
+    def finish(self, job_id: str, success: bool, error: Optional[str] = None, attempts: int = 0) -> float:
+        """標記工作完成或失敗，回傳完成時間"""
+        status = JobStatus.SUCCEEDED if success else JobStatus.FAILED
+        finished_at = time.time()
+        with self._connection() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, attempts = ?, finished_at = ? WHERE id = ?",
+                (status.value, error, attempts, finished_at, job_id)
+            )
+        return finished_at
+
+    def requeue_running(self) -> int:
+        """將上次關閉時仍在處理中的工作重新排入佇列"""
+        with self._connection() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, started_at = NULL WHERE status = ?",
+                (JobStatus.QUEUED.value, JobStatus.RUNNING.value)
+            )
+            return cursor.rowcount
+
+    def count(self, status: JobStatus) -> int:
+        """取得指定狀態的工作數"""
+        with self._connection() as conn:
+            (count,) = conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = ?", (status.value,)
+            ).fetchone()
+        return count
+
+
+class JobQueue:
+    """
+    背景翻譯工作佇列
+
+    handler(job) 回傳 (success, error, attempts)；ready() 為 False 時暫不取工作
+    （例如服務重啟後尚未設定 API Key，排隊中的工作會等到設定完成後才開始）。
+    """
+
+    def __init__(self):
+        self.store: Optional[JobStore] = None
+        self._handler: Optional[Callable[[dict], tuple[bool, Optional[str], int]]] = None
+        self._ready: Callable[[], bool] = lambda: True
+        self._workers: list[threading.Thread] = []
+        self.fair_queue = FairQueue()
+        self._wakeup = threading.Condition()
+        self._finished = threading.Condition()
+        self._stopping = threading.Event()
+
+    def start(
+        self,
+        db_path: str,
+        workers: int,
+        handler: Callable[[dict], tuple[bool, Optional[str], int]],
+        ready: Optional[Callable[[], bool]] = None,
+        interactive_workers: int = 0,
+        weights: Optional[dict[str, float]] = None
+    ) -> None:
+        """
+        啟動背景工作者
+
+        Args:
+            db_path: SQLite 檔案路徑
+            workers: 工作者數量
+            handler: 實際處理工作的函式
+            ready: 是否可開始處理的判斷函式
+            interactive_workers: 額外保留、只處理互動工作的工作者數量
+            weights: 流量名稱 -> 公平排程權重
+        """
+        self.store = JobStore(db_path)
+        self._handler = handler
+        if ready is not None:
+            self._ready = ready
+        self._stopping.clear()
+
+        requeued = self.store.requeue_running()
+        if requeued:
+            logger.info(f"已將 {requeued} 個中斷的工作重新排入佇列")
+
+        self.fair_queue = FairQueue(weights)
+        for row in self.store.queued_flows():
+            self.fair_queue.restore(PRIORITY_CLASSES[row["priority"]], row["flow"], row["first_tag"], row["last_tag"])
+
+        for i in range(max(1, workers)):
+            self._spawn(f"job-worker-{i}", None)
+        for i in range(max(0, interactive_workers)):
+            self._spawn(f"job-worker-interactive-{i}", priority_rank(PRIORITY_INTERACTIVE))
+        logger.info(
+            f"翻譯工作佇列已啟動（{len(self._workers)} 個工作者，其中 {max(0, interactive_workers)} 個保留給互動工作）"
+        )
+
+    def _spawn(self, name: str, max_priority: Optional[int]) -> None:
+        thread = threading.Thread(target=self._run_worker, args=(max_priority,), name=name, daemon=True)
+        thread.start()
+        self._workers.append(thread)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """停止背景工作者（處理中的工作會在下次啟動時重新排隊）"""
+        self._stopping.set()
+        self.notify()
+        for thread in self._workers:
+            thread.join(timeout=timeout)
+        self._workers.clear()
+
+    def notify(self) -> None:
+        """喚醒等待中的工作者"""
+        with self._wakeup:
+            self._wakeup.notify_all()
+
+    def submit(
+        self,
+        filename: str,
+        input_path: str,
+        output_path: str,
+        output_url: str,
+        extra_prompt: str = "",
+        job_id: Optional[str] = None,
+        batch_id: Optional[str] = None,
+        page_index: Optional[int] = None,
+        priority: Optional[str] = None,
+        flow: str = ""
+    ) -> dict:
+        """
+        新增工作並喚醒工作者（保存目前的追蹤上下文，背景處理的 span 會接在同一個 trace 下）
+
+        Args:
+            priority: 優先等級（預設單頁工作為 interactive，批次頁面為 batch）
+            flow: 公平排程的流量名稱（例如用戶端 ID）
+
+        Raises:
+            ValueError: 不支援的優先等級
+        """
+        if self.store is None:
+            raise RuntimeError("工作佇列尚未啟動")
+        priority = normalize_priority(priority, PRIORITY_INTERACTIVE if batch_id is None else PRIORITY_BATCH)
+        job = self.store.create(
+            job_id or uuid.uuid4().hex, filename, input_path, output_path, output_url, extra_prompt,
+            batch_id=batch_id, page_index=page_index, trace_parent=current_traceparent(),
+            priority=priority_rank(priority), flow=flow, vtag=self.fair_queue.tag(priority, flow)
+        )
+        self.notify()
+        job_events.publish_status(EVENT_QUEUED, job)
+        return job
+
+    def wait(self, job_id: str, timeout: Optional[float] = None) -> Optional[dict]:
+        """
+        阻塞等待工作結束（成功或失敗）
+
+        Args:
+            job_id: 工作 ID
+            timeout: 最長等待秒數（None 代表一直等待）
+
+        Returns:
+            工作紀錄；逾時時回傳當下狀態，工作不存在時回傳 None
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            if job is None or job["status"] in (JobStatus.SUCCEEDED.value, JobStatus.FAILED.value):
+                return job
+            remaining = _POLL_INTERVAL if deadline is None else min(_POLL_INTERVAL, deadline - time.monotonic())
+            if remaining <= 0:
+                return job
+            with self._finished:
+                self._finished.wait(timeout=remaining)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """取得工作狀態（含排隊位置）"""
+        if self.store is None:
+            return None
+        job = self.store.get(job_id)
+        if job is not None:
+            job["queue_position"] = self.store.queue_position(job)
+        return job
+
+    def _run_worker(self, max_priority: Optional[int] = None) -> None:
+        while not self._stopping.is_set():
+            job = self.store.claim_next(max_priority) if self._ready() else None
+            if job is None:
+                with self._wakeup:
+                    self._wakeup.wait(timeout=_POLL_INTERVAL)
+                continue
+            priority = PRIORITY_CLASSES[job["priority"]]
+            self.fair_queue.advance(priority, job["vtag"])
+            job_events.publish_status(EVENT_STARTED, job)
+
+            # 排隊等待時間由建立與開始時間回推
+            tracer.record_span(
+                "queue.wait",
+                int(job["created_at"] * 1e9),
+                int(job["started_at"] * 1e9),
+                parent=job.get("trace_parent"),
+                job_id=job["id"]
+            )
+            with span("job.run", parent=job.get("trace_parent"), job_id=job["id"], priority=priority) as job_span, \
+                    priority_context(priority), stage_listener(self._stage_reporter(job)):
+                try:
+                    success, error, attempts = self._handler(job)
+                except Exception as e:
+                    logger.error(f"處理工作 {job['id']} 時發生錯誤: {e}")
+                    success, error, attempts = False, str(e), 0
+                job_span.set_attribute("success", success)
+                job_span.set_attribute("attempts", attempts)
+
+            finished_at = self.store.finish(job["id"], success, error, attempts)
+            with self._finished:
+                self._finished.notify_all()
+            job.update(
+                status=(JobStatus.SUCCEEDED if success else JobStatus.FAILED).value,
+                error=error,
+                attempts=attempts,
+                finished_at=finished_at
+            )
+            job_events.publish_status(EVENT_SUCCEEDED if success else EVENT_FAILED, job)
+            logger.info(f"工作 {job['id']} {'完成' if success else '失敗'}")
+
+    @staticmethod
+    def _stage_reporter(job: dict) -> Callable[[str, float], None]:
+        """將處理分段的耗時發布為工作進度事件"""
+        def report(stage: str, seconds: float) -> None:
+            job_events.publish(EVENT_STAGE, job, stage=stage, seconds=round(seconds, 3))
+        return report
+
+
+# 建立佇列單例（於應用程式啟動時呼叫 start）
+job_queue = JobQueue()
@@ -10,7 +10,18 @@ from typing import Optional
 import sys
 sys.path.append(str(Path(__file__).parent.parent.parent.parent))
 
-from src.ai_engine import AIEngine
+from src.ai_engine import AIEngine, ProcessResult
+from src.backends import BackendRouter
+from src.concurrency import ConcurrencyOptions
+from src.dedupe import DedupeOptions
+from src.regions import RegionOptions
+from src.image_processing import OutputOptions, normalize_format
+from src.key_pool import KeyPool, parse_api_keys
+from src.result_cache import DEFAULT_CACHE_DIR, ResultCache
+from src.text_detect import TextlessOptions
+from src.tiling import TilingOptions
+from src.tracing import span
+from ..core.config import get_settings
 from ..schemas.translation import TranslationConfig
 
 
@@ -23,6 +34,8 @@ class TranslationService:
     _instance: Optional['TranslationService'] = None
     _ai_engine: Optional[AIEngine] = None
     _config: Optional[TranslationConfig] = None
+    # 引擎由 translation_config.txt 載入的全域人名對照與提示詞（配置未提供時還原）
+    _file_defaults: tuple[dict, str] = ({}, "")
 
     def __new__(cls):
         """確保單例模式"""
@@ -34,6 +47,9 @@ class TranslationService:
         """
         配置 AI 引擎
 
+        前端每次翻譯前都會呼叫；金鑰未變更時沿用現有引擎，只更新人名對照與提示詞，
+        不會重新建立後端連線、限流與並行度狀態。
+
         Args:
             config: 翻譯配置
         """
@@ -41,15 +57,30 @@ class TranslationService:
             # 設定環境變數
             os.environ["GEMINI_API_KEY"] = config.api_key
 
-            # 重新初始化 AI 引擎
-            self._ai_engine = AIEngine()
-
-            # 更新全域設定
-            if config.name_mapping:
-                self._ai_engine.global_name_mapping = config.name_mapping
+            key_pool = self._build_key_pool(config)
+            engine = self._ai_engine
+            if engine is None or engine.key_pool is not key_pool:
+                engine = AIEngine(
+                    cache=self._build_cache(),
+                    output_options=self._build_output_options(),
+                    tiling_options=self._build_tiling_options(),
+                    router=self._build_router(),
+                    key_pool=key_pool,
+                    concurrency_options=self._build_concurrency_options(),
+                    dedupe_options=self._build_dedupe_options(),
+                    textless_options=self._build_textless_options(),
+                    region_options=self._build_region_options()
+                )
+                if len(engine.key_pool.keys) > 1:
+                    logger.info(f"API Key 金鑰池: {len(engine.key_pool.keys)} 把金鑰")
+                if engine.cache is None:
+                    logger.info("翻譯結果快取已停用")
+                self._file_defaults = (engine.global_name_mapping, engine.global_prompt)
 
-            if config.global_prompt:
-                self._ai_engine.global_prompt = config.global_prompt
+            # 更新全域設定（未提供時使用設定檔的內容）
+            engine.global_name_mapping = config.name_mapping or self._file_defaults[0]
+            engine.global_prompt = config.global_prompt or self._file_defaults[1]
+            self._ai_engine = engine
 
             self._config = config
             logger.info("翻譯服務配置成功")
@@ -58,6 +89,137 @@ class TranslationService:
             logger.error(f"配置翻譯服務失敗: {e}")
             raise
 
+    def _build_cache(self) -> ResultCache | bool:
+        """依應用程式設定建立共用的翻譯結果快取（停用時回傳 False）"""
+        settings = get_settings()
+        if not settings.translation_cache_enabled:
+            return False
+        return ResultCache.shared(
+            settings.translation_cache_dir or DEFAULT_CACHE_DIR,
+            settings.translation_cache_max_mb * 1024 * 1024
+        )
+
+    def _build_key_pool(self, config: TranslationConfig) -> KeyPool:
+        """
+        取得設定中的金鑰加上應用程式設定的 gemini_api_keys 的金鑰池
+
+        同一組金鑰共用行程內的金鑰池，重新設定時保留冷卻與統計狀態。
+        """
+        settings = get_settings()
+        return KeyPool.shared(
+            api_keys=[config.api_key, *config.api_keys, *parse_api_keys(settings.gemini_api_keys)]
+        )
+
+    def _build_concurrency_options(self) -> ConcurrencyOptions:
+        """依應用程式設定建立自適應並行度設定（上限為背景工作者總數，含保留給互動工作的工作者）"""
+        settings = get_settings()
+        options = ConcurrencyOptions.from_env()
+        return ConcurrencyOptions(
+            enabled=settings.adaptive_concurrency,
+            min_limit=settings.adaptive_min_concurrency,
+            max_limit=settings.job_workers + max(0, settings.job_interactive_workers),
+            initial_limit=settings.adaptive_initial_concurrency,
+            backoff=options.backoff,
+            latency_spike=options.latency_spike
+        )
+
+    def _build_dedupe_options(self) -> DedupeOptions:
+        """依應用程式設定建立近似重複頁面偵測設定"""
+        settings = get_settings()
+        return DedupeOptions(enabled=settings.dedupe_enabled, threshold=settings.dedupe_threshold)
+
+    def _build_textless_options(self) -> TextlessOptions:
+        """依應用程式設定建立無文字頁面偵測設定（門檻依環境變數）"""
+        settings = get_settings()
+        options = TextlessOptions.from_env()
+        return TextlessOptions(mode=settings.textless_mode, min_text_cells=options.min_text_cells)
+
+    def _build_region_options(self) -> RegionOptions:
+        """依應用程式設定建立對話框區域模式設定（邊距等參數依環境變數）"""
+        options = RegionOptions.from_env()
+        options.enabled = get_settings().region_mode
+        return options
+
+    def _build_router(self) -> BackendRouter:
+        """依應用程式設定建立翻譯後端路由（模型依 gemini_model）"""
+        settings = get_settings()
+        return BackendRouter.from_config(
+            spec=settings.translation_backends,
+            policy=settings.translation_routing,
+            model=settings.gemini_model
+        )
+
+    def _build_output_options(self) -> OutputOptions:
+        """依應用程式設定建立輸出後處理設定"""
+        settings = get_settings()
+        return OutputOptions(
+            output_format=normalize_format(settings.output_format),
+            quality=settings.output_quality,
+            progressive=settings.output_progressive,
+            restore_size=settings.output_restore_size
+        )
+
+    def _build_tiling_options(self) -> TilingOptions:
+        """依應用程式設定建立長條漫畫分塊設定"""
+        settings = get_settings()
+        options = TilingOptions.from_env()
+        return TilingOptions(
+            enabled=settings.tiling_enabled,
+            tile_height=settings.tile_height,
+            overlap=settings.tile_overlap,
+            min_aspect=options.min_aspect,
+            split_at_gutters=options.split_at_gutters,
+            workers=options.workers
+        )
+
+    def output_extension(self) -> str:
+        """輸出檔案的副檔名（含點，例如 .jpg）"""
+        if self._ai_engine is not None:
+            return self._ai_engine.output_extension
+        return self._build_output_options().extension
+
+    def cache_stats(self) -> Optional[dict]:
+        """取得翻譯結果快取統計（未配置或停用時為 None）"""
+        if self._ai_engine is None or self._ai_engine.cache is None:
+            return None
+        return self._ai_engine.cache.stats()
+
+    def rate_limit_status(self) -> Optional[dict]:
+        """取得配額限流器目前水位（未配置或停用時為 None）"""
+        if self._ai_engine is None or self._ai_engine.rate_limiter is None:
+            return None
+        return self._ai_engine.rate_limiter.fill_level()
+
+    def key_stats(self) -> Optional[list[dict]]:
+        """取得各 API Key 的請求數、成功/失敗、配額限制次數與冷卻狀態（未配置時為 None）"""
+        if self._ai_engine is None:
+            return None
+        return self._ai_engine.key_pool.stats()
+
+    def textless_stats(self) -> Optional[dict]:
+        """取得無文字頁面的判斷與略過次數、估計省下的秒數（未配置或停用時為 None）"""
+        if self._ai_engine is None:
+            return None
+        return self._ai_engine.textless_stats_summary()
+
+    def dedupe_stats(self) -> Optional[dict]:
+        """取得近似重複頁面的沿用次數與節省的 API 呼叫數（未配置或停用時為 None）"""
+        if self._ai_engine is None:
+            return None
+        return self._ai_engine.dedupe_stats()
+
+    def concurrency_stats(self) -> Optional[list[dict]]:
+        """取得各後端自適應並行度的目前上限（未配置時為 None，停用時為空清單）"""
+        if self._ai_engine is None:
+            return None
+        return self._ai_engine.concurrency_stats()
+
+    def backend_stats(self) -> Optional[list[dict]]:
+        """取得各翻譯後端的延遲與成功/失敗統計（未配置時為 None）"""
+        if self._ai_engine is None:
+            return None
+        return self._ai_engine.router.stats()
+
     def is_configured(self) -> bool:
         """檢查服務是否已配置"""
         return self._ai_engine is not None and self._config is not None
@@ -67,7 +229,7 @@ class TranslationService:
         input_path: str,
         output_path: str,
         extra_prompt: str = ""
-    ) -> bool:
+    ) -> ProcessResult:
         """
         翻譯單張圖片
 
@@ -77,7 +239,7 @@ class TranslationService:
             extra_prompt: 額外的提示詞
 
         Returns:
-            是否成功
+            處理結果（含嘗試次數與重試紀錄，可當布林值判斷是否成功）
 
         Raises:
             RuntimeError: 如果服務未配置
@@ -90,18 +252,51 @@ class TranslationService:
             Path(output_path).parent.mkdir(parents=True, exist_ok=True)
 
             # 呼叫 AI 引擎處理圖片
-            success = self._ai_engine.process_image(
-                image_path=input_path,
-                output_path=output_path,
-                extra_prompt=extra_prompt
-            )
+            with span("service.translate_image", input=Path(input_path).name) as service_span:
+                result = self._ai_engine.process_image(
+                    image_path=input_path,
+                    output_path=output_path,
+                    extra_prompt=extra_prompt
+                )
+                service_span.set_attribute("success", result.success)
 
-            return success
+            return result
 
         except Exception as e:
             logger.error(f"翻譯圖片失敗 ({input_path}): {e}")
             raise
 
+    def run_job(self, job: dict) -> tuple[bool, Optional[str], int]:
+        """
+        處理工作佇列中的一筆工作（於背景執行緒呼叫）
+
+        Args:
+            job: 工作紀錄
+
+        Returns:
+            (是否成功, 錯誤訊息, 嘗試次數)
+        """
+        try:
+            result = self.translate_image(
+                input_path=job["input_path"],
+                output_path=job["output_path"],
+                extra_prompt=job["extra_prompt"]
+            )
+            return result.success, result.error, result.attempts
+        finally:
+            # 清理暫存檔案
+            try:
+                input_path = Path(job["input_path"])
+                input_path.unlink(missing_ok=True)
+                if job.get("batch_id"):
+                    # 批次頁面放在 uploads/<batch_id>/，最後一頁處理完後移除空資料夾
+                    try:
+                        input_path.parent.rmdir()
+                    except OSError:
+                        pass
+            except Exception as e:
+                logger.warning(f"清理暫存檔案失敗: {e}")
+
     def get_config(self) -> Optional[TranslationConfig]:
         """取得當前配置"""
         return self._config
@@ -0,0 +1,301 @@
+"""
+本機模擬的 Gemini generateContent 端點（離線壓測用，不消耗真實配額）
+
+回應格式與 Gemini REST API 相同，AIEngine 只要設定 GEMINI_BASE_URL 指向此伺服器即可。
+可設定：
+- 延遲分佈：對數常態（中位數 + sigma，sigma 為 0 時為固定延遲）
+- 錯誤率：依機率回傳 429 / 500 / 503 等狀態碼，驗證重試路徑
+- 回傳圖片：原圖照回（echo），或固定尺寸的合成圖片（模擬模型輸出大小）
+
+單獨啟動：
+    python benchmarks/fake_gemini.py --port 8765 --latency-ms 800 --error-rate 0.05
+"""
+import argparse
+import base64
+import io
+import json
+import logging
+import math
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+_GENERATE_PATH = re.compile(r"^/[^/]+/models/([^/:]+):generateContent$")
+
+
+@dataclass
+class FakeGeminiConfig:
+    """
+    模擬伺服器設定
+
+    Attributes:
+        latency_ms: 延遲中位數（毫秒）
+        latency_sigma: 對數常態分佈的 sigma（0 為固定延遲）
+        error_rate: 回傳錯誤的機率（0-1）
+        error_codes: 隨機挑選的錯誤狀態碼
+        retry_after: 429 回應附帶的 Retry-After 秒數（None 不附帶）
+        payload_size: 回傳圖片尺寸 (寬, 高)，None 代表原圖照回
+        capacity: 同時處理的請求數上限，超過時立即回應 429（None 為不限制，模擬上游容量）
+        seed: 亂數種子（固定種子可重現同一組延遲與錯誤序列）
+    """
+
+    latency_ms: float = 500.0
+    latency_sigma: float = 0.3
+    error_rate: float = 0.0
+    error_codes: tuple[int, ...] = (429, 500, 503)
+    retry_after: Optional[float] = None
+    payload_size: Optional[tuple[int, int]] = None
+    capacity: Optional[int] = None
+    seed: Optional[int] = None
+
+    def to_dict(self):
+        return {
+            "latency_ms": self.latency_ms,
+            "latency_sigma": self.latency_sigma,
+            "error_rate": self.error_rate,
+            "error_codes": list(self.error_codes),
+            "retry_after": self.retry_after,
+            "payload_size": list(self.payload_size) if self.payload_size else "echo",
+            "capacity": self.capacity,
+            "seed": self.seed,
+        }
+
+
+@dataclass
+class FakeGeminiStats:
+    """伺服器端統計"""
+
+    requests: int = 0
+    errors: int = 0
+    in_flight: int = 0
+    peak_in_flight: int = 0
+    status_counts: dict = field(default_factory=dict)
+
+
+def _synthetic_image(size):
+    """產生固定尺寸的合成圖片（雜訊紋理，JPEG 大小接近真實漫畫頁）"""
+    image = Image.effect_noise(size, 64).convert("RGB")
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+
+class FakeGeminiServer:
+    """
+    在背景執行緒中執行的模擬伺服器
+
+    用法：
+        with FakeGeminiServer(FakeGeminiConfig(latency_ms=200)) as server:
+            os.environ["GEMINI_BASE_URL"] = server.url
+    """
+
+    def __init__(self, config=None, host="127.0.0.1", port=0):
+        self.config = config or FakeGeminiConfig()
+        self.stats = FakeGeminiStats()
+        self._lock = threading.Lock()
+        self._random = random.Random(self.config.seed)
+        self._payload = _synthetic_image(self.config.payload_size) if self.config.payload_size else None
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake-gemini", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def snapshot(self):
+        """目前統計的字典副本"""
+        with self._lock:
+            return {
+                "requests": self.stats.requests,
+                "errors": self.stats.errors,
+                "peak_in_flight": self.stats.peak_in_flight,
+                "status_counts": dict(self.stats.status_counts),
+            }
+
+    def _draw(self):
+        """抽出這次請求的延遲秒數與錯誤狀態碼（None 代表成功）"""
+        with self._lock:
+            if self.config.latency_sigma > 0:
+                delay = self.config.latency_ms * math.exp(self._random.gauss(0, self.config.latency_sigma))
+            else:
+                delay = self.config.latency_ms
+            error = None
+            if self.config.error_codes and self._random.random() < self.config.error_rate:
+                error = self._random.choice(self.config.error_codes)
+        return delay / 1000, error
+
+    def _record(self, status, started):
+        """記錄請求開始或結束；開始時回傳是否超過容量"""
+        with self._lock:
+            if started:
+                self.stats.requests += 1
+                self.stats.in_flight += 1
+                self.stats.peak_in_flight = max(self.stats.peak_in_flight, self.stats.in_flight)
+                return self.config.capacity is not None and self.stats.in_flight > self.config.capacity
+            self.stats.in_flight -= 1
+            self.stats.status_counts[status] = self.stats.status_counts.get(status, 0) + 1
+            if status != 200:
+                self.stats.errors += 1
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+            def _send_json(self, status, body, headers=None):
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length)
+                if not _GENERATE_PATH.match(self.path.split("?", 1)[0]):
+                    self._send_json(404, {"error": {"code": 404, "message": "not found", "status": "NOT_FOUND"}})
+                    return
+
+                overloaded = server._record(None, started=True)
+                status = 200
+                try:
+                    delay, error = server._draw()
+                    if overloaded:
+                        # 超過容量：不排隊，立即拒絕
+                        delay, error = 0, 429
+                    time.sleep(delay)
+                    if error is not None:
+                        status = error
+                        headers = {}
+                        if error == 429 and server.config.retry_after is not None:
+                            headers["Retry-After"] = f"{server.config.retry_after:g}"
+                        self._send_json(error, {
+                            "error": {"code": error, "message": "injected error", "status": "UNAVAILABLE"}
+                        }, headers)
+                        return
+
+                    request = json.loads(body or b"{}")
+                    image_part, prompt_chars = None, 0
+                    for content in request.get("contents", []):
+                        for part in content.get("parts", []):
+                            if "inlineData" in part:
+                                image_part = part["inlineData"]
+                            elif "text" in part:
+                                prompt_chars += len(part["text"])
+
+                    if server._payload is not None:
+                        data, mime_type = base64.b64encode(server._payload).decode(), "image/jpeg"
+                    elif image_part is not None:
+                        data, mime_type = image_part["data"], image_part.get("mimeType", "image/jpeg")
+                    else:
+                        status = 400
+                        self._send_json(400, {"error": {"code": 400, "message": "no image", "status": "INVALID_ARGUMENT"}})
+                        return
+
+                    prompt_tokens = prompt_chars + 1120
+                    self._send_json(200, {
+                        "candidates": [{
+                            "content": {"role": "model", "parts": [{"inlineData": {"mimeType": mime_type, "data": data}}]},
+                            "finishReason": "STOP",
+                        }],
+                        "usageMetadata": {
+                            "promptTokenCount": prompt_tokens,
+                            "candidatesTokenCount": 1290,
+                            "totalTokenCount": prompt_tokens + 1290,
+                        },
+                    })
+                finally:
+                    server._record(status, started=False)
+
+        return Handler
+
+
+def parse_size(value):
+    """將 "1024x1536" 轉為 (1024, 1536)；"echo" 或空值回傳 None"""
+    if not value or value.lower() == "echo":
+        return None
+    width, height = value.lower().split("x")
+    return int(width), int(height)
+
+
+def add_server_arguments(parser):
+    """加入模擬伺服器的命令列參數（run.py 共用）"""
+    parser.add_argument("--latency-ms", type=float, default=500.0, help="延遲中位數（毫秒，預設 500）")
+    parser.add_argument("--latency-sigma", type=float, default=0.3, help="對數常態 sigma（0 為固定延遲，預設 0.3）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="注入錯誤的機率 0-1（預設 0）")
+    parser.add_argument("--error-codes", default="429,500,503", help="注入的錯誤狀態碼（逗號分隔）")
+    parser.add_argument("--retry-after", type=float, default=None, help="429 回應附帶的 Retry-After 秒數")
+    parser.add_argument("--payload-size", default="echo", help="回傳圖片尺寸 WxH，或 echo 照回原圖（預設）")
+    parser.add_argument("--capacity", type=int, default=None, help="同時處理的請求數上限，超過時立即回應 429（預設不限制）")
+    parser.add_argument("--seed", type=int, default=None, help="亂數種子")
+
+
+def config_from_args(args):
+    return FakeGeminiConfig(
+        latency_ms=args.latency_ms,
+        latency_sigma=args.latency_sigma,
+        error_rate=args.error_rate,
+        error_codes=tuple(int(code) for code in args.error_codes.split(",") if code.strip()),
+        retry_after=args.retry_after,
+        payload_size=parse_size(args.payload_size),
+        capacity=args.capacity,
+        seed=args.seed,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本機模擬 Gemini generateContent 端點")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    server = FakeGeminiServer(config_from_args(args), host=args.host, port=args.port).start()
+    logger.info(f"模擬 Gemini 伺服器已啟動: {server.url}（設定 GEMINI_BASE_URL={server.url}）")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+        logger.info(f"伺服器統計: {server.snapshot()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""
+離線壓測：以本機模擬的 Gemini 伺服器量測各前端的吞吐量與延遲
+
+每個 (前端, 並行度) 組合在獨立子行程中執行，回報：
+pages/sec、p50/p95/p99 延遲、峰值 RSS、CPU 時間，並寫入 benchmarks/results/ 的 JSON，
+可用 --compare 與先前的結果比較，找出效能退化。
+
+範例：
+    python benchmarks/run.py --frontends cli,fastapi --concurrency 1,4,8 --pages 40
+    python benchmarks/run.py --latency-ms 2000 --error-rate 0.05 --compare benchmarks/results/baseline.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+PROJECT_ROOT = BENCH_DIR.parent
+sys.path.insert(0, str(BENCH_DIR))
+
+from fake_gemini import FakeGeminiServer, add_server_arguments, config_from_args
+
+RESULTS_DIR = BENCH_DIR / "results"
+SCHEMA_VERSION = 1
+
+# 與基準相比，吞吐量下降或 p95 延遲上升超過此比例即視為退化
+DEFAULT_REGRESSION_THRESHOLD = 0.10
+
+
+def percentile(values, pct):
+    """最近秩法百分位數（values 為空時回傳 None）"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[rank]
+
+
+def summarize(raw):
+    """將子行程的原始結果整理為報告欄位"""
+    latencies = raw["latencies_s"]
+    elapsed = raw["elapsed_s"]
+    return {
+        "frontend": raw["frontend"],
+        "concurrency": raw["concurrency"],
+        "pages": raw["pages"],
+        "succeeded": raw["succeeded"],
+        "failed": raw["failed"],
+        "elapsed_s": round(elapsed, 3),
+        "pages_per_sec": round(raw["succeeded"] / elapsed, 3) if elapsed > 0 else None,
+        "latency_p50_s": _round(percentile(latencies, 50)),
+        "latency_p95_s": _round(percentile(latencies, 95)),
+        "latency_p99_s": _round(percentile(latencies, 99)),
+        "peak_rss_mb": round(raw["peak_rss_mb"], 1),
+        "cpu_s": round(raw["cpu_s"], 3),
+        "cpu_per_page_ms": round(raw["cpu_s"] / raw["pages"] * 1000, 1) if raw["pages"] else None,
+    }
+
+
+def _round(value):
+    return round(value, 3) if value is not None else None
+
+
+def run_scenario(frontend, concurrency, args, env):
+    """在子行程中執行單一情境，回傳整理後的結果（失敗時回傳 None）"""
+    command = [
+        sys.executable, str(BENCH_DIR / "scenario.py"),
+        "--frontend", frontend,
+        "--concurrency", str(concurrency),
+        "--pages", str(args.pages),
+        "--page-size", args.page_size,
+    ]
+    completed = subprocess.run(command, env=env, cwd=PROJECT_ROOT, capture_output=True, text=True)
+    if completed.returncode != 0:
+        print(f"  ✗ {frontend} x{concurrency} 失敗:\n{completed.stderr[-2000:]}", file=sys.stderr)
+        return None
+    return summarize(json.loads(completed.stdout.strip().splitlines()[-1]))
+
+
+def scenario_env(server_url, args):
+    """子行程環境：指向模擬伺服器，停用快取與限流，縮短重試退避"""
+    env = dict(os.environ)
+    env.update({
+        "GEMINI_API_KEY": "benchmark-key",
+        "GEMINI_BASE_URL": server_url,
+        "GEMINI_RPM": "0",
+        "GEMINI_TPM": "0",
+        "GEMINI_RETRY_BASE_DELAY": str(args.retry_base_delay),
+        "TRANSLATION_CACHE_ENABLED": "false",
+        "PYTHONPATH": str(PROJECT_ROOT),
+    })
+    return env
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=PROJECT_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_table(results, baseline=None):
+    header = (
+        f"{'前端':<8}{'並行':>5}{'成功':>6}{'失敗':>5}{'pages/s':>9}"
+        f"{'p50':>8}{'p95':>8}{'p99':>8}{'RSS MB':>9}{'CPU ms/頁':>11}"
+    )
+    print(header)
+    print("-" * len(header))
+    for row in results:
+        line = (
+            f"{row['frontend']:<8}{row['concurrency']:>5}{row['succeeded']:>6}{row['failed']:>5}"
+            f"{row['pages_per_sec'] or 0:>9.2f}"
+            f"{row['latency_p50_s'] or 0:>8.2f}{row['latency_p95_s'] or 0:>8.2f}{row['latency_p99_s'] or 0:>8.2f}"
+            f"{row['peak_rss_mb']:>9.1f}{row['cpu_per_page_ms'] or 0:>11.1f}"
+        )
+        if baseline is not None:
+            previous = baseline.get((row["frontend"], row["concurrency"]))
+            if previous is not None:
+                line += "  " + _format_delta(row, previous)
+        print(line)
+
+
+def _relative_change(current, previous):
+    if current is None or not previous:
+        return None
+    return (current - previous) / previous
+
+
+def _format_delta(row, previous):
+    throughput = _relative_change(row["pages_per_sec"], previous["pages_per_sec"])
+    p95 = _relative_change(row["latency_p95_s"], previous["latency_p95_s"])
+    parts = []
+    if throughput is not None:
+        parts.append(f"吞吐 {throughput:+.0%}")
+    if p95 is not None:
+        parts.append(f"p95 {p95:+.0%}")
+    return " / ".join(parts)
+
+
+def find_regressions(results, baseline, threshold):
+    """回傳退化的情境說明清單"""
+    regressions = []
+    for row in results:
+        previous = baseline.get((row["frontend"], row["concurrency"]))
+        if previous is None:
+            continue
+        throughput = _relative_change(row["pages_per_sec"], previous["pages_per_sec"])
+        p95 = _relative_change(row["latency_p95_s"], previous["latency_p95_s"])
+        if throughput is not None and throughput < -threshold:
+            regressions.append(f"{row['frontend']} x{row['concurrency']}: 吞吐量 {throughput:+.0%}")
+        if p95 is not None and p95 > threshold:
+            regressions.append(f"{row['frontend']} x{row['concurrency']}: p95 延遲 {p95:+.0%}")
+    return regressions
+
+
+def load_baseline(path):
+    with open(path, encoding="utf-8") as f:
+        report = json.load(f)
+    return {(row["frontend"], row["concurrency"]): row for row in report["results"]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="離線壓測（本機模擬 Gemini 伺服器）")
+    parser.add_argument("--frontends", default="cli,flask,fastapi", help="要量測的前端（逗號分隔）")
+    parser.add_argument("--concurrency", default="1,4", help="並行度清單（逗號分隔）")
+    parser.add_argument("--pages", type=int, default=20, help="每個情境的頁數（預設 20）")
+    parser.add_argument("--page-size", default="1200x1800", help="合成頁面尺寸 WxH（預設 1200x1800）")
+    parser.add_argument("--retry-base-delay", type=float, default=0.2, help="重試退避基準秒數（預設 0.2）")
+    parser.add_argument("--output", help="結果 JSON 路徑（預設 benchmarks/results/<時間>_<版本>.json）")
+    parser.add_argument("--compare", help="與先前的結果 JSON 比較")
+    parser.add_argument(
+        "--regression-threshold", type=float, default=DEFAULT_REGRESSION_THRESHOLD,
+        help="退化判定門檻（比例，預設 0.10）"
+    )
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    frontends = [name.strip() for name in args.frontends.split(",") if name.strip()]
+    levels = [int(level) for level in args.concurrency.split(",") if level.strip()]
+    baseline = load_baseline(args.compare) if args.compare else None
+
+    server_config = config_from_args(args)
+    results = []
+    with FakeGeminiServer(server_config) as server:
+        env = scenario_env(server.url, args)
+        for frontend in frontends:
+            for concurrency in levels:
+                print(f"▶ {frontend} x{concurrency} ({args.pages} 頁)...", flush=True)
+                row = run_scenario(frontend, concurrency, args, env)
+                if row is not None:
+                    results.append(row)
+        server_stats = server.snapshot()
+
+    revision = git_revision()
+    report = {
+        "schema_version": SCHEMA_VERSION,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_revision": revision,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "pages": args.pages,
+        "page_size": args.page_size,
+        "fake_server": server_config.to_dict(),
+        "fake_server_stats": server_stats,
+        "results": results,
+    }
+
+    output = Path(args.output) if args.output else (
+        RESULTS_DIR / f"{time.strftime('%Y%m%d-%H%M%S')}_{revision}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print()
+    print_table(results, baseline)
+    print(f"\n模擬伺服器: {server_stats['requests']} 次請求, {server_stats['errors']} 次注入錯誤, "
+          f"同時處理峰值 {server_stats['peak_in_flight']}")
+    print(f"結果已寫入: {output}")
+
+    if baseline is not None:
+        regressions = find_regressions(results, baseline, args.regression_threshold)
+        if regressions:
+            print("\n⚠️  偵測到效能退化:")
+            for message in regressions:
+                print(f"  - {message}")
+            sys.exit(1)
+        print("\n與基準相比未偵測到效能退化。")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""
+單一壓測情境（由 run.py 以子行程執行，讓峰值 RSS 與 CPU 時間只反映該前端）
+
+前端：
+- cli: main.run_batch（ThreadPoolExecutor，--workers）
+- flask: app.py，以多個客戶端執行緒同時上傳
+- fastapi: backend/api，送出工作後輪詢 /api/jobs/{id} 直到完成
+
+結果以一行 JSON 輸出到 stdout。GEMINI_BASE_URL 必須指向模擬伺服器。
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import resource
+import socket
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from PIL import Image
+
+FRONTENDS = ("cli", "flask", "fastapi")
+POLL_INTERVAL = 0.05
+
+# ru_maxrss 在 Linux 的單位為 KB，macOS 為位元組
+RSS_UNITS_PER_MB = 1024 * 1024 if sys.platform == "darwin" else 1024
+
+
+def make_pages(directory, count, size, seed=0):
+    """產生 count 張內容各不相同的合成頁面（避免命中快取），回傳檔案路徑清單"""
+    directory.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+    noise = Image.effect_noise(size, 48).convert("RGB")
+    paths = []
+    for index in range(count):
+        page = noise.copy()
+        # 每頁塗上不同色塊，確保內容雜湊不同
+        page.paste(
+            (rng.randrange(256), rng.randrange(256), rng.randrange(256)),
+            (0, 0, size[0] // 4, size[1] // 8)
+        )
+        path = directory / f"page_{index + 1:04d}.jpg"
+        page.save(path, format="JPEG", quality=90)
+        paths.append(path)
+    return paths
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def run_cli(pages, workdir, concurrency):
+    from main import run_batch
+    from src.ai_engine import AIEngine
+    from src.archive import FolderOutput, PageSource
+
+    engine = AIEngine()
+    latencies = []
+    translate = engine.translate_image_bytes
+
+    def timed_translate(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return translate(*args, **kwargs)
+        finally:
+            latencies.append(time.perf_counter() - started)
+
+    engine.translate_image_bytes = timed_translate
+
+    started = time.perf_counter()
+    with PageSource(str(pages[0].parent)) as source:
+        output = FolderOutput(str(workdir / "output"), engine.output_extension)
+        try:
+            stats = run_batch(engine, source.pages, output, workers=concurrency)
+        finally:
+            output.close()
+    elapsed = time.perf_counter() - started
+    return elapsed, latencies, stats["success"], stats["failed"]
+
+
+def _run_clients(pages, concurrency, request_page):
+    """以 concurrency 個客戶端執行緒送出所有頁面，回傳 (耗時, 延遲清單, 成功數, 失敗數)"""
+    latencies = []
+    outcomes = {"success": 0, "failed": 0}
+    lock = threading.Lock()
+
+    def worker(path):
+        started = time.perf_counter()
+        ok = request_page(path)
+        with lock:
+            latencies.append(time.perf_counter() - started)
+            outcomes["success" if ok else "failed"] += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(worker, pages))
+    return time.perf_counter() - started, latencies, outcomes["success"], outcomes["failed"]
+
+
+def run_flask(pages, workdir, concurrency):
+    import httpx
+    from werkzeug.serving import make_server
+
+    import app as flask_app
+
+    port = _free_port()
+    server = make_server("127.0.0.1", port, flask_app.app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    client = httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=600)
+
+    def request_page(path):
+        with open(path, "rb") as f:
+            response = client.post("/upload", files={"file": (path.name, f, "image/jpeg")})
+        return response.status_code == 200 and response.json().get("success")
+
+    try:
+        return _run_clients(pages, concurrency, request_page)
+    finally:
+        client.close()
+        server.shutdown()
+
+
+def run_fastapi(pages, workdir, concurrency):
+    import httpx
+    import uvicorn
+
+    # 工作佇列的 worker 數即後端的並行度
+    os.environ["JOB_WORKERS"] = str(concurrency)
+    os.environ["JOB_DB_PATH"] = str(workdir / "jobs.sqlite")
+
+    from backend.api.main import app as fastapi_app
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(fastapi_app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+
+    client = httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=600)
+    client.post("/api/config", json={"api_key": os.environ["GEMINI_API_KEY"]}).raise_for_status()
+
+    def request_page(path):
+        with open(path, "rb") as f:
+            response = client.post("/api/translate", files={"file": (path.name, f, "image/jpeg")})
+        if response.status_code != 202:
+            return False
+        job_id = response.json()["job_id"]
+        while True:
+            job = client.get(f"/api/jobs/{job_id}").json()
+            if job["status"] in ("succeeded", "failed"):
+                return job["status"] == "succeeded"
+            time.sleep(POLL_INTERVAL)
+
+    try:
+        return _run_clients(pages, concurrency, request_page)
+    finally:
+        client.close()
+        server.should_exit = True
+        thread.join()
+
+
+RUNNERS = {"cli": run_cli, "flask": run_flask, "fastapi": run_fastapi}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="執行單一壓測情境")
+    parser.add_argument("--frontend", choices=FRONTENDS, required=True)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--page-size", default="1200x1800")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    if not os.getenv("GEMINI_BASE_URL"):
+        parser.error("未設定 GEMINI_BASE_URL（請透過 run.py 執行，或先啟動 fake_gemini.py）")
+
+    width, height = (int(value) for value in args.page_size.lower().split("x"))
+
+    with tempfile.TemporaryDirectory(prefix="bench-") as tmp:
+        workdir = Path(tmp)
+        pages = make_pages(workdir / "input", args.pages, (width, height))
+        # 各前端的相對路徑（uploads/、outputs/、設定檔）都落在暫存目錄
+        os.chdir(workdir)
+
+        usage_before = resource.getrusage(resource.RUSAGE_SELF)
+        elapsed, latencies, succeeded, failed = RUNNERS[args.frontend](pages, workdir, args.concurrency)
+        usage_after = resource.getrusage(resource.RUSAGE_SELF)
+
+    cpu_seconds = (
+        (usage_after.ru_utime - usage_before.ru_utime)
+        + (usage_after.ru_stime - usage_before.ru_stime)
+    )
+    print(json.dumps({
+        "frontend": args.frontend,
+        "concurrency": args.concurrency,
+        "pages": args.pages,
+        "succeeded": succeeded,
+        "failed": failed,
+        "elapsed_s": elapsed,
+        "latencies_s": latencies,
+        "peak_rss_mb": usage_after.ru_maxrss / RSS_UNITS_PER_MB,
+        "cpu_s": cpu_seconds,
+    }))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,9 @@
 import axios from 'axios';
 
+export const API_BASE_URL = import.meta.env.VITE_API_BASE_URL || '/api';
+
 const apiClient = axios.create({
-  baseURL: import.meta.env.VITE_API_BASE_URL || '/api',
+  baseURL: API_BASE_URL,
   timeout: 60000, // 圖片處理可能較慢，設定 60 秒
   headers: {
     'Content-Type': 'application/json',
@@ -32,4 +34,12 @@ apiClient.interceptors.response.use(
   }
 );
 
+// 開啟 Server-Sent Events 串流（瀏覽器不支援 EventSource 時回傳 null）
+export function openEventStream(path: string): EventSource | null {
+  if (typeof EventSource === 'undefined') {
+    return null;
+  }
+  return new EventSource(`${API_BASE_URL}${path}`);
+}
+
 export default apiClient;
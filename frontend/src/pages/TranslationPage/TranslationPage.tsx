@@ -3,11 +3,39 @@
 import { useState } from 'react';
 import { ImageUploader } from './image-upload';
 import { TranslationResult, useTranslation } from './translation';
+import type { JobProgress } from './translation';
 import { Button } from '@/shared/components/ui/Button';
 
+// 處理分段的顯示名稱（分段定義見 src/metrics.py）
+const STAGE_LABELS: Record<string, string> = {
+  read: '讀取圖片',
+  textless: '判斷是否有文字',
+  regions: '尋找文字區域',
+  prompt: '組合提示詞',
+  prepare: '壓縮圖片',
+  cache: '查詢快取',
+  dedupe: '比對相似頁面',
+  rate_limit_wait: '等待配額',
+  concurrency_wait: '等待可用名額',
+  model: 'AI 翻譯',
+  finalize: '處理輸出圖片',
+  write: '儲存結果',
+};
+
+function describeProgress(progress: JobProgress | null): string {
+  if (!progress || progress.status === 'queued') {
+    return progress?.queuePosition ? `排隊中（第 ${progress.queuePosition} 位）` : '排隊中...';
+  }
+  if (progress.stage) {
+    const label = STAGE_LABELS[progress.stage] ?? progress.stage;
+    return `${label}完成（${progress.stageSeconds?.toFixed(1)} 秒）`;
+  }
+  return 'AI 正在翻譯中，請稍候...';
+}
+
 export function TranslationPage() {
   const [selectedImage, setSelectedImage] = useState<File | null>(null);
-  const { translate, isTranslating, result, clearResult } = useTranslation();
+  const { translate, isTranslating, progress, result, clearResult } = useTranslation();
 
   const handleImageSelected = (file: File) => {
     setSelectedImage(file);
@@ -57,7 +85,7 @@ export function TranslationPage() {
           {isTranslating && (
             <div className="flex flex-col items-center justify-center h-full space-y-4">
               <span className="loading loading-spinner loading-lg"></span>
-              <p className="text-lg">AI 正在翻譯中，請稍候...</p>
+              <p className="text-lg">{describeProgress(progress)}</p>
               <p className="text-sm opacity-60">這可能需要 10-30 秒</p>
             </div>
           )}
@@ -1,10 +1,13 @@
-// Translation 功能統一匯出
-
-export { TranslationResult } from './TranslationResult';
-export { useTranslation } from './useTranslation';
-export { translationApi } from './translationApi';
-export type {
-  TranslationRequest,
-  TranslationResponse,
-  TranslationResult as TranslationResultType,
-} from './translation.types';
+// Translation 功能統一匯出
+
+export { TranslationResult } from './TranslationResult';
+export { useTranslation } from './useTranslation';
+export { translationApi } from './translationApi';
+export type {
+  TranslationRequest,
+  TranslationResponse,
+  TranslationJob,
+  JobStatus,
+  JobProgress,
+  TranslationResult as TranslationResultType,
+} from './translation.types';
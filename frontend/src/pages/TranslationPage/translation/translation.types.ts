@@ -1,20 +1,47 @@
-// Translation 型別定義
-
-export interface TranslationRequest {
-  image: File;
-  nameMapping?: Record<string, string>;
-  extraPrompt?: string;
-}
-
-export interface TranslationResponse {
-  success: boolean;
-  outputPath?: string;
-  filename?: string;
-  error?: string;
-}
-
-export interface TranslationResult {
-  imageUrl: string;
-  filename: string;
-  timestamp: Date;
-}
+// Translation 型別定義
+
+export interface TranslationRequest {
+  image: File;
+  nameMapping?: Record<string, string>;
+  extraPrompt?: string;
+}
+
+export interface TranslationResponse {
+  success: boolean;
+  output_url?: string;
+  filename: string;
+  error?: string;
+}
+
+export type JobStatus = 'queued' | 'running' | 'succeeded' | 'failed';
+
+export interface TranslationJob {
+  job_id: string;
+  status: JobStatus;
+  filename: string;
+  output_url?: string | null;
+  error?: string | null;
+  attempts: number;
+  queue_position?: number | null;
+  priority?: string;
+  created_at: number;
+  started_at?: number | null;
+  finished_at?: number | null;
+}
+
+// 工作進度事件（GET /api/jobs/{job_id}/events）
+export type JobEventType = 'snapshot' | 'queued' | 'started' | 'stage' | 'succeeded' | 'failed' | 'resync';
+
+export interface JobProgress {
+  status: JobStatus;
+  queuePosition?: number | null;
+  // 最近完成的處理分段（prepare / model / finalize ...）與耗時（秒）
+  stage?: string;
+  stageSeconds?: number;
+}
+
+export interface TranslationResult {
+  imageUrl: string;
+  filename: string;
+  timestamp: Date;
+}
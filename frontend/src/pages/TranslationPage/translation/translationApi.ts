@@ -1,51 +1,140 @@
-// Translation API
-
-import apiClient from '@/api/client';
-import type { TranslationRequest, TranslationResponse } from './translation.types';
-
-export const translationApi = {
-  // 設定翻譯配置
-  async setConfig(config: {
-    api_key: string;
-    name_mapping?: Record<string, string>;
-    global_prompt?: string;
-  }): Promise<{ ok: boolean; message: string }> {
-    const response = await apiClient.post('/config', config);
-    return response.data;
-  },
-
-  // 翻譯圖片
-  async translateImage(request: TranslationRequest): Promise<TranslationResponse> {
-    const formData = new FormData();
-    formData.append('file', request.image);
-
-    if (request.nameMapping && Object.keys(request.nameMapping).length > 0) {
-      formData.append('name_mapping', JSON.stringify(request.nameMapping));
-    }
-
-    if (request.extraPrompt) {
-      formData.append('extra_prompt', request.extraPrompt);
-    }
-
-    const response = await apiClient.post<TranslationResponse>(
-      '/translate',
-      formData,
-      {
-        headers: {
-          'Content-Type': 'multipart/form-data',
-        },
-      }
-    );
-
-    return response.data;
-  },
-
-  // 下載翻譯結果
-  async downloadResult(filename: string): Promise<Blob> {
-    const response = await apiClient.get(`/download/${filename}`, {
-      responseType: 'blob',
-    });
-
-    return response.data;
-  },
-};
+// Translation API
+
+import apiClient, { openEventStream } from '@/api/client';
+import type {
+  JobProgress,
+  TranslationJob,
+  TranslationRequest,
+  TranslationResponse,
+} from './translation.types';
+
+// 無法使用事件串流時，查詢工作狀態的間隔（毫秒）
+const JOB_POLL_INTERVAL = 1500;
+
+const isFinished = (job: TranslationJob) => job.status === 'succeeded' || job.status === 'failed';
+
+const sleep = (ms: number) => new Promise((resolve) => setTimeout(resolve, ms));
+
+export const translationApi = {
+  // 設定翻譯配置
+  async setConfig(config: {
+    api_key: string;
+    name_mapping?: Record<string, string>;
+    global_prompt?: string;
+  }): Promise<{ ok: boolean; message: string }> {
+    const response = await apiClient.post('/config', config);
+    return response.data;
+  },
+
+  // 建立翻譯工作（立即回傳工作 ID）
+  async submitTranslation(request: TranslationRequest): Promise<TranslationJob> {
+    const formData = new FormData();
+    formData.append('file', request.image);
+
+    if (request.nameMapping && Object.keys(request.nameMapping).length > 0) {
+      formData.append('name_mapping', JSON.stringify(request.nameMapping));
+    }
+
+    if (request.extraPrompt) {
+      formData.append('extra_prompt', request.extraPrompt);
+    }
+
+    const response = await apiClient.post<TranslationJob>(
+      '/translate',
+      formData,
+      {
+        headers: {
+          'Content-Type': 'multipart/form-data',
+        },
+      }
+    );
+
+    return response.data;
+  },
+
+  // 查詢翻譯工作狀態
+  async getJob(jobId: string): Promise<TranslationJob> {
+    const response = await apiClient.get<TranslationJob>(`/jobs/${jobId}`);
+    return response.data;
+  },
+
+  // 輪詢等待工作結束
+  async pollJob(job: TranslationJob, onProgress?: (progress: JobProgress) => void): Promise<TranslationJob> {
+    while (!isFinished(job)) {
+      await sleep(JOB_POLL_INTERVAL);
+      job = await this.getJob(job.job_id);
+      onProgress?.({ status: job.status, queuePosition: job.queue_position });
+    }
+    return job;
+  },
+
+  // 以 Server-Sent Events 等待工作結束，串流無法建立時改為輪詢
+  waitForJob(job: TranslationJob, onProgress?: (progress: JobProgress) => void): Promise<TranslationJob> {
+    const source = isFinished(job) ? null : openEventStream(`/jobs/${job.job_id}/events`);
+    if (!source) {
+      return this.pollJob(job, onProgress);
+    }
+
+    return new Promise((resolve, reject) => {
+      let current = job;
+      const finish = (next: TranslationJob) => {
+        source.close();
+        resolve(next);
+      };
+      const update = (next: TranslationJob) => {
+        current = next;
+        onProgress?.({ status: next.status, queuePosition: next.queue_position });
+        if (isFinished(next)) {
+          finish(next);
+        }
+      };
+
+      source.addEventListener('snapshot', (event) => {
+        update(JSON.parse((event as MessageEvent).data));
+      });
+      for (const type of ['queued', 'started', 'succeeded', 'failed']) {
+        source.addEventListener(type, (event) => {
+          update(JSON.parse((event as MessageEvent).data).job);
+        });
+      }
+      source.addEventListener('stage', (event) => {
+        const data = JSON.parse((event as MessageEvent).data);
+        onProgress?.({ status: current.status, stage: data.stage, stageSeconds: data.seconds });
+      });
+      // resync 後伺服器關閉連線，瀏覽器會自動重新連線並先收到最新快照
+      source.onerror = () => {
+        // 連線被拒（例如舊版後端沒有此端點）時不會自動重連，改為輪詢
+        if (source.readyState === EventSource.CLOSED) {
+          source.close();
+          this.pollJob(current, onProgress).then(resolve, reject);
+        }
+      };
+    });
+  },
+
+  // 翻譯圖片：建立工作後等待完成（onProgress 接收排隊與處理進度）
+  async translateImage(
+    request: TranslationRequest,
+    onProgress?: (progress: JobProgress) => void
+  ): Promise<TranslationResponse> {
+    let job = await this.submitTranslation(request);
+    onProgress?.({ status: job.status, queuePosition: job.queue_position });
+    job = await this.waitForJob(job, onProgress);
+
+    return {
+      success: job.status === 'succeeded',
+      output_url: job.output_url ?? undefined,
+      filename: job.filename,
+      error: job.error ?? undefined,
+    };
+  },
+
+  // 下載翻譯結果
+  async downloadResult(filename: string): Promise<Blob> {
+    const response = await apiClient.get(`/download/${filename}`, {
+      responseType: 'blob',
+    });
+
+    return response.data;
+  },
+};
@@ -4,11 +4,12 @@ import { useState } from 'react';
 import { translationApi } from './translationApi';
 import { useToast } from '@/shared/hooks/useToast';
 import { useSettings } from '@/pages/SettingsPage';
-import type { TranslationResult } from './translation.types';
+import type { JobProgress, TranslationResult } from './translation.types';
 
 export function useTranslation() {
   const [isTranslating, setIsTranslating] = useState(false);
   const [result, setResult] = useState<TranslationResult | null>(null);
+  const [progress, setProgress] = useState<JobProgress | null>(null);
   const toast = useToast();
   const { apiKey, nameMapping, globalPrompt, hasApiKey } = useSettings();
 
@@ -20,6 +21,7 @@ export function useTranslation() {
 
     setIsTranslating(true);
     setResult(null);
+    setProgress(null);
 
     try {
       // 先設定 API Key 到後端
@@ -29,11 +31,14 @@ export function useTranslation() {
         global_prompt: globalPrompt,
       });
 
-      const response = await translationApi.translateImage({
-        image,
-        nameMapping,
-        extraPrompt: globalPrompt,
-      });
+      const response = await translationApi.translateImage(
+        {
+          image,
+          nameMapping,
+          extraPrompt: globalPrompt,
+        },
+        setProgress
+      );
 
       if (response.success && response.output_url) {
         setResult({
@@ -50,6 +55,7 @@ export function useTranslation() {
       toast.error('翻譯過程中發生錯誤');
     } finally {
       setIsTranslating(false);
+      setProgress(null);
     }
   };
 
@@ -60,6 +66,7 @@ export function useTranslation() {
   return {
     translate,
     isTranslating,
+    progress,
     result,
     clearResult,
     hasResult: !!result,
@@ -6,6 +6,8 @@ import threading
 import logging
 from pathlib import Path
 from src.ai_engine import AIEngine
+from src.archive import FolderOutput, PageSource, open_output
+from src.journal import STATUS_DONE, STATUS_FAILED, BatchJournal, hash_bytes
 
 # 修正 Windows 高 DPI 模糊問題（改進版，相容 Win10/Win11）
 try:
@@ -156,10 +158,11 @@ class ComicTranslatorGUI:
         folder_frame.grid(row=2, column=0, sticky=(tk.W, tk.E), pady=(0, 6))
         folder_frame.columnconfigure(1, weight=1)  # 讓輸入框可伸縮
 
-        # 輸入資料夾
+        # 輸入資料夾（或壓縮檔 / PDF）
         ttk.Label(folder_frame, text="輸入資料夾:").grid(row=0, column=0, sticky=tk.W, pady=(0, 8))
         ttk.Entry(folder_frame, textvariable=self.input_dir_var).grid(row=0, column=1, sticky=(tk.W, tk.E), padx=(8, 8), pady=(0, 8))
         ttk.Button(folder_frame, text="瀏覽...", command=self.browse_input_dir).grid(row=0, column=2, pady=(0, 8))
+        ttk.Button(folder_frame, text="壓縮檔/PDF...", command=self.browse_input_file).grid(row=0, column=3, padx=(4, 0), pady=(0, 8))
 
         # 輸出資料夾
         ttk.Label(folder_frame, text="輸出資料夾:").grid(row=1, column=0, sticky=tk.W)
@@ -268,6 +271,16 @@ class ComicTranslatorGUI:
             self.input_dir_var.set(directory)
             self.save_config()
 
+    def browse_input_file(self):
+        """選擇輸入壓縮檔或 PDF（逐頁讀取，不需先解壓縮）"""
+        path = filedialog.askopenfilename(
+            title="選擇輸入檔案（CBZ / ZIP / PDF）",
+            filetypes=[("漫畫檔案", "*.cbz *.zip *.pdf"), ("所有檔案", "*.*")]
+        )
+        if path:
+            self.input_dir_var.set(path)
+            self.save_config()
+
     def browse_output_dir(self):
         """選擇輸出資料夾"""
         directory = filedialog.askdirectory(title="選擇輸出資料夾（儲存翻譯結果）")
@@ -389,7 +402,7 @@ class ComicTranslatorGUI:
         validations = [
             (self.api_key_var.get(), "請輸入 Gemini API Key！"),
             (self.input_dir_var.get(), "請選擇輸入資料夾！"),
-            (os.path.exists(self.input_dir_var.get()) if self.input_dir_var.get() else False, "輸入資料夾不存在！"),
+            (os.path.exists(self.input_dir_var.get()) if self.input_dir_var.get() else False, "輸入資料夾或檔案不存在！"),
             (self.output_dir_var.get(), "請選擇輸出資料夾！")
         ]
 
@@ -442,39 +455,55 @@ class ComicTranslatorGUI:
             logging.info("正在初始化 AI 引擎...")
             ai_engine = AIEngine()
 
-            # 取得圖片列表
-            input_dir = self.input_dir_var.get()
+            # 取得頁面列表（資料夾 / 壓縮檔 / PDF）
+            input_path = self.input_dir_var.get()
             output_dir = self.output_dir_var.get()
 
-            image_files = self._get_image_files(input_dir)
-
-            if not image_files:
-                logging.warning(f"在 {input_dir} 找不到圖片檔案。")
-                messagebox.showwarning("警告", "找不到圖片檔案！")
-                self.stop_translation()
-                return
-
-            total = len(image_files)
-            logging.info(f"找到 {total} 張圖片待處理。")
-
-            # 處理每張圖片
-            success_count = 0
-            skip_count = 0
-
-            for i, filename in enumerate(image_files, 1):
-                if not self.is_processing:
-                    logging.info("使用者中止處理。")
-                    break
-
-                result = self._process_single_image(ai_engine, input_dir, output_dir, filename, i, total)
-
-                if result == "success":
-                    success_count += 1
-                elif result == "skip":
-                    skip_count += 1
-
-                # 更新進度條
-                self.progress_var.set(int(i / total * 100))
+            with PageSource(input_path) as source:
+                if not source.pages:
+                    logging.warning(f"在 {input_path} 找不到圖片檔案。")
+                    messagebox.showwarning("警告", "找不到圖片檔案！")
+                    self.stop_translation()
+                    return
+
+                total = len(source.pages)
+                logging.info(f"找到 {total} 張圖片待處理。")
+
+                # 壓縮檔 / PDF 輸入時，依頁序寫回輸出資料夾中的 CBZ
+                if source.kind == "folder":
+                    output = FolderOutput(output_dir, ext=ai_engine.output_extension)
+                    journal = BatchJournal.for_output(output_dir)
+                else:
+                    stem = os.path.splitext(os.path.basename(input_path))[0]
+                    archive_path = os.path.join(output_dir, f"{stem}_translated.cbz")
+                    output = open_output(archive_path, ext=ai_engine.output_extension)
+                    journal = BatchJournal.for_output(archive_path)
+
+                # 處理每張圖片
+                success_count = 0
+                skip_count = 0
+
+                completed = False
+                try:
+                    for i, page in enumerate(source.pages, 1):
+                        if not self.is_processing:
+                            logging.info("使用者中止處理。")
+                            break
+
+                        result = self._process_single_image(ai_engine, page, output, journal, i, total)
+
+                        if result == "success":
+                            success_count += 1
+                        elif result == "skip":
+                            skip_count += 1
+
+                        # 更新進度條
+                        self.progress_var.set(int(i / total * 100))
+                    completed = self.is_processing
+                finally:
+                    # 中止或發生錯誤時保留既有 CBZ 中尚未處理到的頁面
+                    output.close(completed=completed)
+                    journal.close()
 
             # 完成
             if self.is_processing:
@@ -490,41 +519,40 @@ class ComicTranslatorGUI:
         finally:
             self._reset_ui_state()
 
-    def _get_image_files(self, directory):
-        """取得資料夾中的圖片檔案"""
-        supported_formats = ('.png', '.jpg', '.jpeg', '.webp')
-        try:
-            return [f for f in os.listdir(directory) if f.lower().endswith(supported_formats)]
-        except Exception as e:
-            logging.error(f"無法讀取資料夾 {directory}: {e}")
-            return []
-
-    def _process_single_image(self, ai_engine, input_dir, output_dir, filename, index, total):
+    def _process_single_image(self, ai_engine, page, output, journal, index, total):
         """處理單張圖片"""
-        input_path = os.path.join(input_dir, filename)
-        output_filename = os.path.splitext(filename)[0] + ".jpg"
-        output_path = os.path.join(output_dir, output_filename)
-
-        # 檢查是否已存在
-        if os.path.exists(output_path):
-            logging.info(f"[{index}/{total}] 檔案已存在，跳過: {output_path}")
+        # 檢查是否已翻譯且仍為最新（輸入、提示詞與輸出設定都沒變，且輸出完整）
+        prompt_hash = ai_engine.effective_prompt_hash(page.name)
+        if journal.should_skip(page, output, prompt_hash):
+            logging.info(f"[{index}/{total}] 檔案已存在，跳過: {output.output_path(page)}")
+            output.keep(page)
             return "skip"
 
         # 更新狀態
-        self.status_label.config(text=f"正在處理: {filename} ({index}/{total})", foreground="blue")
-        logging.info(f"[{index}/{total}] 正在處理: {input_path}")
+        self.status_label.config(text=f"正在處理: {page.name} ({index}/{total})", foreground="blue")
+        logging.info(f"[{index}/{total}] 正在處理: {page.name}")
 
+        journal.start(page, prompt_hash)
+        input_hash = None
         try:
-            success = ai_engine.process_image(input_path, output_path)
+            image_bytes = page.read()
+            input_hash = hash_bytes(image_bytes)
+            result = ai_engine.translate_image_bytes(image_bytes, page.name)
 
-            if success:
+            if result:
+                output_path = output.write(page, result.data)
+                journal.finish(page, STATUS_DONE, input_hash, output_name=output_path)
                 logging.info(f"✓ 成功！已儲存至: {output_path}")
                 return "success"
             else:
-                logging.error(f"✗ 處理失敗: {filename}")
+                output.skip(page)
+                journal.finish(page, STATUS_FAILED, input_hash, error=result.error)
+                logging.error(f"✗ 處理失敗: {page.name}")
                 return "failed"
 
         except Exception as e:
+            output.skip(page)
+            journal.finish(page, STATUS_FAILED, input_hash, error=str(e))
             logging.error(f"✗ 發生錯誤: {e}")
             return "failed"
 
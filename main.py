@@ -1,8 +1,28 @@
 import os
 import argparse
+import itertools
 import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from dotenv import load_dotenv
 from src.ai_engine import AIEngine
+from src.archive import DEFAULT_PDF_DPI, FolderOutput, PageSource, folder_page, is_archive_name, open_output
+from src.backends import ROUTING_POLICIES, BackendRouter
+from src.concurrency import ConcurrencyOptions
+from src.dedupe import DEFAULT_THRESHOLD as DEFAULT_DEDUPE_THRESHOLD, DedupeOptions
+from src.journal import STATUS_DONE, STATUS_FAILED, BatchJournal, hash_bytes
+from src.key_pool import api_keys_from_env
+from src.metrics import METRIC_PREFIX, metrics
+from src.regions import DEFAULT_REGION_PADDING, RegionOptions
+from src.scheduler import PRIORITY_BATCH, PRIORITY_CLASSES, configure_default_priority
+from src.text_detect import TEXTLESS_MODES, TextlessOptions
+from src.tracing import configure_tracing, configure_tracing_from_env, span, tracer
+from src.image_processing import ImageOptions, OutputOptions, normalize_format
+from src.result_cache import DEFAULT_MAX_MB, ResultCache
+from src.tiling import TilingOptions
+from src.watcher import DEFAULT_SETTLE_SECONDS, FolderWatcher
 
 # 設定 logging
 logging.basicConfig(
@@ -11,74 +31,465 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+def process_single_page(ai_engine, page, output, total, journal=None):
+    """
+    處理單一頁面（可在工作執行緒中執行，不寫入輸出）
+
+    有批次日誌時，輸入與有效提示詞都沒變且輸出完整才跳過；否則只要輸出存在就跳過。
+
+    Returns:
+        (狀態, 翻譯後的圖片位元組, 輸入內容雜湊)，狀態為 "success" / "skip" / "failed"
+    """
+    index = page.index + 1
+
+    # [新增] 檢查檔案是否已存在（且仍為最新），若是則跳過
+    if journal is not None:
+        prompt_hash = ai_engine.effective_prompt_hash(page.name)
+        up_to_date = journal.should_skip(page, output, prompt_hash)
+    else:
+        prompt_hash = None
+        up_to_date = output.exists(page)
+    if up_to_date:
+        logger.info(f"[{index}/{total}] 檔案已存在，跳過: {output.output_path(page)}")
+        return "skip", None, None
+
+    logger.info(f"[{index}/{total}] 正在處理: {page.name}")
+    if journal is not None:
+        journal.start(page, prompt_hash)
+
+    with span("cli.page", page=page.name, index=index):
+        status, data, input_hash, error = _translate_page(ai_engine, page)
+    if status == "failed" and journal is not None:
+        journal.finish(page, STATUS_FAILED, input_hash, error=error)
+    return status, data, input_hash
+
+def _translate_page(ai_engine, page):
+    input_hash = None
+    try:
+        # [核心邏輯] 直接呼叫 AI 進行一鍵漢化（頁面內容延遲到此時才讀取）
+        with metrics.time_stage("read"):
+            image_bytes = page.read()
+        input_hash = hash_bytes(image_bytes)
+        result = ai_engine.translate_image_bytes(image_bytes, page.name)
+
+        if result:
+            return "success", result.data, input_hash, None
+        else:
+            logger.error(f"處理失敗: {page.name}")
+            return "failed", None, input_hash, result.error
+
+    except Exception as e:
+        logger.error(f"發生未預期的錯誤: {e}")
+        return "failed", None, input_hash, str(e)
+
+def record_result(output, page, status, data, journal=None, input_hash=None):
+    """
+    依頁序將結果寫入輸出（於主執行緒呼叫，確保壓縮檔內的頁序正確）
+
+    成功的頁面在輸出寫入完成後才記錄到批次日誌，中斷時不會把沒寫完的頁面標記為完成。
+
+    Returns:
+        最終狀態（寫入失敗時改為 "failed"）
+    """
+    try:
+        if status == "success":
+            # [修改] 保持原檔名，不加後綴；副檔名依輸出格式設定（引擎已依此格式編碼）
+            with metrics.time_stage("write"):
+                output_path = output.write(page, data)
+            logger.info(f"成功！已儲存至: {output_path}")
+            if journal is not None:
+                journal.finish(page, STATUS_DONE, input_hash, output_name=output_path)
+        elif status == "skip":
+            output.keep(page)
+        else:
+            output.skip(page)
+    except Exception as e:
+        logger.error(f"寫入輸出失敗 ({page.name}): {e}")
+        if journal is not None:
+            journal.finish(page, STATUS_FAILED, input_hash, error=f"寫入輸出失敗: {e}")
+        return "failed"
+    return status
+
+def print_metrics_summary():
+    """列印各處理分段的耗時與計數摘要"""
+    rows = metrics.stage_summary()
+    if not rows:
+        return
+    print()
+    print(f"{'分段':<16}{'次數':>6}{'總計(s)':>10}{'平均(s)':>10}{'p95(s)':>10}{'最大(s)':>10}")
+    print("-" * 62)
+    for row in rows:
+        print(
+            f"{row['stage']:<16}{row['count']:>6}{row['total_s']:>10.2f}{row['mean_s']:>10.3f}"
+            f"{row['p95_s'] or 0:>10.3f}{row['max_s']:>10.3f}"
+        )
+    requests = sum(value for _, value in metrics.counter_series(f"{METRIC_PREFIX}_requests_total"))
+    input_mb = metrics.counter_value(f"{METRIC_PREFIX}_bytes_total", direction="input") / 1024 / 1024
+    upload_mb = metrics.counter_value(f"{METRIC_PREFIX}_bytes_total", direction="upload") / 1024 / 1024
+    output_mb = metrics.counter_value(f"{METRIC_PREFIX}_bytes_total", direction="output") / 1024 / 1024
+    print(f"API 請求 {requests} 次；讀入 {input_mb:.1f}MB，上傳 {upload_mb:.1f}MB，輸出 {output_mb:.1f}MB")
+    failures = metrics.counter_series(f"{METRIC_PREFIX}_failures_total")
+    if failures:
+        detail = ", ".join(f"{labels['reason']} {value}" for labels, value in sorted(failures, key=lambda item: -item[1]))
+        print(f"失敗類別: {detail}")
+    print()
+
+def run_batch(ai_engine, pages, output, workers=1, journal=None):
+    """
+    批次處理頁面
+
+    workers > 1 時以有上限的執行緒池同時發出多個請求（瓶頸在 API 往返延遲而非 CPU），
+    並只保留 workers * 2 頁的提交視窗（處理中與等待寫入的頁面），記憶體用量不隨批次大小增加。
+    進度依「頁序」回報：第 i 頁的結果一定在第 i-1 頁之後輸出，也依此順序寫入輸出。
+    journal 為批次日誌（BatchJournal），None 時沿用「輸出已存在就跳過」。
+
+    Returns:
+        統計字典 {"success": n, "skip": n, "failed": n}
+    """
+    total = len(pages)
+    stats = {"success": 0, "skip": 0, "failed": 0}
+
+    if workers <= 1:
+        for page in pages:
+            status, data, input_hash = process_single_page(ai_engine, page, output, total, journal)
+            stats[record_result(output, page, status, data, journal, input_hash)] += 1
+        return stats
+
+    logger.info(f"以 {workers} 個工作執行緒並行處理。")
+    # 最多保留的頁數（處理中 + 已完成但還沒輪到寫入），避免大批次一次提交、結果堆積在記憶體中
+    window = workers * 2
+    pending = deque()
+    next_index = 0
+    done = 0
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="translate") as executor:
+        while next_index < total or pending:
+            while next_index < total and len(pending) < window:
+                page = pages[next_index]
+                pending.append((page, executor.submit(process_single_page, ai_engine, page, output, total, journal)))
+                next_index += 1
+
+            # 依頁序寫出已完成的頁面，確保進度回報與輸出順序一致；寫入後即丟棄結果
+            while pending and pending[0][1].done():
+                page, future = pending.popleft()
+                try:
+                    status, data, input_hash = future.result()
+                except Exception as e:
+                    logger.error(f"發生未預期的錯誤 ({page.name}): {e}")
+                    status, data, input_hash = "failed", None, None
+                status = record_result(output, page, status, data, journal, input_hash)
+                stats[status] += 1
+                done += 1
+                logger.info(f"進度 [{done}/{total}] {page.name}: {status}")
+
+            running = [future for _, future in pending if not future.done()]
+            if running:
+                wait(running, return_when=FIRST_COMPLETED)
+
+    return stats
+
+def run_watch(ai_engine, input_dir, output, workers=1, journal=None, settle_seconds=DEFAULT_SETTLE_SECONDS):
+    """
+    監看模式：頁面寫入輸入資料夾後立即送進翻譯池，直到 Ctrl+C
+
+    啟動時資料夾中既有的頁面也會處理（已翻譯且仍為最新的會被批次日誌跳過）。
+    同一頁在處理中又被改寫時，處理完會再檢查一次。
+
+    Returns:
+        統計字典 {"success": n, "skip": n, "failed": n}
+    """
+    stats = {"success": 0, "skip": 0, "failed": 0}
+    lock = threading.Lock()
+    in_flight = set()
+    dirty = set()
+    counter = itertools.count()
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="translate")
+
+    def handle(name):
+        status = "failed"
+        try:
+            page = folder_page(input_dir, name, next(counter))
+            status, data, input_hash = process_single_page(ai_engine, page, output, "?", journal)
+            # 監看模式不需依頁序寫入，直接在工作執行緒中寫出
+            status = record_result(output, page, status, data, journal, input_hash)
+        except Exception as e:
+            logger.error(f"發生未預期的錯誤 ({name}): {e}")
+        with lock:
+            stats[status] += 1
+            in_flight.discard(name)
+            again = name in dirty
+            dirty.discard(name)
+        logger.info(f"{name}: {status}（成功 {stats['success']}, 跳過 {stats['skip']}, 失敗 {stats['failed']}）")
+        if again:
+            on_ready(name)
+
+    def on_ready(name):
+        # 在鎖內送出：結束時設定 stopping 後，不會再有工作送進已關閉的執行緒池
+        with lock:
+            if stopping:
+                return
+            if name in in_flight:
+                dirty.add(name)
+                return
+            in_flight.add(name)
+            executor.submit(handle, name)
+
+    stopping = False
+    watcher = FolderWatcher(input_dir, on_ready, settle_seconds=settle_seconds)
+    try:
+        with watcher:
+            logger.info("監看模式已啟動，按 Ctrl+C 結束。")
+            # 不設逾時的 Event.wait 在 Windows 上無法被 Ctrl+C 中斷，改為每秒醒來一次
+            while True:
+                time.sleep(1)
+    except KeyboardInterrupt:
+        logger.info("正在結束監看，等待處理中的頁面完成...")
+    finally:
+        # 監看器已停止；處理中頁面的重新檢查也不再送出
+        with lock:
+            stopping = True
+        executor.shutdown(wait=True)
+    return stats
+
 def main():
     # 載入環境變數
     load_dotenv()
     
     # 檢查 API Key
-    if not os.getenv("GEMINI_API_KEY"):
+    if not api_keys_from_env():
         logger.error("未設定 GEMINI_API_KEY，請檢查 .env 檔案。")
         return
 
     parser = argparse.ArgumentParser(description="AI 漫畫漢化工具 (One-Shot)")
-    parser.add_argument("--input", required=True, help="輸入圖片資料夾")
-    parser.add_argument("--output", required=True, help="輸出圖片資料夾")
+    parser.add_argument("--input", required=True, help="輸入圖片資料夾，或 ZIP/CBZ/PDF 檔案")
+    parser.add_argument("--output", required=True, help="輸出圖片資料夾，或 .cbz/.zip 檔案（依頁序寫入）")
+    parser.add_argument("--pdf-dpi", type=int, default=DEFAULT_PDF_DPI, help=f"PDF 頁面轉圖片的解析度（預設 {DEFAULT_PDF_DPI}）")
+    parser.add_argument("--model", help="Gemini 模型（預設依 GEMINI_MODEL，gemini-3-pro-image-preview）")
+    parser.add_argument("--backends", help="翻譯後端清單，例如 gemini:gemini-3-pro-image-preview,gemini:gemini-2.5-flash-image（預設依 TRANSLATION_BACKENDS）")
+    parser.add_argument("--routing", choices=ROUTING_POLICIES, help="後端路由策略（預設依 TRANSLATION_ROUTING，fallback）")
+    parser.add_argument("--trace-file", help="將每頁的追蹤 span 寫入此 JSONL 檔（預設依 TRACING_EXPORTER）")
+    parser.add_argument("--watch", action="store_true", help="監看模式：持續監看輸入資料夾，新頁面寫入完成後立即翻譯（Ctrl+C 結束）")
+    parser.add_argument("--settle", type=float, default=DEFAULT_SETTLE_SECONDS, help=f"監看模式中檔案需保持不變多久才視為寫入完成（秒，預設 {DEFAULT_SETTLE_SECONDS:g}）")
+    parser.add_argument("--no-journal", action="store_true", help="不使用批次日誌，只要輸出檔存在就跳過（舊版行為）")
+    parser.add_argument("--priority", choices=PRIORITY_CLASSES, default=PRIORITY_BATCH, help="與網頁版共用配額時的優先等級（預設 batch；不急的補翻可用 background，讓互動請求優先）")
+    parser.add_argument("--workers", type=int, default=1, help="同時處理的圖片數量（預設 1，逐張處理）")
+    parser.add_argument("--adaptive", action="store_true", help="自適應並行度：依 429/503 與延遲自動調整同時呼叫數，工作執行緒數至少為上限（預設依 ADAPTIVE_CONCURRENCY）")
+    parser.add_argument("--max-concurrency", type=int, default=None, help="自適應並行度的上限（預設依 ADAPTIVE_MAX_CONCURRENCY，16）")
+    parser.add_argument("--cache-dir", help="翻譯結果快取目錄（預設依 TRANSLATION_CACHE_DIR，與網頁版共用）")
+    parser.add_argument("--cache-max-mb", type=int, default=None, help=f"快取容量上限 MB（預設 {DEFAULT_MAX_MB}）")
+    parser.add_argument("--no-cache", action="store_true", help="停用翻譯結果快取")
+    parser.add_argument("--textless", choices=TEXTLESS_MODES, default=None, help="無文字頁面（空白頁、跨頁大圖）: off 不判斷 / log 只記錄 / skip 不送出、直接輸出原圖（預設依 TEXTLESS_MODE，off）")
+    parser.add_argument("--regions", action="store_true", help="對話框區域模式：只送出文字區域、翻譯後貼回原圖，畫面其他部分不經模型（找不到合適區域時整頁送出，預設依 REGION_MODE）")
+    parser.add_argument("--region-padding", type=int, default=None, help=f"區域模式在文字區塊外加的邊距（像素，預設依 REGION_PADDING，{DEFAULT_REGION_PADDING}）")
+    parser.add_argument("--dedupe", action="store_true", help="沿用感知雜湊相近頁面的翻譯（版權頁、標題頁、不同掃描版本的同一頁），需啟用快取（預設依 DEDUPE_ENABLED）")
+    parser.add_argument("--dedupe-threshold", type=int, default=None, help=f"近似頁面允許的最大漢明距離（64 位元中幾位不同，預設依 DEDUPE_THRESHOLD，{DEFAULT_DEDUPE_THRESHOLD}）")
+    parser.add_argument("--max-long-edge", type=int, default=None, help="上傳前縮小到的長邊上限（像素，0 為不縮小，預設依 IMAGE_MAX_LONG_EDGE）")
+    parser.add_argument("--upload-format", default=None, help="上傳前重新編碼的格式: jpeg / webp / png（預設依 IMAGE_UPLOAD_FORMAT）")
+    parser.add_argument("--upload-quality", type=int, default=None, help="上傳前重新編碼的品質 1-100（預設依 IMAGE_UPLOAD_QUALITY）")
+    parser.add_argument("--output-format", default=None, help="輸出格式: jpeg / webp / png（預設依 OUTPUT_FORMAT，JPEG）")
+    parser.add_argument("--output-quality", type=int, default=None, help="輸出品質 1-100（預設依 OUTPUT_QUALITY）")
+    parser.add_argument("--no-restore-size", action="store_true", help="不將輸出縮放回原始頁面尺寸")
+    parser.add_argument("--tile", action="store_true", help="長條漫畫分塊模式：在分格留白處切開、並行翻譯後縫合（預設依 TILING_ENABLED）")
+    parser.add_argument("--tile-height", type=int, default=None, help="分塊模式每塊的最大高度（像素，預設依 TILE_HEIGHT）")
+    parser.add_argument("--tile-overlap", type=int, default=None, help="找不到留白時固定切割的重疊高度（像素，預設依 TILE_OVERLAP）")
     
     args = parser.parse_args()
     
-    input_dir = args.input
-    output_dir = args.output
-    
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-        
+    if args.workers < 1:
+        parser.error("--workers 必須大於等於 1")
+
+    if not os.path.exists(args.input):
+        logger.error(f"找不到輸入: {args.input}")
+        return
+
+    if args.watch:
+        if not os.path.isdir(args.input) or is_archive_name(args.output):
+            parser.error("--watch 的輸入與輸出都必須是資料夾")
+        if os.path.abspath(args.input) == os.path.abspath(args.output):
+            parser.error("--watch 的輸出資料夾不可與輸入資料夾相同")
+
+    configure_default_priority(args.priority)
+
+    if args.trace_file:
+        configure_tracing("file", path=args.trace_file)
+    else:
+        configure_tracing_from_env(service_name="comic-translator-cli")
+
     # 初始化 AI 引擎
-    logger.info("正在初始化 AI 引擎 (Gemini 3 Pro Image Preview)...")
+    logger.info("正在初始化 AI 引擎...")
     try:
-        ai_engine = AIEngine()
+        # 命令列參數優先於環境變數；停用時明確傳入 False（不修改 os.environ）
+        cache = False if args.no_cache else ResultCache.from_env(
+            cache_dir=args.cache_dir, max_mb=args.cache_max_mb
+        ) or False
+        image_options = ImageOptions.from_env()
+        if args.max_long_edge is not None:
+            image_options.max_long_edge = args.max_long_edge
+        if args.upload_format:
+            image_options.upload_format = normalize_format(args.upload_format)
+        if args.upload_quality is not None:
+            image_options.upload_quality = args.upload_quality
+        output_options = OutputOptions.from_env()
+        if args.output_format:
+            output_options.output_format = normalize_format(args.output_format)
+        if args.output_quality is not None:
+            output_options.quality = args.output_quality
+        if args.no_restore_size:
+            output_options.restore_size = False
+        tiling_options = TilingOptions.from_env()
+        if args.tile:
+            tiling_options.enabled = True
+        if args.tile_height is not None or args.tile_overlap is not None:
+            tiling_options = TilingOptions(
+                enabled=tiling_options.enabled,
+                tile_height=args.tile_height if args.tile_height is not None else tiling_options.tile_height,
+                overlap=args.tile_overlap if args.tile_overlap is not None else tiling_options.overlap,
+                min_aspect=tiling_options.min_aspect,
+                split_at_gutters=tiling_options.split_at_gutters,
+                workers=tiling_options.workers,
+            )
+        textless_options = TextlessOptions.from_env()
+        if args.textless:
+            textless_options.mode = args.textless
+        region_options = RegionOptions.from_env()
+        if args.regions:
+            region_options.enabled = True
+        if args.region_padding is not None:
+            region_options.padding = max(0, args.region_padding)
+        dedupe_options = DedupeOptions.from_env()
+        if args.dedupe:
+            dedupe_options.enabled = True
+        if args.dedupe_threshold is not None:
+            dedupe_options = DedupeOptions(enabled=dedupe_options.enabled, threshold=args.dedupe_threshold)
+        concurrency_options = ConcurrencyOptions.from_env()
+        if args.adaptive:
+            concurrency_options.enabled = True
+        if args.max_concurrency is not None:
+            concurrency_options = ConcurrencyOptions(
+                enabled=concurrency_options.enabled,
+                min_limit=concurrency_options.min_limit,
+                max_limit=args.max_concurrency,
+                initial_limit=concurrency_options.initial_limit,
+                backoff=concurrency_options.backoff,
+                latency_spike=concurrency_options.latency_spike,
+            )
+        if concurrency_options.enabled and args.workers < concurrency_options.max_limit:
+            # 工作執行緒只提供上限，實際同時呼叫數由控制器決定
+            args.workers = concurrency_options.max_limit
+        router = BackendRouter.from_config(
+            spec=args.backends or os.getenv("TRANSLATION_BACKENDS"),
+            policy=args.routing or os.getenv("TRANSLATION_ROUTING"),
+            model=args.model or os.getenv("GEMINI_MODEL")
+        )
+        ai_engine = AIEngine(
+            image_options=image_options,
+            output_options=output_options,
+            tiling_options=tiling_options,
+            router=router,
+            concurrency_options=concurrency_options,
+            dedupe_options=dedupe_options,
+            textless_options=textless_options,
+            region_options=region_options,
+            cache=cache
+        )
+        backend_names = ", ".join(backend.name for backend in router.backends)
+        logger.info(f"翻譯後端: {backend_names}（路由策略: {router.policy}）")
     except Exception as e:
         logger.error(f"初始化失敗: {e}")
         return
 
-    # 取得所有圖片檔案
-    image_files = [f for f in os.listdir(input_dir) if f.lower().endswith(('.png', '.jpg', '.jpeg', '.webp'))]
-    
-    if not image_files:
-        logger.warning(f"在 {input_dir} 找不到圖片檔案。")
+    if args.watch:
+        output = FolderOutput(args.output, ext=ai_engine.output_extension)
+        journal = None if args.no_journal else BatchJournal.for_output(args.output)
+        try:
+            stats = run_watch(
+                ai_engine, args.input, output, workers=args.workers, journal=journal, settle_seconds=args.settle
+            )
+        finally:
+            if journal is not None:
+                journal.close()
+        logger.info(f"監看已結束。成功: {stats['success']}, 跳過: {stats['skip']}, 失敗: {stats['failed']}")
+        print_metrics_summary()
+        tracer.configure(None)
         return
 
-    logger.info(f"找到 {len(image_files)} 張圖片待處理。")
-
-    for i, filename in enumerate(image_files):
-        input_path = os.path.join(input_dir, filename)
-        
-        # [修改] 保持原檔名，不加後綴
-        # 注意：AI 回傳通常是 JPG 格式，所以副檔名建議維持 .jpg 或與原圖相同(若原圖非jpg可能會被轉檔)
-        # 這裡我們使用原檔名，但副檔名強制為 .jpg 以確保格式正確
-        output_filename = os.path.splitext(filename)[0] + ".jpg"
-        output_path = os.path.join(output_dir, output_filename)
-        
-        # [新增] 檢查檔案是否已存在，若存在則跳過
-        if os.path.exists(output_path):
-            logger.info(f"[{i+1}/{len(image_files)}] 檔案已存在，跳過: {output_path}")
-            continue
-
-        logger.info(f"[{i+1}/{len(image_files)}] 正在處理: {input_path}")
-        
+    # 取得所有頁面（資料夾/壓縮檔/PDF，依自然順序排序，內容延遲讀取）
+    try:
+        source = PageSource(args.input, pdf_dpi=args.pdf_dpi)
+    except Exception as e:
+        logger.error(f"無法開啟輸入: {e}")
+        return
+
+    with source:
+        if not source.pages:
+            logger.warning(f"在 {args.input} 找不到圖片檔案。")
+            return
+
+        logger.info(f"找到 {len(source.pages)} 張圖片待處理。")
+
+        output = open_output(args.output, ext=ai_engine.output_extension)
+        # 批次日誌：續跑時只重新翻譯新增、變更或未完成的頁面
+        journal = None if args.no_journal else BatchJournal.for_output(args.output)
+        completed = False
         try:
-            # [核心邏輯] 直接呼叫 AI 進行一鍵漢化
-            success = ai_engine.process_image(input_path, output_path)
-            
-            if success:
-                logger.info(f"成功！已儲存至: {output_path}")
-            else:
-                logger.error(f"處理失敗: {filename}")
-                
-        except Exception as e:
-            logger.error(f"發生未預期的錯誤: {e}")
-            continue
+            stats = run_batch(ai_engine, source.pages, output, workers=args.workers, journal=journal)
+            completed = True
+        finally:
+            # 中斷時保留既有 CBZ 中尚未處理到的頁面
+            output.close(completed=completed)
+            if journal is not None:
+                journal.close()
+
+    logger.info(f"所有批次任務已完成。成功: {stats['success']}, 跳過: {stats['skip']}, 失敗: {stats['failed']}")
+    print_metrics_summary()
+    tracer.configure(None)
+
+    if ai_engine.cache is not None:
+        cache_stats = ai_engine.cache.stats()
+        logger.info(
+            f"翻譯快取: 命中 {cache_stats['hits']}, 未命中 {cache_stats['misses']}, "
+            f"淘汰 {cache_stats['evictions']}, 使用 {cache_stats['size_bytes'] / 1024 / 1024:.1f}MB"
+        )
+
+    textless_stats = ai_engine.textless_stats_summary()
+    if textless_stats is not None:
+        logger.info(
+            f"無文字頁面: 判斷 {textless_stats['checked']} 頁（耗時 {textless_stats['detect_seconds']:.1f} 秒）, "
+            f"無文字 {textless_stats['textless']} 頁, 略過 {textless_stats['skipped']} 頁"
+            f"（估計省下 {textless_stats['saved_seconds']:.0f} 秒）"
+        )
+
+    dedupe_stats = ai_engine.dedupe_stats()
+    if dedupe_stats is not None:
+        logger.info(
+            f"近似重複頁面: 沿用 {dedupe_stats['hits']} 頁（節省 {dedupe_stats['saved_calls']} 次 API 呼叫）, "
+            f"未命中 {dedupe_stats['misses']}, 索引 {dedupe_stats['indexed_pages']} 頁"
+        )
+
+    if len(ai_engine.router.backends) > 1:
+        for backend in ai_engine.router.stats():
+            latency = f"{backend['latency_s']:.1f}s" if backend["latency_s"] is not None else "-"
+            logger.info(
+                f"後端 {backend['name']}: 成功 {backend['successes']}, 失敗 {backend['failures']}, "
+                f"平均延遲 {latency}"
+            )
+
+    for limiter in ai_engine.concurrency_stats():
+        logger.info(
+            f"自適應並行度 {limiter['backend']}: 目前上限 {limiter['limit']}, 因壅塞降低 {limiter['decreases']} 次"
+        )
 
-    logger.info("所有批次任務已完成。")
+    for key in ai_engine.key_pool.stats():
+        usage = (
+            f"API Key {key['key']}: 請求 {key['requests']}, 成功 {key['successes']}, "
+            f"失敗 {key['failures']}, 配額限制 {key['rate_limited']}"
+        )
+        level = key["quota"]
+        if level is not None:
+            usage += (
+                f"；配額水位: 請求 {level['requests']:.1f}/{level['requests_capacity']:g} RPM, "
+                f"token {level['tokens']:.0f}/{level['tokens_capacity']:g} TPM"
+            )
+        logger.info(usage)
 
 if __name__ == "__main__":
     main()
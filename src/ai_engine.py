@@ -1,24 +1,134 @@
+import dataclasses
+import hashlib
 import os
 import logging
-from google import genai
-from google.genai import types
+import time
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Optional
 from dotenv import load_dotenv
+from src.archive import atomic_write
+from src.backends import BackendRouter, NoImageReturned
+from src.concurrency import AdaptiveLimiter, ConcurrencyOptions
+from src.dedupe import DedupeOptions, PerceptualIndex, compute_hash, context_key
+from src.metrics import METRIC_PREFIX, metrics
+from src.tracing import bind_context, span
+from src.result_cache import ResultCache
+from src.image_processing import (
+    ImageOptions, OutputOptions, encode_image, encode_output_in_pool, finalize_output_in_pool, prepare_image
+)
+from src.retry import RetryPolicy, RetryRecord, is_retryable
+from src.key_pool import KeyPool
+from src.rate_limiter import DEFAULT_IMAGE_TOKENS
+from src.regions import RegionOptions, composite_regions, split_regions
+from src.scheduler import current_priority, quota_reserve
+from src.text_detect import TEXTLESS_OFF, TEXTLESS_SKIP, TextlessOptions, TextlessStats, analyze_page
+from src.tiling import TilingOptions, split_page, stitch_tiles
 
 # 載入環境變數
 load_dotenv()
 
+
+@dataclass
+class ProcessResult:
+    """
+    單張圖片的處理結果
+
+    可直接當布林值使用（`if engine.process_image(...):`），與舊版回傳 True/False 相容。
+    """
+
+    success: bool
+    output_path: Optional[str] = None
+    attempts: int = 0
+    retries: list[RetryRecord] = field(default_factory=list)
+    cached: bool = False
+    retryable: bool = False
+    error: Optional[str] = None
+    # 翻譯後的圖片位元組（成功時才有值）
+    data: Optional[bytes] = field(default=None, repr=False)
+    # 原始圖片尺寸 (寬, 高)，供輸出時還原
+    original_size: Optional[tuple[int, int]] = None
+    # 實際上傳的位元組數（前處理後）
+    upload_bytes: int = 0
+    # 輸出圖片的 MIME type（後處理後）
+    mime_type: Optional[str] = None
+    # 長條頁面分塊處理時的塊數（0 代表未分塊）
+    tiles: int = 0
+    # 區域模式送出的文字區域數（0 代表整頁送出）
+    regions: int = 0
+    # 實際產生結果的翻譯後端名稱
+    backend: Optional[str] = None
+    # 沿用近似重複頁面的翻譯時，該頁面的來源名稱
+    deduplicated: Optional[str] = None
+    # 判斷為無文字而未送出時的原因（blank / flat / no_text_regions）
+    textless: Optional[str] = None
+
+    def __bool__(self):
+        return self.success
+
+
 class AIEngine:
-    def __init__(self, config_file="translation_config.txt"):
+    def __init__(self, config_file="translation_config.txt", cache=None, retry_policy=None,
+                 rate_limiter=None, image_options=None, output_options=None, tiling_options=None,
+                 router=None, model_name=None, key_pool=None, concurrency_options=None, dedupe_options=None,
+                 textless_options=None, region_options=None):
         self.logger = logging.getLogger(__name__)
-        api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key:
-            raise ValueError("未找到 GEMINI_API_KEY，請檢查 .env 檔案。")
-
-        # 初始化 Client
-        self.client = genai.Client(api_key=api_key)
 
-        # [關鍵切換] 使用支援圖像生成的預覽版模型
-        self.model_name = "gemini-3-pro-image-preview"
+        # API Key 金鑰池（GEMINI_API_KEY / GEMINI_API_KEYS），每把金鑰各自的限流器與冷卻狀態
+        # 限流器 rate_limiter: None: 每把金鑰依環境變數各自建立（以金鑰雜湊分桶，跨行程共用）；
+        # False: 停用；RateLimiter 實例: 所有金鑰共用。未指定時使用行程內共用的金鑰池，重建引擎不會重置冷卻狀態
+        if key_pool is None:
+            key_pool = KeyPool.shared() if rate_limiter is None else KeyPool.from_env(rate_limiter=rate_limiter)
+        self.key_pool = key_pool
+
+        # 翻譯後端與路由（TRANSLATION_BACKENDS / TRANSLATION_ROUTING / GEMINI_MODEL）
+        # 預設為單一 Gemini 後端，模型為支援圖像生成的 gemini-3-pro-image-preview
+        self.router = router or BackendRouter.from_env(model=model_name)
+        self.model_name = self.router.primary.model
+
+        # 翻譯結果快取（None: 依環境變數建立共用快取；False: 停用）
+        if cache is None:
+            cache = ResultCache.from_env()
+        self.cache = cache or None
+
+        # 近似重複頁面偵測（預設關閉）：索引位於翻譯快取目錄，沿用的圖片由快取提供
+        self.dedupe_options = dedupe_options or DedupeOptions.from_env()
+        self.dedupe = None
+        if self.dedupe_options.enabled:
+            if self.cache is None:
+                self.logger.info("翻譯快取已停用，近似重複頁面偵測無法使用")
+            else:
+                self.dedupe = PerceptualIndex.shared(self.cache.cache_dir, self.dedupe_options.threshold)
+
+        # 對話框區域模式（預設關閉）：只送出文字區域，翻譯後貼回原圖
+        self.region_options = region_options or RegionOptions.from_env()
+
+        # 無文字頁面偵測（預設關閉）：空白頁、跨頁大圖等不送出，直接以原圖輸出
+        self.textless_options = textless_options or TextlessOptions.from_env()
+        self.textless_stats = TextlessStats()
+
+        # 暫時性錯誤（429/5xx/逾時）的重試策略
+        self.retry_policy = retry_policy or RetryPolicy.from_env()
+
+        # 上傳前的圖片正規化（縮小、重新編碼、正確的 MIME type）
+        self.image_options = image_options or ImageOptions.from_env()
+
+        # 輸出後處理（格式偵測、還原尺寸、依設定編碼）
+        self.output_options = output_options or OutputOptions.from_env()
+
+        # 長條漫畫分塊（預設關閉）
+        self.tiling_options = tiling_options or TilingOptions.from_env()
+
+        # 自適應並行度（預設關閉）：每個後端一個 AIMD 控制器，依 429 / 503 與延遲調整同時呼叫數
+        # 控制器為行程內共用，重建引擎不會重置上限
+        self.concurrency_options = concurrency_options or ConcurrencyOptions.from_env()
+        self.concurrency = {}
+        if self.concurrency_options.enabled:
+            self.concurrency = {
+                backend.name: AdaptiveLimiter.shared(self.concurrency_options, name=backend.name)
+                for backend in self.router.backends
+            }
 
         # 載入翻譯配置（全域設定 + 全域 Prompt + 特定圖片）
         self.global_name_mapping, self.global_prompt, self.extra_prompts_map = self._load_translation_config(config_file)
@@ -145,22 +255,27 @@ class AIEngine:
 
         return ""
 
-    def process_image(self, image_path, output_path, name_mapping=None, extra_prompt=""):
+    def build_prompt(self, image_path, name_mapping=None, extra_prompt=""):
         """
-        直接請求 Gemini 生成漢化後的圖片 (Image-to-Image)
+        組合完整提示詞（翻譯規則 + 人名對照 + 額外指示）
 
         Args:
-            image_path: 輸入圖片路徑
-            output_path: 輸出圖片路徑
+            image_path: 輸入圖片路徑（用於比對特定圖片設定）
             name_mapping: 人名對照字典 {原文: 中文}
             extra_prompt: 額外的提示詞
         """
-        if not os.path.exists(image_path):
-            raise FileNotFoundError(f"找不到圖片: {image_path}")
+        prompt, combined = self._compose_prompt(image_path, name_mapping, extra_prompt)
+        if combined:
+            self.logger.info(f"套用指示: {combined[:100]}...")
+        return prompt
 
-        self.logger.info(f"正在傳送圖片至 Gemini API ({self.model_name}) ...")
+    def _compose_prompt(self, image_path, name_mapping=None, extra_prompt=""):
+        """
+        組合提示詞（不記錄日誌）
 
-        # 組合完整提示詞
+        Returns:
+            (提示詞, 合併後的額外指示)
+        """
         prompt = f"""將漫畫圖片的所有日文翻譯為繁體中文。
 
 {self.translation_rules}"""
@@ -189,78 +304,515 @@ class AIEngine:
         elif extra_prompt:  # 參數傳入的 prompt 優先級最低
             extra_instructions.append(extra_prompt)
 
-        if extra_instructions:
-            combined = "、".join(extra_instructions)  # 用頓號連接省 token
-            self.logger.info(f"套用指示: {combined[:100]}...")
+        combined = "、".join(extra_instructions)  # 用頓號連接省 token
+        if combined:
             prompt += f"\n\n補充：{combined}\n"
 
         prompt += "\n直接輸出翻譯後圖片。"
+        return prompt, combined
+
+    def effective_prompt_hash(self, source_name, name_mapping=None, extra_prompt=""):
+        """
+        有效提示詞的雜湊（提示詞、模型、上傳前處理、輸出與各模式設定），供批次日誌判斷既有輸出是否仍為最新
+
+        無文字頁面只有 skip 模式會改變輸出（直接複製原圖），off / log 視為相同。
+
+        Args:
+            source_name: 來源檔名（決定套用哪些特定圖片的要求）
+        """
+        digest = hashlib.sha256()
+        parts = (
+            self._compose_prompt(source_name, name_mapping, extra_prompt)[0],
+            ",".join(backend.model for backend in self.router.backends),
+            repr(self.image_options),
+            repr(self.output_options),
+            repr(self.textless_options) if self.textless_options.mode == TEXTLESS_SKIP else TEXTLESS_OFF,
+            # 分塊的並行度不影響結果，不列入
+            repr(dataclasses.replace(self.tiling_options, workers=1)),
+            repr(dataclasses.replace(self.region_options, workers=1)),
+        )
+        for part in parts:
+            encoded = part.encode("utf-8")
+            digest.update(len(encoded).to_bytes(8, "big"))
+            digest.update(encoded)
+        return digest.hexdigest()
+
+    def process_image(self, image_path, output_path, name_mapping=None, extra_prompt=""):
+        """
+        直接請求 Gemini 生成漢化後的圖片 (Image-to-Image)
+
+        Args:
+            image_path: 輸入圖片路徑
+            output_path: 輸出圖片路徑
+            name_mapping: 人名對照字典 {原文: 中文}
+            extra_prompt: 額外的提示詞
+
+        Returns:
+            ProcessResult（可直接當布林值判斷成功與否，並帶有嘗試次數與重試紀錄）
+        """
+        if not os.path.exists(image_path):
+            raise FileNotFoundError(f"找不到圖片: {image_path}")
+
+        with span("engine.process_image", source=os.path.basename(image_path)):
+            return self._process_image(image_path, output_path, name_mapping, extra_prompt)
+
+    def _process_image(self, image_path, output_path, name_mapping, extra_prompt):
 
         try:
-            with open(image_path, "rb") as f:
+            with self._stage("read"), open(image_path, "rb") as f:
                 image_bytes = f.read()
-            
-            # 設定安全性設定 (盡量放寬，避免因漫畫內容被誤判而拒絕處理)
-            safety_settings = [
-                types.SafetySetting(
-                    category="HARM_CATEGORY_HATE_SPEECH",
-                    threshold="BLOCK_NONE"
-                ),
-                types.SafetySetting(
-                    category="HARM_CATEGORY_DANGEROUS_CONTENT",
-                    threshold="BLOCK_NONE"
-                ),
-                types.SafetySetting(
-                    category="HARM_CATEGORY_SEXUALLY_EXPLICIT",
-                    threshold="BLOCK_NONE"
-                ),
-                types.SafetySetting(
-                    category="HARM_CATEGORY_HARASSMENT",
-                    threshold="BLOCK_NONE"
-                ),
-            ]
-
-            config = types.GenerateContentConfig(
-                safety_settings=safety_settings
-            )
-            
-            # 呼叫 API
-            response = self.client.models.generate_content(
-                model=self.model_name, 
-                contents=[
-                    types.Part.from_bytes(data=image_bytes, mime_type="image/jpeg"),
-                    prompt
-                ],
-                config=config
-            )
+        except Exception as e:
+            self.logger.error(f"無法讀取圖片 {image_path}: {e}")
+            return ProcessResult(success=False, output_path=output_path, error=str(e))
 
-            # 檢查回應並儲存圖片
-            # Gemini 回傳圖片通常會在 parts 中包含 inline_data 或 file_data
-            if response.candidates and response.candidates[0].content.parts:
-                for part in response.candidates[0].content.parts:
-                    if part.inline_data:
-                        self.logger.info("收到圖片資料，正在儲存...")
-                        with open(output_path, "wb") as f:
-                            f.write(part.inline_data.data)
-                        self.logger.info(f"成功！已儲存至: {output_path}")
-                        return True
-                    
-                    # 有時候圖片會以 executable_code 的結果形式出現 (較少見，但以防萬一)
-                    if part.file_data:
-                         # 這裡可能需要額外的下載邏輯，視 API 實作而定
-                         # 目前先假設是 inline_data
-                         pass
+        result = self.translate_image_bytes(image_bytes, image_path, name_mapping, extra_prompt)
+        result.output_path = output_path
+        if not result:
+            return result
 
-            self.logger.warning("API 回傳成功，但未找到圖片資料。可能模型僅回傳了文字描述。")
-            self.logger.info(f"API 回應內容: {response.text}")
-            return False
+        try:
+            # 先寫入暫存檔再改名：中斷時不會留下截斷的輸出（續跑時可能被當成已完成）
+            with self._stage("write"):
+                atomic_write(output_path, result.data)
+        except Exception as e:
+            self.logger.error(f"無法寫入輸出檔案 {output_path}: {e}")
+            result.success = False
+            result.error = str(e)
+            return result
+
+        self.logger.info(f"成功！已儲存至: {output_path}")
+        return result
+
+    def translate_image_bytes(self, image_bytes, source_name, name_mapping=None, extra_prompt=""):
+        """
+        翻譯記憶體中的圖片（不經過檔案系統，供壓縮檔/PDF 頁面使用）
+
+        Args:
+            image_bytes: 圖片內容
+            source_name: 來源名稱（用於比對特定圖片設定與記錄日誌）
+            name_mapping: 人名對照字典 {原文: 中文}
+            extra_prompt: 額外的提示詞
+
+        Returns:
+            ProcessResult，成功時 data 為翻譯後的圖片位元組
+        """
+        metrics.inc(f"{METRIC_PREFIX}_bytes_total", len(image_bytes), direction="input")
+        metrics.add_gauge(f"{METRIC_PREFIX}_in_flight", 1)
+        try:
+            with span("engine.translate", source=os.path.basename(source_name), input_bytes=len(image_bytes)) as page_span:
+                result = self._translate_page(image_bytes, source_name, name_mapping, extra_prompt)
+                page_span.set_attribute("success", result.success)
+                page_span.set_attribute("attempts", result.attempts)
+                page_span.set_attribute("cached", result.cached)
+                if result.deduplicated:
+                    page_span.set_attribute("deduplicated", result.deduplicated)
+                if result.textless:
+                    page_span.set_attribute("textless", result.textless)
+                if result.backend:
+                    page_span.set_attribute("backend", result.backend)
+                if not result:
+                    page_span.record_error(result.error or "翻譯失敗")
+        finally:
+            metrics.add_gauge(f"{METRIC_PREFIX}_in_flight", -1)
+
+        metrics.inc(f"{METRIC_PREFIX}_pages_total", status="success" if result else "failed")
+        if result:
+            metrics.inc(f"{METRIC_PREFIX}_bytes_total", len(result.data), direction="output")
+        return result
+
+    def _translate_page(self, image_bytes, source_name, name_mapping, extra_prompt):
+        """依設定選擇整頁、文字區域或分塊翻譯（無文字頁面依設定直接以原圖輸出）"""
+        if self.textless_options.enabled and not self._get_extra_prompt_for_file(source_name):
+            skipped = self._skip_textless(image_bytes, source_name)
+            if skipped is not None:
+                return skipped
+        # 區域模式：只送出文字區域，翻譯後貼回原圖（找不到合適區域時改為整頁）
+        if self.region_options.enabled:
+            with self._stage("regions"):
+                page = split_regions(image_bytes, self.region_options)
+            if page is not None:
+                return self._translate_regions(page, source_name, name_mapping, extra_prompt)
+        # 長條頁面切塊並行翻譯後縫合
+        if self.tiling_options.enabled:
+            page = split_page(image_bytes, self.tiling_options)
+            if page is not None:
+                return self._translate_tiled(page, source_name, name_mapping, extra_prompt)
+        return self._translate_single(image_bytes, source_name, name_mapping, extra_prompt)
+
+    def _translate_single(self, image_bytes, source_name, name_mapping=None, extra_prompt="", finalize=True):
+        """
+        以單次 API 呼叫翻譯一張圖片
+
+        finalize 為 False 時不做輸出後處理，data 為模型原始輸出（分塊縫合前使用）。
+        """
+        result = ProcessResult(success=False)
+
+        # 組合完整提示詞
+        with self._stage("prompt"):
+            prompt = self.build_prompt(source_name, name_mapping, extra_prompt)
+
+        try:
+            # 上傳前正規化：偵測實際格式、縮小過大的掃描檔並重新編碼
+            with self._stage("prepare"):
+                prepared = prepare_image(image_bytes, self.image_options)
+            metrics.inc(f"{METRIC_PREFIX}_bytes_total", len(prepared.data), direction="upload")
+            result.original_size = prepared.original_size
+            result.upload_bytes = len(prepared.data)
+            if prepared.reencoded:
+                self.logger.info(
+                    f"已正規化圖片: {prepared.original_format} {prepared.original_size} "
+                    f"{len(image_bytes) / 1024:.0f}KB → {prepared.mime_type} {prepared.size} "
+                    f"{len(prepared.data) / 1024:.0f}KB"
+                )
+
+            backends = self.router.order()
+
+            # 查詢翻譯快取（相同圖片 + 提示詞 + 模型不重複付費呼叫；任一候選後端的結果皆可用）
+            if self.cache is not None:
+                with self._stage("cache"):
+                    hit = None
+                    for backend in backends:
+                        if not backend.cacheable:
+                            continue
+                        cached = self.cache.get(
+                            ResultCache.make_key(prepared.data, prompt, backend.model), record=False
+                        )
+                        if cached is not None:
+                            hit = backend
+                            break
+                    # 每頁只計一次查詢，不論比對了幾個後端的鍵
+                    self.cache.record_lookup(hit is not None)
+                metrics.inc(f"{METRIC_PREFIX}_cache_total", result="hit" if hit else "miss")
+                if hit is not None:
+                    self.logger.info(f"命中翻譯快取: {os.path.basename(source_name)}")
+                    result.cached = True
+                    result.backend = hit.name
+                    return self._finalize(result, cached, finalize)
+
+            # 近似重複頁面（感知雜湊）：沿用相似頁面的翻譯，不再呼叫模型（只比對整頁，不比對分塊）
+            page_hash = marker = None
+            if self.dedupe is not None and finalize:
+                page_hash, marker, reused = self._find_duplicate(prepared, prompt, backends, source_name, result)
+                if reused is not None:
+                    return self._finalize(result, reused, finalize)
+
+            try:
+                backend, response = self._call_routed(backends, prepared, prompt, source_name, result)
+                self.logger.info("收到圖片資料")
+                result.backend = backend.name
+                cache_key = ResultCache.make_key(prepared.data, prompt, backend.model)
+                # 快取保存模型原始輸出，不同輸出格式設定可共用（原圖照回的結果不保存）
+                if self.cache is not None and backend.cacheable:
+                    self.cache.put(cache_key, response.data)
+                if page_hash is not None and backend.cacheable:
+                    self.dedupe.add(context_key(prompt), page_hash, backend.model, cache_key, source_name)
+            finally:
+                # 讓等待此頁的相似頁面繼續（成功時已可查到索引）
+                if self.dedupe is not None:
+                    self.dedupe.release(marker)
+            return self._finalize(result, response.data, finalize)
 
         except Exception as e:
-            self.logger.error(f"AI 處理失敗: {e}")
+            result.error = str(e)
+            result.retryable = is_retryable(e)
+            kind = "重試次數或時間預算用盡" if result.retryable else "不可重試的錯誤"
+            self.logger.error(f"AI 處理失敗（{kind}，共嘗試 {result.attempts} 次）: {e}")
             # 如果失敗，印出詳細錯誤以便除錯
             if hasattr(e, 'response'):
                 self.logger.error(f"詳細錯誤回應: {e.response}")
-            return False
+            return result
+
+    def _skip_textless(self, image_bytes, source_name):
+        """
+        本機判斷頁面是否沒有文字（有特定圖片要求的頁面一律送出）
+
+        Returns:
+            skip 模式且判斷為無文字時，回傳以原圖輸出的 ProcessResult；否則回傳 None
+        """
+        try:
+            with self._stage("textless"):
+                analysis = analyze_page(image_bytes, self.textless_options)
+        except Exception as e:
+            self.logger.warning(f"無文字頁面判斷失敗，照常送出: {e}")
+            return None
+
+        skip = analysis.textless and self.textless_options.mode == TEXTLESS_SKIP
+        # 以主要後端目前觀察到的平均延遲估計省下的時間
+        latency = self.router.stats()[0]["latency_s"] if skip else None
+        self.textless_stats.record(analysis, skip, latency)
+        name = os.path.basename(source_name)
+        if not analysis.textless:
+            return None
+        if not skip:
+            self.logger.info(
+                f"判斷為無文字頁面（{analysis.reason}，{analysis.elapsed * 1000:.0f}ms），記錄模式照常送出: {name}"
+            )
+            return None
+
+        saved = f"，約省下 {latency:.1f} 秒" if latency is not None else ""
+        self.logger.info(
+            f"略過無文字頁面: {name}（{analysis.reason}，判斷 {analysis.elapsed * 1000:.0f}ms{saved}），以原圖輸出"
+        )
+        result = ProcessResult(success=False, textless=analysis.reason, original_size=analysis.size)
+        return self._finalize(result, image_bytes)
+
+    def _call_routed(self, backends, prepared, prompt, source_name, result):
+        """
+        依路由策略逐一嘗試後端，前一個用盡重試仍失敗才改用下一個
+
+        Returns:
+            (成功的後端, BackendResponse)
+        """
+        for position, backend in enumerate(backends):
+            try:
+                return backend, self._call_backend(backend, prepared, prompt, source_name, result)
+            except Exception as e:
+                self.router.record_failure(backend)
+                if position + 1 >= len(backends):
+                    raise
+                self.logger.warning(f"翻譯後端 {backend.name} 失敗: {e}，改用 {backends[position + 1].name}")
+
+    def _find_duplicate(self, prepared, prompt, backends, source_name, result):
+        """
+        查詢感知雜湊相近、已翻譯過的頁面
+
+        Returns:
+            (感知雜湊, 處理中標記, 沿用的模型輸出)；無法計算雜湊時皆為 None，
+            未命中時模型輸出為 None，處理中標記須在翻譯結束後交還 release
+        """
+        try:
+            with self._stage("dedupe"):
+                page_hash = compute_hash(prepared.data)
+                entry, marker = self.dedupe.lookup(
+                    context_key(prompt), page_hash, {backend.model for backend in backends}
+                )
+        except Exception as e:
+            self.logger.warning(f"計算感知雜湊失敗，略過近似頁面比對: {e}")
+            return None, None, None
+
+        # 索引中的項目可能已從快取淘汰
+        # 近似頁面的統計由 dedupe.record 記錄，不計入快取的命中 / 未命中
+        data = self.cache.get(entry.cache_key, record=False) if entry is not None else None
+        self.dedupe.record(data is not None)
+        if data is None:
+            return page_hash, marker, None
+
+        self.logger.info(f"沿用近似重複頁面的翻譯: {os.path.basename(source_name)} ≈ {entry.source}")
+        result.cached = True
+        result.deduplicated = entry.source
+        result.backend = next(backend.name for backend in backends if backend.model == entry.model)
+        return page_hash, marker, data
+
+    def textless_stats_summary(self):
+        """無文字頁面判斷的統計（停用時為 None）"""
+        return self.textless_stats.summary() if self.textless_options.enabled else None
+
+    def dedupe_stats(self):
+        """近似重複頁面的統計（停用時為 None）"""
+        return self.dedupe.stats() if self.dedupe is not None else None
+
+    @contextmanager
+    def _stage(self, stage, **attributes):
+        """同時記錄分段耗時指標與追蹤 span（engine.<stage>）"""
+        with span(f"engine.{stage}", **attributes), metrics.time_stage(stage):
+            yield
+
+    def _call_backend(self, backend, prepared, prompt, source_name, result):
+        """
+        以重試策略呼叫單一後端，成功時記錄延遲供路由使用
+
+        Returns:
+            BackendResponse
+        """
+        # 預估輸入 token（CJK 提示詞約一字一 token + 圖片），回應後以實際用量校正
+        estimated_tokens = len(prompt) + DEFAULT_IMAGE_TOKENS
+        # 優先等級由呼叫端的上下文決定（互動請求 / 批次 / 背景）
+        priority = current_priority()
+
+        self.logger.info(f"正在傳送圖片至 {backend.name} ...")
+
+        def call_api():
+            # 每次嘗試都重新挑選金鑰，剛回應 429 的金鑰在冷卻中會被避開
+            key = self.key_pool.acquire() if backend.uses_quota else None
+            try:
+                response = send(key)
+            except Exception as e:
+                if key is not None:
+                    self.key_pool.release(key, error=e)
+                raise
+            if key is not None:
+                self.key_pool.release(key)
+            return response
+
+        def send(key):
+            rate_limiter = key.rate_limiter if key is not None else None
+            if rate_limiter is not None:
+                with self._stage("rate_limit_wait"):
+                    waited = rate_limiter.acquire(tokens=estimated_tokens, reserve=quota_reserve(priority))
+                if waited >= 1:
+                    self.logger.info(f"等待 Gemini 配額 {waited:.1f} 秒（API Key {key.label}）")
+            limiter = self.concurrency.get(backend.name)
+            if limiter is not None:
+                with self._stage("concurrency_wait"):
+                    slot = limiter.acquire(priority)
+            result.attempts += 1
+            metrics.inc(f"{METRIC_PREFIX}_requests_total", backend=backend.name)
+            started = time.monotonic()
+            try:
+                with self._stage("model", backend=backend.name, attempt=result.attempts):
+                    response = backend.generate(
+                        prepared.data, prepared.mime_type, prompt, api_key=key.key if key is not None else None
+                    )
+            except Exception as e:
+                metrics.record_failure(e, stage="model")
+                if limiter is not None:
+                    limiter.release(slot, error=e)
+                raise
+            latency = time.monotonic() - started
+            if limiter is not None:
+                limiter.release(slot, latency=latency)
+            self.router.record_success(backend, latency)
+            if rate_limiter is not None and response.prompt_tokens is not None:
+                rate_limiter.settle(estimated_tokens, response.prompt_tokens)
+            return response
+
+        def on_retry(record):
+            result.retries.append(record)
+            status = f" (HTTP {record.status_code})" if record.status_code else ""
+            self.logger.warning(
+                f"第 {record.attempt} 次呼叫失敗{status}: {record.error}，"
+                f"{record.delay:.1f} 秒後重試 ({os.path.basename(source_name)})"
+            )
+
+        # 呼叫 API（暫時性錯誤依重試策略退避重送）
+        try:
+            return self.retry_policy.run(call_api, on_retry=on_retry)
+        except NoImageReturned:
+            self.logger.warning("API 回傳成功，但未找到圖片資料。可能模型僅回傳了文字描述。")
+            raise
+
+    def concurrency_stats(self):
+        """各後端自適應並行度的目前上限（停用時為空清單）"""
+        return [limiter.stats() for limiter in self.concurrency.values()]
+
+    @property
+    def rate_limiter(self):
+        """第一把金鑰的配額限流器（停用時為 None）"""
+        return self.key_pool.primary.rate_limiter
+
+    @property
+    def output_extension(self):
+        """輸出檔案的副檔名（依輸出格式設定，例如 .jpg）"""
+        return self.output_options.extension
+
+    def _translate_parts(self, images, result, source_name, name_mapping, extra_prompt, workers, kind):
+        """
+        並行翻譯從頁面切出的多個部分（分塊或文字區域）
+
+        各部分各自走快取、限流與重試；嘗試次數與上傳位元組累計到 result。
+        任一部分失敗則整頁失敗（可重試與否取決於失敗的部分）。
+
+        Returns:
+            各部分的模型原始輸出（與 images 順序相同）；失敗時回傳 None 並設定 result.error
+        """
+        total = len(images)
+
+        def translate_part(image):
+            # 各部分以上傳格式編碼，prepare_image 不需再重新編碼
+            data = encode_image(image, self.image_options.upload_format, self.image_options.upload_quality)
+            return self._translate_single(data, source_name, name_mapping, extra_prompt, finalize=False)
+
+        with ThreadPoolExecutor(max_workers=min(workers, total), thread_name_prefix=kind) as executor:
+            part_results = list(executor.map(bind_context(translate_part), images))
+        images.clear()
+
+        for part_result in part_results:
+            result.attempts += part_result.attempts
+            result.retries.extend(part_result.retries)
+            result.upload_bytes += part_result.upload_bytes
+        result.cached = all(part_result.cached for part_result in part_results)
+        result.backend = part_results[0].backend
+
+        failed = [index for index, part_result in enumerate(part_results) if not part_result]
+        if failed:
+            label = "塊" if kind == "tile" else "個區域"
+            first = part_results[failed[0]]
+            result.error = f"第 {failed[0] + 1}/{total} {label}翻譯失敗: {first.error}"
+            result.retryable = any(part_results[index].retryable for index in failed)
+            self.logger.error(f"{os.path.basename(source_name)}: {len(failed)}/{total} {label}翻譯失敗")
+            return None
+        return [part_result.data for part_result in part_results]
+
+    def _translate_tiled(self, page, source_name, name_mapping=None, extra_prompt=""):
+        """並行翻譯長條頁面的各塊並縫合"""
+        total = len(page.spans)
+        self.logger.info(
+            f"長條頁面 {os.path.basename(source_name)} {page.size} 分為 {total} 塊處理"
+        )
+        result = ProcessResult(success=False, original_size=page.size, tiles=total)
+        tile_data = self._translate_parts(
+            page.tiles, result, source_name, name_mapping, extra_prompt, self.tiling_options.workers, "tile"
+        )
+        if tile_data is None:
+            return result
+
+        try:
+            with self._stage("finalize"):
+                stitched = stitch_tiles(page, tile_data)
+                result.data, result.mime_type = encode_output_in_pool(stitched, self.output_options)
+        except Exception as e:
+            self.logger.error(f"分塊縫合失敗: {e}")
+            result.error = f"分塊縫合失敗: {e}"
+            return result
+
+        result.success = True
+        return result
+
+    def _translate_regions(self, page, source_name, name_mapping=None, extra_prompt=""):
+        """並行翻譯頁面中的文字區域，貼回原圖"""
+        total = len(page.boxes)
+        self.logger.info(
+            f"區域模式 {os.path.basename(source_name)} {page.size}: {total} 個文字區域，佔頁面 {page.coverage:.0%}"
+        )
+        result = ProcessResult(success=False, original_size=page.size, regions=total)
+        region_data = self._translate_parts(
+            page.crops, result, source_name, name_mapping, extra_prompt, self.region_options.workers, "region"
+        )
+        if region_data is None:
+            return result
+
+        try:
+            with self._stage("finalize"):
+                composited = composite_regions(page, region_data, self.region_options.padding)
+                result.data, result.mime_type = encode_output_in_pool(composited, self.output_options)
+        except Exception as e:
+            self.logger.error(f"區域合成失敗: {e}")
+            result.error = f"區域合成失敗: {e}"
+            return result
+
+        result.success = True
+        return result
+
+    def _finalize(self, result, raw_data, finalize=True):
+        """
+        對模型輸出進行後處理（在共用編碼執行緒池中執行），並標記成功
+
+        後處理失敗時保留模型原始輸出，不讓整頁失敗。
+        """
+        if not finalize:
+            result.data = raw_data
+            result.success = True
+            return result
+        try:
+            with self._stage("finalize"):
+                result.data, result.mime_type = finalize_output_in_pool(
+                    raw_data, self.output_options, result.original_size
+                )
+        except Exception as e:
+            self.logger.warning(f"輸出後處理失敗，保留原始輸出: {e}")
+            result.data, result.mime_type = raw_data, None
+        result.success = True
+        return result
 
     # 舊的 analyze_image 方法保留作為備案，或者直接移除
     def analyze_image(self, image_path):
@@ -0,0 +1,437 @@
+"""
+漫畫壓縮檔（ZIP/CBZ）與 PDF 工具
+
+- 依自然順序列出壓縮檔內的頁面（page2 排在 page10 之前）
+- 以串流方式產生 ZIP：每加入一頁就能取得對應的位元組，不需先寫完整個檔案
+- 將資料夾、ZIP/CBZ、PDF 統一視為「頁面來源」，逐頁延遲讀取，不需先解壓縮到磁碟
+- 將翻譯結果依頁序寫回資料夾或 CBZ（資料夾模式以「暫存檔 + 改名」原子寫入，中斷時不會留下截斷的圖片）
+"""
+import io
+import os
+import re
+import tempfile
+import threading
+import zipfile
+
+from PIL import Image
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp')
+ARCHIVE_EXTENSIONS = ('.zip', '.cbz')
+PDF_EXTENSIONS = ('.pdf',)
+
+# PDF 頁面轉成圖片時的預設解析度
+DEFAULT_PDF_DPI = 200
+
+
+def natural_sort_key(name):
+    """自然排序鍵：數字部分依數值比較"""
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r'(\d+)', name)]
+
+
+def is_image_name(name):
+    """是否為支援的圖片檔名"""
+    return name.lower().endswith(IMAGE_EXTENSIONS)
+
+
+def is_archive_name(name):
+    """是否為支援的壓縮檔檔名"""
+    return name.lower().endswith(ARCHIVE_EXTENSIONS)
+
+
+def is_pdf_name(name):
+    """是否為 PDF 檔名"""
+    return name.lower().endswith(PDF_EXTENSIONS)
+
+
+def list_zip_pages(zf):
+    """
+    列出壓縮檔中的圖片頁面（依自然順序）
+
+    略過資料夾、macOS 的 __MACOSX 中繼資料與隱藏檔。
+
+    Returns:
+        ZipInfo 列表
+    """
+    pages = []
+    for info in zf.infolist():
+        if info.is_dir():
+            continue
+        parts = info.filename.replace('\\', '/').split('/')
+        if '__MACOSX' in parts or parts[-1].startswith('.'):
+            continue
+        if is_image_name(info.filename):
+            pages.append(info)
+    return sorted(pages, key=lambda info: natural_sort_key(info.filename))
+
+
+class _ChunkBuffer(io.RawIOBase):
+    """只能寫入、不可定位的緩衝區，讓 zipfile 以串流模式輸出"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class StreamingZipWriter:
+    """
+    串流 ZIP 產生器
+
+    用法：
+        writer = StreamingZipWriter()
+        yield writer.add("001.jpg", data)
+        yield writer.close()
+    """
+
+    def __init__(self, compression=zipfile.ZIP_STORED):
+        # 圖片本身已壓縮，預設直接儲存以節省 CPU
+        self._buffer = _ChunkBuffer()
+        self._zip = zipfile.ZipFile(self._buffer, mode="w", compression=compression)
+        self._names = set()
+
+    def add(self, name, data):
+        """加入一個檔案，回傳這次產生的 ZIP 位元組"""
+        name = self._unique_name(name)
+        self._zip.writestr(name, data)
+        return self._buffer.drain()
+
+    def close(self):
+        """寫入中央目錄，回傳剩餘的 ZIP 位元組"""
+        self._zip.close()
+        return self._buffer.drain()
+
+    def _unique_name(self, name):
+        # 避免重複檔名（例如不同子資料夾的同名頁面被攤平）
+        candidate = name
+        stem, ext = os.path.splitext(name)
+        counter = 1
+        while candidate in self._names:
+            candidate = f"{stem}_{counter}{ext}"
+            counter += 1
+        self._names.add(candidate)
+        return candidate
+
+
+class Page:
+    """
+    頁面來源中的一頁
+
+    Attributes:
+        index: 頁序（從 0 開始）
+        name: 頁面名稱（資料夾中的檔名、壓縮檔中的路徑或 PDF 的虛擬檔名）
+        fingerprint: 不需讀取內容即可取得的變更指紋（資料夾: 大小與 mtime；壓縮檔: 大小與 CRC）
+    """
+
+    def __init__(self, index, name, loader, fingerprint=None):
+        self.index = index
+        self.name = name
+        self.fingerprint = fingerprint
+        self._loader = loader
+
+    def read(self):
+        """讀取頁面內容（延遲到實際需要時才讀取）"""
+        return self._loader()
+
+    def __repr__(self):
+        return f"Page({self.index}, {self.name!r})"
+
+
+def folder_page(directory, name, index, fingerprint=None):
+    """
+    資料夾中的單一圖片頁面
+
+    Args:
+        fingerprint: 已知的指紋（未提供時依檔案的大小與 mtime 計算）
+    """
+    path = os.path.join(directory, name)
+    if fingerprint is None:
+        fingerprint = _stat_fingerprint(os.stat(path))
+
+    def load():
+        with open(path, "rb") as f:
+            return f.read()
+
+    return Page(index, name, load, fingerprint)
+
+
+class PageSource:
+    """
+    頁面來源（資料夾 / ZIP / CBZ / PDF）
+
+    以 context manager 使用，確保壓縮檔與 PDF 的檔案代號會被關閉：
+        with PageSource(path) as source:
+            for page in source.pages:
+                data = page.read()
+    """
+
+    def __init__(self, path, pdf_dpi=DEFAULT_PDF_DPI):
+        self.path = path
+        self.pdf_dpi = pdf_dpi
+        self.pages = []
+        self._lock = threading.Lock()
+        self._zip = None
+        self._pdf = None
+
+        if os.path.isdir(path):
+            self._open_folder()
+        elif is_archive_name(path):
+            self._open_zip()
+        elif is_pdf_name(path):
+            self._open_pdf()
+        else:
+            raise ValueError(f"不支援的輸入: {path}（請使用資料夾、ZIP、CBZ 或 PDF）")
+
+    @property
+    def kind(self):
+        """來源類型：folder / archive / pdf"""
+        if self._zip is not None:
+            return "archive"
+        if self._pdf is not None:
+            return "pdf"
+        return "folder"
+
+    def _open_folder(self):
+        # 列出目錄時一併取得大小與 mtime 作為指紋
+        with os.scandir(self.path) as it:
+            fingerprints = {
+                entry.name: _stat_fingerprint(entry.stat())
+                for entry in it
+                if is_image_name(entry.name) and entry.is_file()
+            }
+        names = sorted(fingerprints, key=natural_sort_key)
+        self.pages = [
+            folder_page(self.path, name, i, fingerprints[name]) for i, name in enumerate(names)
+        ]
+
+    def _open_zip(self):
+        self._zip = zipfile.ZipFile(self.path)
+
+        def loader(info):
+            def load():
+                # 多個工作執行緒共用同一個 ZipFile，讀取時加鎖
+                with self._lock:
+                    return self._zip.read(info)
+            return load
+
+        self.pages = [
+            Page(i, info.filename, loader(info), f"{info.file_size}:{info.CRC:08x}")
+            for i, info in enumerate(list_zip_pages(self._zip))
+        ]
+
+    def _open_pdf(self):
+        try:
+            import pypdfium2 as pdfium
+        except ImportError:
+            raise RuntimeError("讀取 PDF 需要 pypdfium2，請執行: pip install pypdfium2")
+
+        self._pdf = pdfium.PdfDocument(self.path)
+        pdf_fingerprint = f"{_stat_fingerprint(os.stat(self.path))}:{self.pdf_dpi}"
+        stem = os.path.splitext(os.path.basename(self.path))[0]
+        digits = max(3, len(str(len(self._pdf))))
+
+        def loader(index):
+            def load():
+                return self._render_pdf_page(index)
+            return load
+
+        self.pages = [
+            Page(i, f"{stem}_{i + 1:0{digits}d}.png", loader(i), f"{pdf_fingerprint}:{i}")
+            for i in range(len(self._pdf))
+        ]
+
+    def _render_pdf_page(self, index):
+        """將 PDF 頁面算繪為 PNG（pdfium 非執行緒安全，需加鎖）"""
+        with self._lock:
+            page = self._pdf[index]
+            try:
+                image = page.render(scale=self.pdf_dpi / 72).to_pil()
+            finally:
+                page.close()
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG")
+        return buffer.getvalue()
+
+    def close(self):
+        if self._zip is not None:
+            self._zip.close()
+        if self._pdf is not None:
+            self._pdf.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def _stat_fingerprint(stat):
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def atomic_write(path, data):
+    """原子寫入：先寫入同目錄的暫存檔再改名，中斷時不會留下寫到一半的檔案"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix=".", suffix=".partial")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def output_name_for(page_name, ext=".jpg"):
+    """翻譯後的檔名：保留原檔名（含子資料夾），副檔名改為輸出格式"""
+    return os.path.splitext(page_name)[0] + ext
+
+
+class FolderOutput:
+    """將翻譯結果寫入資料夾（每頁一個檔案）"""
+
+    def __init__(self, path, ext=".jpg"):
+        self.path = path
+        self.ext = ext
+        os.makedirs(path, exist_ok=True)
+        # 一次列出既有輸出，避免每頁各自 stat
+        with os.scandir(path) as it:
+            self._existing = {entry.name for entry in it if entry.is_file()}
+
+    def output_path(self, page):
+        # 壓縮檔中的子資料夾攤平為檔名，避免寫出輸出資料夾以外
+        name = output_name_for(page.name, self.ext).replace("\\", "/").replace("/", "_")
+        return os.path.join(self.path, name)
+
+    def exists(self, page):
+        return os.path.basename(self.output_path(page)) in self._existing
+
+    def verify(self, page):
+        """確認既有輸出是完整的圖片（舊版非原子寫入時可能留下截斷的檔案）"""
+        try:
+            with Image.open(self.output_path(page)) as image:
+                image.load()
+            return True
+        except Exception:
+            return False
+
+    def keep(self, page):
+        """保留已存在的輸出（資料夾模式不需處理）"""
+
+    def write(self, page, data):
+        """原子寫入（見 atomic_write）"""
+        path = self.output_path(page)
+        atomic_write(path, data)
+        self._existing.add(os.path.basename(path))
+        return path
+
+    def skip(self, page):
+        """處理失敗的頁面（資料夾模式不需處理）"""
+
+    def close(self, completed=True):
+        """每頁已各自寫入，不需處理"""
+
+
+class ArchiveOutput:
+    """
+    將翻譯結果依頁序寫入 CBZ
+
+    呼叫端需依頁序呼叫 write / keep / skip。先寫到暫存檔，close() 時才取代正式檔案；
+    若輸出檔已存在，其中已翻譯的頁面會直接沿用（與資料夾模式的「已存在則跳過」一致）。
+    中途停止時，舊輸出檔中尚未處理到的頁面會原樣帶入新檔，不會因中斷而遺失。
+    """
+
+    def __init__(self, path, ext=".jpg"):
+        self.path = path
+        self.ext = ext
+        self._existing = None
+        if os.path.exists(path):
+            self._existing = zipfile.ZipFile(path)
+        parent = os.path.dirname(os.path.abspath(path))
+        os.makedirs(parent, exist_ok=True)
+        self._tmp_path = path + ".partial"
+        self._zip = zipfile.ZipFile(self._tmp_path, "w", compression=zipfile.ZIP_STORED)
+        # 已依頁序處理過的頁面（write / keep / skip）
+        self._handled = set()
+
+    def output_path(self, page):
+        return f"{self.path}:{output_name_for(page.name, self.ext)}"
+
+    def exists(self, page):
+        if self._existing is None:
+            return False
+        try:
+            self._existing.getinfo(output_name_for(page.name, self.ext))
+            return True
+        except KeyError:
+            return False
+
+    def verify(self, page):
+        """舊輸出檔只在完整寫完後才取代正式檔案，其中的頁面一定完整"""
+        return True
+
+    def keep(self, page):
+        """沿用舊輸出檔中的頁面"""
+        name = output_name_for(page.name, self.ext)
+        self._zip.writestr(name, self._existing.read(name))
+        self._handled.add(name)
+
+    def write(self, page, data):
+        name = output_name_for(page.name, self.ext)
+        self._zip.writestr(name, data)
+        self._handled.add(name)
+        return self.output_path(page)
+
+    def skip(self, page):
+        """處理失敗的頁面不寫入，下次執行時會重新翻譯"""
+        self._handled.add(output_name_for(page.name, self.ext))
+
+    def _carry_over(self):
+        """將舊輸出檔中尚未處理到的頁面原樣帶入新檔"""
+        for info in self._existing.infolist():
+            if info.filename not in self._handled:
+                self._zip.writestr(info, self._existing.read(info))
+
+    def close(self, completed=True):
+        """
+        完成輸出並取代正式檔案
+
+        Args:
+            completed: 是否已處理完所有頁面；False（例外、中止）時保留舊輸出檔中
+                尚未處理到的頁面，寫入失敗或沒有任何頁面時則保留原檔不動
+        """
+        commit = completed or bool(self._handled)
+        try:
+            if commit and not completed and self._existing is not None:
+                self._carry_over()
+            self._zip.close()
+        except Exception:
+            commit = False
+            raise
+        finally:
+            if self._existing is not None:
+                self._existing.close()
+            if commit:
+                os.replace(self._tmp_path, self.path)
+            else:
+                try:
+                    os.remove(self._tmp_path)
+                except OSError:
+                    pass
+
+
+def open_output(path, ext=".jpg"):
+    """依路徑建立輸出：.cbz/.zip 為壓縮檔，其餘為資料夾"""
+    if is_archive_name(path):
+        return ArchiveOutput(path, ext)
+    return FolderOutput(path, ext)
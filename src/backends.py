@@ -0,0 +1,353 @@
+"""
+可替換的翻譯後端與路由
+
+AIEngine 不再直接綁定 genai.Client 與固定模型，而是透過後端介面呼叫：
+- GeminiBackend: Gemini generateContent（可指定模型與 GEMINI_BASE_URL）
+- EchoBackend: 原圖照回，不呼叫任何 API（試跑流程、離線測試用）
+
+BackendRouter 依策略決定每個工作嘗試後端的順序：
+- fallback: 依設定順序，前一個失敗才換下一個
+- latency: 觀察到的延遲（指數移動平均）最低者優先，尚未量測過的優先試探
+- cost: 每張圖片估計成本最低者優先
+
+連續失敗達門檻的後端會暫時排到最後，冷卻時間過後再恢復。
+
+設定格式（TRANSLATION_BACKENDS，逗號分隔，依序為 fallback 順序）：
+    gemini:gemini-3-pro-image-preview, gemini:gemini-2.5-flash-image@0.039, echo
+"""
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from google import genai
+from google.genai import types
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "gemini-3-pro-image-preview"
+
+# 每張輸出圖片的估計成本（美元），僅供 cost 策略排序
+MODEL_COSTS = {
+    "gemini-3-pro-image-preview": 0.134,
+    "gemini-2.5-flash-image": 0.039,
+    "gemini-2.5-flash-image-preview": 0.039,
+}
+DEFAULT_COST = 0.134
+
+ROUTING_POLICIES = ("fallback", "latency", "cost")
+DEFAULT_POLICY = "fallback"
+
+# 延遲指數移動平均的權重
+LATENCY_EWMA_ALPHA = 0.3
+
+# 連續失敗達此次數的後端暫時排到最後
+FAILURE_THRESHOLD = 3
+FAILURE_COOLDOWN = 60.0
+
+
+class NoImageReturned(RuntimeError):
+    """後端回應成功但沒有圖片（例如模型只回傳文字），不可重試，但可改用下一個後端"""
+
+
+@dataclass
+class BackendResponse:
+    """後端回傳的圖片與實際用量"""
+
+    data: bytes
+    mime_type: Optional[str] = None
+    prompt_tokens: Optional[int] = None
+
+
+class TranslationBackend:
+    """
+    翻譯後端介面
+
+    子類別實作 generate()；暫時性錯誤直接拋出，交由 AIEngine 的重試策略處理。
+
+    Attributes:
+        name: 後端名稱（日誌、統計與路由使用）
+        model: 模型名稱（也作為翻譯快取鍵的一部分）
+        cost_per_image: 每張圖片估計成本（美元）
+        uses_quota: 是否消耗 Gemini 配額（受配額限流器管制）
+        cacheable: 結果是否寫入翻譯快取（原圖照回等非真正翻譯的後端為 False）
+    """
+
+    kind = "base"
+    uses_quota = False
+    cacheable = True
+
+    def __init__(self, model, cost_per_image=0.0, name=None):
+        self.model = model
+        self.cost_per_image = cost_per_image
+        self.name = name or f"{self.kind}:{model}"
+
+    def generate(self, image_data, mime_type, prompt, api_key=None):
+        """
+        送出圖片與提示詞
+
+        Args:
+            api_key: 本次呼叫使用的金鑰（由 AIEngine 的金鑰池挑選；不消耗配額的後端忽略）
+
+        Returns:
+            BackendResponse
+
+        Raises:
+            NoImageReturned: 回應中沒有圖片
+        """
+        raise NotImplementedError
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {self.name}>"
+
+
+class GeminiBackend(TranslationBackend):
+    """Gemini generateContent 後端（每把金鑰一個 Client，跨請求重用連線池）"""
+
+    kind = "gemini"
+    uses_quota = True
+
+    def __init__(self, model=DEFAULT_MODEL, api_key=None, base_url=None, cost_per_image=None, name=None):
+        super().__init__(
+            model,
+            MODEL_COSTS.get(model, DEFAULT_COST) if cost_per_image is None else cost_per_image,
+            name
+        )
+        # 未指定金鑰的呼叫使用的預設金鑰
+        self.api_key = api_key or os.getenv("GEMINI_API_KEY")
+
+        # GEMINI_BASE_URL 可指向本機的模擬伺服器，供離線壓測使用
+        base_url = base_url or os.getenv("GEMINI_BASE_URL")
+        self.http_options = types.HttpOptions(base_url=base_url) if base_url else None
+        self._clients = {}
+        self._clients_lock = threading.Lock()
+
+        # 設定安全性設定 (盡量放寬，避免因漫畫內容被誤判而拒絕處理)
+        self.config = types.GenerateContentConfig(
+            safety_settings=[
+                types.SafetySetting(category=category, threshold="BLOCK_NONE")
+                for category in (
+                    "HARM_CATEGORY_HATE_SPEECH",
+                    "HARM_CATEGORY_DANGEROUS_CONTENT",
+                    "HARM_CATEGORY_SEXUALLY_EXPLICIT",
+                    "HARM_CATEGORY_HARASSMENT",
+                )
+            ]
+        )
+
+    def client_for(self, api_key=None):
+        """取得金鑰對應的 Client（首次使用時建立）"""
+        api_key = api_key or self.api_key
+        if not api_key:
+            raise ValueError("未找到 GEMINI_API_KEY，請檢查 .env 檔案。")
+        with self._clients_lock:
+            client = self._clients.get(api_key)
+            if client is None:
+                client = self._clients[api_key] = genai.Client(api_key=api_key, http_options=self.http_options)
+            return client
+
+    def generate(self, image_data, mime_type, prompt, api_key=None):
+        response = self.client_for(api_key).models.generate_content(
+            model=self.model,
+            contents=[types.Part.from_bytes(data=image_data, mime_type=mime_type), prompt],
+            config=self.config
+        )
+        prompt_tokens = None
+        if response.usage_metadata is not None:
+            prompt_tokens = response.usage_metadata.prompt_token_count
+
+        # Gemini 回傳圖片通常會在 parts 中包含 inline_data
+        if response.candidates and response.candidates[0].content and response.candidates[0].content.parts:
+            for part in response.candidates[0].content.parts:
+                if part.inline_data:
+                    return BackendResponse(
+                        data=part.inline_data.data,
+                        mime_type=part.inline_data.mime_type,
+                        prompt_tokens=prompt_tokens
+                    )
+
+        try:
+            text = response.text
+        except Exception:
+            text = None
+        raise NoImageReturned(f"API 回傳成功，但未找到圖片資料（回應內容: {text}）")
+
+
+class EchoBackend(TranslationBackend):
+    """原圖照回，不呼叫任何 API（試跑整個流程、離線測試用）"""
+
+    kind = "echo"
+    # 照回的原圖不是翻譯結果，不可讓之後的真正後端沿用
+    cacheable = False
+
+    def __init__(self, model="echo", cost_per_image=0.0, name=None):
+        super().__init__(model, cost_per_image, name or "echo")
+
+    def generate(self, image_data, mime_type, prompt, api_key=None):
+        return BackendResponse(data=image_data, mime_type=mime_type)
+
+
+# 後端種類登錄表（可用 register_backend_type 擴充）
+BACKEND_TYPES = {
+    GeminiBackend.kind: GeminiBackend,
+    EchoBackend.kind: EchoBackend,
+}
+
+
+def register_backend_type(kind, backend_class):
+    """登錄新的後端種類，之後即可在 TRANSLATION_BACKENDS 中以 kind:model 使用"""
+    BACKEND_TYPES[kind] = backend_class
+
+
+def parse_backend_spec(spec, default_model=DEFAULT_MODEL):
+    """
+    解析單一後端設定 "kind[:model][@cost]"
+
+    Returns:
+        TranslationBackend
+    """
+    spec = spec.strip()
+    cost = None
+    if "@" in spec:
+        spec, cost_text = spec.rsplit("@", 1)
+        cost = float(cost_text)
+    kind, _, model = spec.partition(":")
+    kind = kind.strip().lower()
+    if kind not in BACKEND_TYPES:
+        raise ValueError(f"未知的翻譯後端: {kind}（可用: {', '.join(BACKEND_TYPES)}）")
+
+    kwargs = {}
+    if model.strip():
+        kwargs["model"] = model.strip()
+    elif kind == GeminiBackend.kind:
+        kwargs["model"] = default_model
+    if cost is not None:
+        kwargs["cost_per_image"] = cost
+    return BACKEND_TYPES[kind](**kwargs)
+
+
+class _BackendState:
+    """路由器對單一後端的觀察紀錄"""
+
+    def __init__(self):
+        self.latency = None
+        self.successes = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+
+
+class BackendRouter:
+    """
+    依策略排序後端（可供多個工作執行緒同時使用）
+
+    Args:
+        backends: 後端清單（順序即 fallback 順序）
+        policy: fallback / latency / cost
+    """
+
+    def __init__(self, backends, policy=DEFAULT_POLICY, failure_threshold=FAILURE_THRESHOLD,
+                 cooldown=FAILURE_COOLDOWN):
+        if not backends:
+            raise ValueError("至少需要一個翻譯後端")
+        if policy not in ROUTING_POLICIES:
+            raise ValueError(f"未知的路由策略: {policy}（可用: {', '.join(ROUTING_POLICIES)}）")
+        self.backends = list(backends)
+        self.policy = policy
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._states = {id(backend): _BackendState() for backend in self.backends}
+
+    @property
+    def primary(self):
+        """設定中的第一個後端"""
+        return self.backends[0]
+
+    @classmethod
+    def from_config(cls, spec=None, policy=None, model=None):
+        """
+        依設定字串建立路由器
+
+        Args:
+            spec: 後端清單（TRANSLATION_BACKENDS 格式），空值時只使用單一 Gemini 後端
+            policy: 路由策略
+            model: 預設的 Gemini 模型（spec 未指定模型時使用）
+        """
+        model = model or DEFAULT_MODEL
+        if spec and spec.strip():
+            backends = [parse_backend_spec(item, model) for item in spec.split(",") if item.strip()]
+        else:
+            backends = [GeminiBackend(model=model)]
+        return cls(backends, policy=(policy or DEFAULT_POLICY).strip().lower())
+
+    @classmethod
+    def from_env(cls, model=None):
+        """
+        依環境變數建立路由器
+
+        TRANSLATION_BACKENDS / TRANSLATION_ROUTING / GEMINI_MODEL
+        """
+        return cls.from_config(
+            spec=os.getenv("TRANSLATION_BACKENDS"),
+            policy=os.getenv("TRANSLATION_ROUTING"),
+            model=model or os.getenv("GEMINI_MODEL")
+        )
+
+    def order(self):
+        """本次工作嘗試後端的順序"""
+        now = time.monotonic()
+        with self._lock:
+            ranked = []
+            for position, backend in enumerate(self.backends):
+                state = self._states[id(backend)]
+                cooling = 1 if state.cooldown_until > now else 0
+                if self.policy == "latency":
+                    # 尚未量測過的後端延遲視為 0，優先試探
+                    key = (cooling, state.latency or 0.0, position)
+                elif self.policy == "cost":
+                    key = (cooling, backend.cost_per_image, position)
+                else:
+                    key = (cooling, position)
+                ranked.append((key, backend))
+        return [backend for _, backend in sorted(ranked, key=lambda item: item[0])]
+
+    def record_success(self, backend, latency):
+        with self._lock:
+            state = self._states[id(backend)]
+            state.successes += 1
+            state.consecutive_failures = 0
+            state.cooldown_until = 0.0
+            if state.latency is None:
+                state.latency = latency
+            else:
+                state.latency += LATENCY_EWMA_ALPHA * (latency - state.latency)
+
+    def record_failure(self, backend):
+        with self._lock:
+            state = self._states[id(backend)]
+            state.failures += 1
+            state.consecutive_failures += 1
+            if state.consecutive_failures >= self.failure_threshold:
+                state.cooldown_until = time.monotonic() + self.cooldown
+                logger.warning(
+                    f"翻譯後端 {backend.name} 連續失敗 {state.consecutive_failures} 次，"
+                    f"暫停優先使用 {self.cooldown:.0f} 秒"
+                )
+
+    def stats(self):
+        """各後端的觀察統計"""
+        with self._lock:
+            return [
+                {
+                    "name": backend.name,
+                    "model": backend.model,
+                    "cost_per_image": backend.cost_per_image,
+                    "latency_s": self._states[id(backend)].latency,
+                    "successes": self._states[id(backend)].successes,
+                    "failures": self._states[id(backend)].failures,
+                }
+                for backend in self.backends
+            ]
@@ -0,0 +1,246 @@
+"""
+自適應並行度控制（AIMD）
+
+固定的工作執行緒數不是太保守，就是在尖峰時段觸發限流。控制器包在模型呼叫外層，
+依上游的實際表現調整同時進行中的請求數上限：
+- 加法增加：每次成功呼叫增加 1/上限，約每一輪往返（RTT）上限加 1
+- 乘法減少：回應 429 / 503 或延遲突增（超過基準延遲的 latency_spike 倍）時，上限乘以 backoff
+
+同一波請求（在上次減少之前就已送出的請求）回報的壅塞訊號只會讓上限減少一次。
+名額不足時依優先等級（src.scheduler）排隊，同一等級內先到先得。
+每個翻譯後端在本行程內只有一個控制器（AdaptiveLimiter.shared），重建引擎時沿用，
+目前上限與處理中數量輸出為指標。
+"""
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+
+from src.image_processing import env_flag
+from src.metrics import METRIC_PREFIX, metrics
+from src.retry import get_status_code
+from src.scheduler import current_priority, priority_rank
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MIN_CONCURRENCY = 1
+DEFAULT_MAX_CONCURRENCY = 16
+DEFAULT_INITIAL_CONCURRENCY = 2
+DEFAULT_BACKOFF = 0.5
+DEFAULT_LATENCY_SPIKE = 2.5
+
+# 視為壅塞的 HTTP 狀態碼
+CONGESTION_STATUS_CODES = (429, 503)
+# 基準延遲（指數移動平均）的權重，以及開始判斷延遲突增前所需的樣本數
+BASELINE_ALPHA = 0.1
+BASELINE_MIN_SAMPLES = 5
+
+
+@dataclass
+class ConcurrencyOptions:
+    """
+    自適應並行度設定
+
+    Attributes:
+        enabled: 是否啟用（停用時不限制，並行度完全由工作執行緒數決定）
+        min_limit: 上限的下限
+        max_limit: 上限的上限（工作執行緒數應不小於此值，控制器才有空間往上調）
+        initial_limit: 起始上限
+        backoff: 壅塞時上限乘上的比例
+        latency_spike: 延遲超過基準的幾倍視為壅塞（0 為不依延遲判斷）
+    """
+
+    enabled: bool = False
+    min_limit: int = DEFAULT_MIN_CONCURRENCY
+    max_limit: int = DEFAULT_MAX_CONCURRENCY
+    initial_limit: int = DEFAULT_INITIAL_CONCURRENCY
+    backoff: float = DEFAULT_BACKOFF
+    latency_spike: float = DEFAULT_LATENCY_SPIKE
+
+    def __post_init__(self):
+        self.min_limit = max(1, self.min_limit)
+        self.max_limit = max(self.min_limit, self.max_limit)
+        self.initial_limit = min(max(self.initial_limit, self.min_limit), self.max_limit)
+        if not 0 < self.backoff < 1:
+            raise ValueError("backoff 需介於 0 與 1 之間")
+
+    @classmethod
+    def from_env(cls):
+        """
+        依環境變數建立設定
+
+        ADAPTIVE_CONCURRENCY / ADAPTIVE_MIN_CONCURRENCY / ADAPTIVE_MAX_CONCURRENCY /
+        ADAPTIVE_INITIAL_CONCURRENCY / ADAPTIVE_BACKOFF / ADAPTIVE_LATENCY_SPIKE
+        """
+        try:
+            return cls(
+                enabled=env_flag("ADAPTIVE_CONCURRENCY", False),
+                min_limit=int(os.getenv("ADAPTIVE_MIN_CONCURRENCY", DEFAULT_MIN_CONCURRENCY)),
+                max_limit=int(os.getenv("ADAPTIVE_MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY)),
+                initial_limit=int(os.getenv("ADAPTIVE_INITIAL_CONCURRENCY", DEFAULT_INITIAL_CONCURRENCY)),
+                backoff=float(os.getenv("ADAPTIVE_BACKOFF", DEFAULT_BACKOFF)),
+                latency_spike=float(os.getenv("ADAPTIVE_LATENCY_SPIKE", DEFAULT_LATENCY_SPIKE)),
+            )
+        except ValueError as e:
+            logger.warning(f"自適應並行度設定無效，使用預設值: {e}")
+            return cls(enabled=env_flag("ADAPTIVE_CONCURRENCY", False))
+
+
+def is_congestion(error):
+    """是否為上游壅塞（429 / 503）"""
+    return get_status_code(error) in CONGESTION_STATUS_CODES
+
+
+class AdaptiveLimiter:
+    """
+    AIMD 並行度上限（執行緒安全）
+
+    用法：
+        started = limiter.acquire()
+        try:
+            ...
+        except Exception as e:
+            limiter.release(started, error=e)
+            raise
+        limiter.release(started, latency=...)
+    """
+
+    _shared = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, options, name="default"):
+        self.options = options
+        self.name = name
+        self.limit = float(options.initial_limit)
+        self.in_flight = 0
+        self.baseline = None
+        self.samples = 0
+        self.decreases = 0
+        self._last_decrease = 0.0
+        # 等待中的呼叫: (優先順位, 序號)
+        self._waiting = []
+        self._tickets = itertools.count()
+        self._condition = threading.Condition()
+        self._publish()
+
+    @classmethod
+    def shared(cls, options, name="default"):
+        """
+        取得後端在本行程內共用的控制器
+
+        新舊引擎（例如服務重新設定後仍在處理舊工作的引擎）共用同一個上限與處理中計數；
+        設定改變時沿用目前上限並限制在新的範圍內。
+        """
+        with cls._shared_lock:
+            limiter = cls._shared.get(name)
+            if limiter is None:
+                limiter = cls(options, name=name)
+                cls._shared[name] = limiter
+            elif limiter.options != options:
+                limiter.reconfigure(options)
+            return limiter
+
+    def reconfigure(self, options):
+        """套用新設定（保留目前上限與延遲基準）"""
+        with self._condition:
+            self.options = options
+            self.limit = min(max(self.limit, options.min_limit), options.max_limit)
+            self._publish()
+            self._condition.notify_all()
+
+    @property
+    def current_limit(self):
+        """目前允許同時進行的請求數"""
+        return max(1, int(self.limit))
+
+    def acquire(self, priority=None):
+        """
+        等待可用的名額，回傳開始時間（release 時傳回）
+
+        Args:
+            priority: 優先等級（預設依目前上下文）；較高等級的呼叫先取得名額
+        """
+        ticket = (priority_rank(priority or current_priority()), next(self._tickets))
+        with self._condition:
+            heapq.heappush(self._waiting, ticket)
+            while self.in_flight >= self.current_limit or self._waiting[0] != ticket:
+                self._condition.wait()
+            heapq.heappop(self._waiting)
+            self.in_flight += 1
+            self._publish()
+            # 仍有名額時讓下一個等待者接著取得
+            self._condition.notify_all()
+        return time.monotonic()
+
+    def release(self, started, latency=None, error=None):
+        """
+        歸還名額並依結果調整上限
+
+        Args:
+            started: acquire 回傳的開始時間
+            latency: 成功時的呼叫耗時（秒）
+            error: 失敗時的例外（只有 429 / 503 視為壅塞）
+        """
+        with self._condition:
+            self.in_flight -= 1
+            if error is not None:
+                if is_congestion(error):
+                    self._decrease(started, f"HTTP {get_status_code(error)}")
+            elif latency is not None:
+                if self._is_spike(latency):
+                    self._decrease(started, "latency")
+                else:
+                    # 加法增加：每個往返約加 1
+                    self.limit = min(self.options.max_limit, self.limit + 1 / self.limit)
+                # 突增的樣本也納入基準，上游延遲長期變高時基準會跟著調整
+                self._observe(latency)
+            self._publish()
+            self._condition.notify_all()
+
+    def _is_spike(self, latency):
+        return (
+            self.options.latency_spike > 0
+            and self.samples >= BASELINE_MIN_SAMPLES
+            and latency > self.baseline * self.options.latency_spike
+        )
+
+    def _observe(self, latency):
+        self.samples += 1
+        if self.baseline is None:
+            self.baseline = latency
+        else:
+            self.baseline += BASELINE_ALPHA * (latency - self.baseline)
+
+    def _decrease(self, started, reason):
+        # 上次減少之前送出的請求屬於同一波壅塞，不重複減少
+        if started < self._last_decrease:
+            return
+        previous = self.current_limit
+        self.limit = max(self.options.min_limit, self.limit * self.options.backoff)
+        self._last_decrease = time.monotonic()
+        self.decreases += 1
+        metrics.inc(f"{METRIC_PREFIX}_concurrency_decreases_total", backend=self.name, reason=reason)
+        logger.info(f"{self.name} 偵測到壅塞（{reason}），並行度上限 {previous} → {self.current_limit}")
+
+    def _publish(self):
+        metrics.set_gauge(f"{METRIC_PREFIX}_concurrency_limit", self.current_limit, backend=self.name)
+        metrics.set_gauge(f"{METRIC_PREFIX}_concurrency_in_flight", self.in_flight, backend=self.name)
+
+    def stats(self):
+        with self._condition:
+            return {
+                "backend": self.name,
+                "limit": self.current_limit,
+                "in_flight": self.in_flight,
+                "waiting": len(self._waiting),
+                "baseline_latency_s": self.baseline,
+                "decreases": self.decreases,
+            }
+
+
+metrics.describe(f"{METRIC_PREFIX}_concurrency_limit", "自適應並行度目前的上限（依後端）")
+metrics.describe(f"{METRIC_PREFIX}_concurrency_in_flight", "進行中的模型呼叫數（依後端）")
+metrics.describe(f"{METRIC_PREFIX}_concurrency_decreases_total", "自適應並行度因壅塞而降低的次數（依後端與原因）")
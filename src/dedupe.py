@@ -0,0 +1,339 @@
+"""
+近似重複頁面偵測（感知雜湊）
+
+單行本中有大量重複或幾乎相同的頁面：版權頁、章節標題頁、前情提要，
+以及不同掃描版本、重新發行之間的同一頁。內容快取只認得位元組完全相同的圖片，
+這些頁面每一頁仍要付費呼叫一次模型。
+
+這裡為每張成功翻譯的頁面計算兩種 64 位元感知雜湊（以 Pillow 解碼）：
+- dHash：相鄰像素的亮度梯度
+- pHash：32x32 灰階的 DCT 低頻係數與中位數比較
+兩種雜湊的漢明距離都不超過門檻、且長寬比相近時，才視為同一頁，
+直接沿用翻譯快取中該頁的模型輸出（索引只記錄快取鍵，圖片本身仍由 ResultCache 保存）。
+
+索引為翻譯快取目錄下的 SQLite 檔，CLI、Flask、FastAPI 共用，跨批次、跨執行皆可命中；
+同一批次中並行處理的相似頁面，後到的會等先送出的那一頁完成後直接沿用。
+只有提示詞相同（人名對照、額外指示一致）的頁面才會互相沿用。
+
+重用近似頁面的結果是有損的（例如只差章節編號的標題頁），預設停用，門檻也應保守設定。
+"""
+import hashlib
+import io
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+
+from src.image_processing import env_flag
+from src.metrics import METRIC_PREFIX, metrics
+
+logger = logging.getLogger(__name__)
+
+INDEX_NAME = "phash.sqlite"
+DEFAULT_THRESHOLD = 4
+# 長寬比差異超過此比例視為不同頁面（雜湊計算前會縮放成正方形，無法分辨）
+MAX_ASPECT_DIFFERENCE = 0.02
+# 等待並行中的相似頁面完成的最長秒數
+PENDING_WAIT_TIMEOUT = 600.0
+
+_DCT_SIZE = 32
+_HASH_SIZE = 8
+
+
+@dataclass
+class DedupeOptions:
+    """
+    近似重複頁面偵測設定
+
+    Attributes:
+        enabled: 是否啟用（需同時啟用翻譯快取）
+        threshold: 允許的最大漢明距離（dHash 與 pHash 皆須不超過，64 位元中幾位不同）
+    """
+
+    enabled: bool = False
+    threshold: int = DEFAULT_THRESHOLD
+
+    def __post_init__(self):
+        self.threshold = min(max(0, self.threshold), 32)
+
+    @classmethod
+    def from_env(cls):
+        """
+        依環境變數建立設定
+
+        DEDUPE_ENABLED / DEDUPE_THRESHOLD
+        """
+        try:
+            threshold = int(os.getenv("DEDUPE_THRESHOLD", DEFAULT_THRESHOLD))
+        except ValueError:
+            logger.warning("DEDUPE_THRESHOLD 設定無效，使用預設值")
+            threshold = DEFAULT_THRESHOLD
+        return cls(enabled=env_flag("DEDUPE_ENABLED", False), threshold=threshold)
+
+
+@dataclass(frozen=True)
+class PageHash:
+    """頁面的感知雜湊與尺寸"""
+
+    dhash: int
+    phash: int
+    width: int
+    height: int
+
+    def distance(self, other):
+        """兩種雜湊中較大的漢明距離"""
+        return max(_popcount(self.dhash ^ other.dhash), _popcount(self.phash ^ other.phash))
+
+    def same_shape(self, other):
+        aspect = self.width / self.height
+        other_aspect = other.width / other.height
+        return abs(aspect - other_aspect) <= MAX_ASPECT_DIFFERENCE * max(aspect, other_aspect)
+
+
+def _popcount(value):
+    return bin(value).count("1")
+
+
+def _bits_to_int(bits):
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return value
+
+
+# DCT-II 係數表：_DCT_TABLE[k][n] = cos(pi * (2n + 1) * k / 2N)（只需要前 _HASH_SIZE 個頻率）
+_DCT_TABLE = [
+    [math.cos(math.pi * (2 * n + 1) * k / (2 * _DCT_SIZE)) for n in range(_DCT_SIZE)]
+    for k in range(_HASH_SIZE)
+]
+
+
+def compute_hash(image_bytes):
+    """
+    計算圖片的 dHash 與 pHash
+
+    Raises:
+        OSError / PIL.UnidentifiedImageError: 無法解碼的圖片
+    """
+    from PIL import Image
+
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        width, height = image.size
+        # 先縮小再轉灰階，大型掃描檔也只需要處理少量像素
+        image.draft("L", (_DCT_SIZE * 4, _DCT_SIZE * 4))
+        gray = image.convert("L")
+
+    # dHash：9x8 縮圖中每列相鄰像素的明暗關係
+    small = list(gray.resize((_HASH_SIZE + 1, _HASH_SIZE), Image.LANCZOS).getdata())
+    dhash = _bits_to_int(
+        small[row * (_HASH_SIZE + 1) + col] > small[row * (_HASH_SIZE + 1) + col + 1]
+        for row in range(_HASH_SIZE)
+        for col in range(_HASH_SIZE)
+    )
+
+    # pHash：32x32 縮圖的二維 DCT，取左上 8x8 低頻係數與中位數比較（只計算需要的係數）
+    pixels = list(gray.resize((_DCT_SIZE, _DCT_SIZE), Image.LANCZOS).getdata())
+    rows = [pixels[i * _DCT_SIZE:(i + 1) * _DCT_SIZE] for i in range(_DCT_SIZE)]
+    row_coefficients = [[sum(c * p for c, p in zip(basis, row)) for basis in _DCT_TABLE] for row in rows]
+    coefficients = [
+        sum(basis[n] * row_coefficients[n][u] for n in range(_DCT_SIZE))
+        for basis in _DCT_TABLE
+        for u in range(_HASH_SIZE)
+    ]
+    # 直流分量（整體亮度）不列入中位數
+    median = sorted(coefficients[1:])[len(coefficients[1:]) // 2]
+    phash = _bits_to_int(value > median for value in coefficients)
+
+    return PageHash(dhash, phash, width, height)
+
+
+def context_key(prompt):
+    """索引分區的鍵：只有提示詞相同的頁面才會互相沿用"""
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:32]
+
+
+@dataclass
+class IndexEntry:
+    page_hash: PageHash
+    model: str
+    cache_key: str
+    source: str
+
+
+class _Pending:
+    """已送出翻譯、尚未完成的頁面（讓並行中的相似頁面等待）"""
+
+    def __init__(self, context, page_hash):
+        self.context = context
+        self.page_hash = page_hash
+        self.done = threading.Event()
+
+
+class PerceptualIndex:
+    """
+    感知雜湊索引（SQLite，可跨行程共用，執行緒安全）
+
+    Args:
+        db_path: 索引檔路徑（通常位於翻譯快取目錄）
+        threshold: 允許的最大漢明距離
+    """
+
+    _shared = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, db_path, threshold=DEFAULT_THRESHOLD):
+        self.db_path = os.path.abspath(db_path)
+        self.threshold = threshold
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._last_rowid = 0
+        self._pending = []
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS pages ("
+                " context TEXT NOT NULL,"
+                " model TEXT NOT NULL,"
+                " dhash TEXT NOT NULL,"
+                " phash TEXT NOT NULL,"
+                " width INTEGER NOT NULL,"
+                " height INTEGER NOT NULL,"
+                " cache_key TEXT NOT NULL,"
+                " source TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " PRIMARY KEY (context, model, cache_key))"
+            )
+
+    @classmethod
+    def shared(cls, cache_dir, threshold=DEFAULT_THRESHOLD):
+        """取得快取目錄在本行程內共用的索引實例"""
+        db_path = os.path.join(os.path.abspath(cache_dir), INDEX_NAME)
+        with cls._shared_lock:
+            index = cls._shared.get(db_path)
+            if index is None:
+                index = cls(db_path, threshold)
+                cls._shared[db_path] = index
+            else:
+                index.threshold = threshold
+            return index
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    def _refresh(self):
+        """載入其他行程（或本行程）新寫入的項目（呼叫端需持有 self._lock）"""
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT rowid, context, model, dhash, phash, width, height, cache_key, source "
+                "FROM pages WHERE rowid > ? ORDER BY rowid",
+                (self._last_rowid,)
+            ).fetchall()
+        finally:
+            conn.close()
+        for rowid, context, model, dhash, phash, width, height, cache_key, source in rows:
+            page_hash = PageHash(int(dhash, 16), int(phash, 16), width, height)
+            self._entries.setdefault(context, []).append(IndexEntry(page_hash, model, cache_key, source))
+            self._last_rowid = rowid
+
+    def _match(self, context, page_hash, models):
+        """找出最相近的項目（呼叫端需持有 self._lock）"""
+        best, best_distance = None, None
+        for entry in self._entries.get(context, ()):
+            if entry.model not in models or not entry.page_hash.same_shape(page_hash):
+                continue
+            distance = entry.page_hash.distance(page_hash)
+            if distance <= self.threshold and (best_distance is None or distance < best_distance):
+                best, best_distance = entry, distance
+        return best
+
+    def lookup(self, context, page_hash, models, wait=True):
+        """
+        尋找近似重複的已翻譯頁面
+
+        未找到時登記為處理中，呼叫端完成（或失敗）後須呼叫 release；
+        相似的頁面正在其他執行緒翻譯時，先等待它完成再查詢一次。
+
+        Args:
+            context: context_key(prompt)
+            page_hash: 頁面的感知雜湊
+            models: 可沿用的模型名稱（目前候選後端）
+            wait: 是否等待並行中的相似頁面
+
+        Returns:
+            (IndexEntry 或 None, 處理中標記或 None)
+        """
+        while True:
+            with self._lock:
+                self._refresh()
+                entry = self._match(context, page_hash, models)
+                if entry is not None:
+                    return entry, None
+                pending = next(
+                    (
+                        p for p in self._pending
+                        if wait and p.context == context and p.page_hash.same_shape(page_hash)
+                        and p.page_hash.distance(page_hash) <= self.threshold
+                    ),
+                    None
+                )
+                if pending is None:
+                    marker = _Pending(context, page_hash)
+                    self._pending.append(marker)
+                    return None, marker
+            pending.done.wait(PENDING_WAIT_TIMEOUT)
+            # 等待的頁面失敗時不再等第二次
+            wait = False
+
+    def release(self, marker):
+        """結束處理中標記（成功時應先呼叫 add）"""
+        if marker is None:
+            return
+        with self._lock:
+            if marker in self._pending:
+                self._pending.remove(marker)
+        marker.done.set()
+
+    def add(self, context, page_hash, model, cache_key, source):
+        """記錄翻譯成功的頁面"""
+        conn = self._connect()
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO pages (context, model, dhash, phash, width, height, cache_key, source, "
+                "created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (context, model, f"{page_hash.dhash:016x}", f"{page_hash.phash:016x}",
+                 page_hash.width, page_hash.height, cache_key, os.path.basename(source), time.time())
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"寫入近似頁面索引失敗: {e}")
+        finally:
+            conn.close()
+
+    def record(self, hit):
+        """記錄查詢結果（命中代表省下一次模型呼叫）"""
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        metrics.inc(f"{METRIC_PREFIX}_dedupe_total", result="hit" if hit else "miss")
+
+    def stats(self):
+        """取得統計（saved_calls 為沿用近似頁面而省下的模型呼叫數）"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "saved_calls": self.hits,
+                "indexed_pages": sum(len(entries) for entries in self._entries.values()),
+                "threshold": self.threshold,
+            }
+
+
+metrics.describe(f"{METRIC_PREFIX}_dedupe_total", "近似重複頁面查詢次數（hit 代表沿用既有翻譯、省下一次模型呼叫）")
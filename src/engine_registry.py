@@ -0,0 +1,97 @@
+"""
+行程內共用的 AIEngine
+
+每個請求都建立新的 AIEngine 會重新解析 translation_config.txt、建立新的 genai.Client，
+每頁都得重新 TLS 握手。登錄表在行程內保留一個長期存活的引擎（連線池保持暖機），
+只有在 API Key 或設定檔實際變更時才重建；可供多個請求執行緒同時使用。
+"""
+import logging
+import os
+import threading
+from typing import Optional
+
+from src.ai_engine import AIEngine
+from src.key_pool import api_keys_from_env
+from src.rate_limiter import bucket_name_for_key
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG_FILE = "translation_config.txt"
+
+
+def _config_signature(config_file):
+    """設定檔的版本識別（路徑 + 修改時間 + 大小），檔案不存在時為 None"""
+    try:
+        stat = os.stat(config_file)
+    except OSError:
+        return None
+    return (os.path.abspath(config_file), stat.st_mtime_ns, stat.st_size)
+
+
+class EngineRegistry:
+    """
+    依 (API Key, 設定檔) 快取 AIEngine
+
+    取得引擎只需一次 os.stat 比對設定檔版本；重建時舊引擎不會被關閉，
+    仍在使用它的請求可以正常完成，之後由垃圾回收釋放。
+    """
+
+    def __init__(self, factory=AIEngine):
+        self._factory = factory
+        self._lock = threading.Lock()
+        self._engines = {}
+
+    def get(self, config_file=DEFAULT_CONFIG_FILE):
+        """
+        取得（必要時建立）共用引擎
+
+        API Key 讀取自 GEMINI_API_KEY / GEMINI_API_KEYS，變更後下次取得時即以新的金鑰池重建。
+
+        Args:
+            config_file: 翻譯設定檔路徑
+
+        Returns:
+            AIEngine
+        """
+        api_keys = api_keys_from_env()
+        if not api_keys:
+            raise ValueError("未找到 GEMINI_API_KEY，請檢查 .env 檔案。")
+
+        # 金鑰只以雜湊值作為索引，不留在登錄表中
+        slot = (bucket_name_for_key(",".join(api_keys)), os.path.abspath(config_file))
+        signature = _config_signature(config_file)
+
+        with self._lock:
+            entry = self._engines.get(slot)
+            if entry is not None and entry[0] == signature:
+                return entry[1]
+
+            # 舊金鑰的引擎不再需要，只保留目前的這一把
+            stale = [key for key in self._engines if key[1] == slot[1] and key != slot]
+            for key in stale:
+                del self._engines[key]
+
+            reason = "初始化" if entry is None else "設定檔已變更，重新建立"
+            logger.info(f"AI 引擎{reason}: {config_file}")
+            engine = self._factory(config_file=config_file)
+            self._engines[slot] = (signature, engine)
+            return engine
+
+    def invalidate(self, config_file: Optional[str] = None):
+        """清除快取的引擎（未指定設定檔時全部清除），下次取得時重建"""
+        with self._lock:
+            if config_file is None:
+                self._engines.clear()
+                return
+            path = os.path.abspath(config_file)
+            for key in [key for key in self._engines if key[1] == path]:
+                del self._engines[key]
+
+
+# 全域登錄表實例
+engine_registry = EngineRegistry()
+
+
+def get_engine(config_file=DEFAULT_CONFIG_FILE):
+    """取得行程內共用的 AIEngine"""
+    return engine_registry.get(config_file)
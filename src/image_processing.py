@@ -0,0 +1,322 @@
+"""
+圖片前處理（上傳前正規化）與後處理（輸出編碼）
+
+前處理：
+- 依檔頭判斷實際格式，送出正確的 MIME type（不再一律標成 image/jpeg）
+- 長邊超過上限時等比例縮小，減少上傳時間與輸入 token
+- 以較有效率的格式與品質重新編碼，並記錄原始尺寸供輸出時還原
+
+後處理：
+- 偵測模型實際回傳的格式
+- 可選擇縮放回原始頁面尺寸
+- 以指定的格式（JPEG / WebP / PNG）、品質與漸進式設定編碼
+"""
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
+
+from PIL import Image, ImageOps
+
+from src.uploads import sniff_image_type
+
+logger = logging.getLogger(__name__)
+
+# Pillow 格式名稱與 MIME type 對照
+FORMAT_MIME_TYPES = {
+    "JPEG": "image/jpeg",
+    "PNG": "image/png",
+    "WEBP": "image/webp",
+}
+
+# 不需縮小時可直接沿用原始位元組的格式（已是有損壓縮，重新編碼只會劣化畫質）
+_PASSTHROUGH_FORMATS = ("JPEG", "WEBP")
+
+# 輸出格式對應的副檔名
+FORMAT_EXTENSIONS = {
+    "JPEG": ".jpg",
+    "PNG": ".png",
+    "WEBP": ".webp",
+}
+
+DEFAULT_MAX_LONG_EDGE = 2048
+DEFAULT_UPLOAD_FORMAT = "JPEG"
+DEFAULT_UPLOAD_QUALITY = 90
+
+DEFAULT_OUTPUT_FORMAT = "JPEG"
+DEFAULT_OUTPUT_QUALITY = 90
+
+# 編碼用的共用執行緒池：限制同時進行的 CPU 密集編碼數量，
+# 避免數十個翻譯工作執行緒同時解碼/編碼大圖而搶佔 CPU（Pillow 編碼時會釋放 GIL）
+_encode_pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 2, thread_name_prefix="encode")
+
+
+def normalize_format(name):
+    """將 "jpg" / "jpeg" / "webp" / "png" 轉為 Pillow 格式名稱"""
+    name = (name or "").strip().upper()
+    if name == "JPG":
+        name = "JPEG"
+    if name not in FORMAT_MIME_TYPES:
+        raise ValueError(f"不支援的圖片格式: {name}（可用: JPEG、WEBP、PNG）")
+    return name
+
+
+@dataclass
+class ImageOptions:
+    """
+    上傳前處理設定
+
+    Attributes:
+        max_long_edge: 長邊上限（像素），0 代表不縮小
+        upload_format: 重新編碼的格式（JPEG / WEBP / PNG）
+        upload_quality: JPEG / WebP 品質（1-100）
+    """
+
+    max_long_edge: int = DEFAULT_MAX_LONG_EDGE
+    upload_format: str = DEFAULT_UPLOAD_FORMAT
+    upload_quality: int = DEFAULT_UPLOAD_QUALITY
+
+    @classmethod
+    def from_env(cls):
+        """
+        依環境變數建立設定
+
+        IMAGE_MAX_LONG_EDGE / IMAGE_UPLOAD_FORMAT / IMAGE_UPLOAD_QUALITY
+        """
+        try:
+            return cls(
+                max_long_edge=int(os.getenv("IMAGE_MAX_LONG_EDGE", DEFAULT_MAX_LONG_EDGE)),
+                upload_format=normalize_format(os.getenv("IMAGE_UPLOAD_FORMAT", DEFAULT_UPLOAD_FORMAT)),
+                upload_quality=int(os.getenv("IMAGE_UPLOAD_QUALITY", DEFAULT_UPLOAD_QUALITY)),
+            )
+        except ValueError as e:
+            logger.warning(f"圖片前處理設定無效，使用預設值: {e}")
+            return cls()
+
+
+@dataclass
+class PreparedImage:
+    """前處理後準備送出的圖片"""
+
+    data: bytes
+    mime_type: str
+    original_size: Optional[tuple[int, int]]
+    original_format: Optional[str]
+    size: Optional[tuple[int, int]]
+    reencoded: bool = False
+
+
+def encode_image(image, image_format, quality, progressive=False):
+    """
+    將 Pillow 影像編碼為指定格式
+
+    JPEG 不支援透明度，含 alpha 的影像會先合成到白底；灰階漫畫維持單通道以縮小檔案。
+    """
+    if image_format == "JPEG":
+        if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+            rgba = image.convert("RGBA")
+            background = Image.new("RGB", rgba.size, (255, 255, 255))
+            background.paste(rgba, mask=rgba.getchannel("A"))
+            image = background
+        elif image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+
+    buffer = io.BytesIO()
+    if image_format == "JPEG":
+        image.save(buffer, format="JPEG", quality=quality, optimize=True, progressive=progressive)
+    elif image_format == "WEBP":
+        image.save(buffer, format="WEBP", quality=quality, method=4)
+    else:
+        image.save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
+
+
+def prepare_image(data, options):
+    """
+    上傳前正規化圖片
+
+    - 不需縮小且原本就是 JPEG/WebP：直接沿用原始位元組，只修正 MIME type
+    - 其他情況（PNG 掃描檔、超過長邊上限）：縮小並以設定的格式重新編碼
+
+    無法解析的圖片會原封不動送出，交由模型端處理。
+
+    Args:
+        data: 原始圖片位元組
+        options: ImageOptions
+
+    Returns:
+        PreparedImage
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            original_format = image.format
+            original_size = image.size
+
+            needs_resize = (
+                options.max_long_edge > 0 and max(original_size) > options.max_long_edge
+            )
+            if not needs_resize and original_format in _PASSTHROUGH_FORMATS:
+                return PreparedImage(
+                    data=data,
+                    mime_type=FORMAT_MIME_TYPES[original_format],
+                    original_size=original_size,
+                    original_format=original_format,
+                    size=original_size,
+                )
+
+            # 依 EXIF 方向轉正（重新編碼後 EXIF 不會保留）
+            working = ImageOps.exif_transpose(image)
+            if needs_resize:
+                working = working.copy()
+                working.thumbnail((options.max_long_edge, options.max_long_edge), Image.LANCZOS)
+
+            encoded = encode_image(working, options.upload_format, options.upload_quality)
+    except Exception as e:
+        logger.warning(f"無法解析圖片，將以原始內容送出: {e}")
+        return PreparedImage(
+            data=data,
+            mime_type=_sniff_mime_type(data),
+            original_size=None,
+            original_format=None,
+            size=None,
+        )
+
+    # 重新編碼反而變大（例如小張 PNG 線稿）時沿用原檔
+    if not needs_resize and len(encoded) >= len(data) and original_format in FORMAT_MIME_TYPES:
+        return PreparedImage(
+            data=data,
+            mime_type=FORMAT_MIME_TYPES[original_format],
+            original_size=original_size,
+            original_format=original_format,
+            size=original_size,
+        )
+
+    return PreparedImage(
+        data=encoded,
+        mime_type=FORMAT_MIME_TYPES[options.upload_format],
+        original_size=original_size,
+        original_format=original_format,
+        size=working.size,
+        reencoded=True,
+    )
+
+
+def env_flag(name, default):
+    """讀取布林環境變數（0 / false / no / off 為關閉），未設定時回傳預設值"""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() not in ("0", "false", "no", "off")
+
+
+@dataclass
+class OutputOptions:
+    """
+    輸出後處理設定
+
+    Attributes:
+        output_format: 輸出格式（JPEG / WEBP / PNG）
+        quality: JPEG / WebP 品質（1-100）
+        progressive: JPEG 是否使用漸進式編碼
+        restore_size: 是否縮放回原始頁面尺寸
+    """
+
+    output_format: str = DEFAULT_OUTPUT_FORMAT
+    quality: int = DEFAULT_OUTPUT_QUALITY
+    progressive: bool = True
+    restore_size: bool = True
+
+    @property
+    def extension(self):
+        """輸出檔案的副檔名（含點）"""
+        return FORMAT_EXTENSIONS[self.output_format]
+
+    @property
+    def mime_type(self):
+        return FORMAT_MIME_TYPES[self.output_format]
+
+    @classmethod
+    def from_env(cls):
+        """
+        依環境變數建立設定
+
+        OUTPUT_FORMAT / OUTPUT_QUALITY / OUTPUT_PROGRESSIVE / OUTPUT_RESTORE_SIZE
+        """
+        try:
+            return cls(
+                output_format=normalize_format(os.getenv("OUTPUT_FORMAT", DEFAULT_OUTPUT_FORMAT)),
+                quality=int(os.getenv("OUTPUT_QUALITY", DEFAULT_OUTPUT_QUALITY)),
+                progressive=env_flag("OUTPUT_PROGRESSIVE", True),
+                restore_size=env_flag("OUTPUT_RESTORE_SIZE", True),
+            )
+        except ValueError as e:
+            logger.warning(f"輸出設定無效，使用預設值: {e}")
+            return cls()
+
+
+def detect_format(data):
+    """
+    偵測圖片位元組的實際格式
+
+    Returns:
+        Pillow 格式名稱（JPEG / PNG / WEBP），無法辨識時回傳 None
+    """
+    kind = sniff_image_type(data[:16])
+    return normalize_format(kind) if kind else None
+
+
+def finalize_output(data, options, target_size=None):
+    """
+    將模型回傳的圖片轉為最終輸出
+
+    格式已符合、且不需還原尺寸時直接沿用原始位元組（避免重複有損編碼）。
+
+    Args:
+        data: 模型回傳的圖片位元組
+        options: OutputOptions
+        target_size: 原始頁面尺寸 (寬, 高)，restore_size 開啟時縮放回此尺寸
+
+    Returns:
+        (輸出位元組, MIME type)
+    """
+    returned_format = detect_format(data)
+
+    with Image.open(io.BytesIO(data)) as image:
+        resize_to = None
+        if options.restore_size and target_size and image.size != tuple(target_size):
+            resize_to = tuple(target_size)
+
+        if resize_to is None and returned_format == options.output_format:
+            return data, options.mime_type
+
+        image.load()
+        working = image.resize(resize_to, Image.LANCZOS) if resize_to else image
+        encoded = encode_image(working, options.output_format, options.quality, options.progressive)
+
+    return encoded, options.mime_type
+
+
+def finalize_output_in_pool(data, options, target_size=None):
+    """在共用的編碼執行緒池中執行 finalize_output，並等待結果"""
+    return _encode_pool.submit(finalize_output, data, options, target_size).result()
+
+
+def encode_output_in_pool(image, options):
+    """
+    在共用的編碼執行緒池中將 Pillow 影像編碼為最終輸出（供分塊縫合後的頁面使用）
+
+    Returns:
+        (輸出位元組, MIME type)
+    """
+    encoded = _encode_pool.submit(
+        encode_image, image, options.output_format, options.quality, options.progressive
+    ).result()
+    return encoded, options.mime_type
+
+
+def _sniff_mime_type(data):
+    """Pillow 無法解析時，依檔頭推測 MIME type"""
+    kind = sniff_image_type(data[:16])
+    return f"image/{kind}" if kind else "image/jpeg"
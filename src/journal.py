@@ -0,0 +1,252 @@
+"""
+批次處理日誌（可續跑、可偵測變更）
+
+每個輸出位置一個 SQLite 日誌，記錄每頁的：
+- 輸入指紋（資料夾為大小 + mtime、壓縮檔為大小 + CRC，不需讀取內容）與內容雜湊
+- 有效提示詞雜湊（提示詞、模型與輸出設定，任一變更都會重新翻譯）
+- 狀態（running / done / failed）、嘗試次數、耗時與錯誤訊息
+
+續跑時一次載入整份日誌，指紋與提示詞都沒變的頁面直接跳過，不需讀取或比對內容；
+只有指紋改變的頁面才讀取並比對內容雜湊（例如只是被 touch 或複製過）。
+
+沒有日誌紀錄但輸出已存在的頁面（舊版產生、或寫完輸出後來不及記錄就中斷），
+會先確認輸出圖片完整再納入日誌，截斷的檔案會重新翻譯；
+有紀錄時必須是同一份輸入（指紋或內容雜湊相同）且上次不是失敗，才會沿用現有輸出。
+處理中的紀錄保留上次完成時的指紋與雜湊，中斷後不會把舊翻譯當成新輸入的結果。
+"""
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from src.archive import is_archive_name
+
+JOURNAL_NAME = ".translate_journal.sqlite"
+ARCHIVE_JOURNAL_SUFFIX = ".journal.sqlite"
+
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+logger = logging.getLogger(__name__)
+
+
+def hash_bytes(data):
+    """輸入內容雜湊"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def journal_path_for(output_path):
+    """輸出位置對應的日誌路徑：資料夾放在資料夾內，CBZ 放在旁邊"""
+    if is_archive_name(output_path):
+        return output_path + ARCHIVE_JOURNAL_SUFFIX
+    return os.path.join(output_path, JOURNAL_NAME)
+
+
+@dataclass
+class JournalEntry:
+    """單頁的日誌紀錄"""
+
+    name: str
+    status: str
+    fingerprint: Optional[str] = None
+    input_hash: Optional[str] = None
+    prompt_hash: Optional[str] = None
+    output_name: Optional[str] = None
+    attempts: int = 0
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    duration_s: Optional[float] = None
+    error: Optional[str] = None
+
+
+_COLUMNS = (
+    "name", "status", "fingerprint", "input_hash", "prompt_hash", "output_name",
+    "attempts", "started_at", "finished_at", "duration_s", "error",
+)
+
+
+class BatchJournal:
+    """
+    批次處理日誌（執行緒安全，每次更新立即提交）
+
+    Args:
+        db_path: 日誌檔路徑
+    """
+
+    def __init__(self, db_path):
+        self.db_path = os.path.abspath(db_path)
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            " name TEXT PRIMARY KEY,"
+            " status TEXT NOT NULL,"
+            " fingerprint TEXT,"
+            " input_hash TEXT,"
+            " prompt_hash TEXT,"
+            " output_name TEXT,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " started_at REAL,"
+            " finished_at REAL,"
+            " duration_s REAL,"
+            " error TEXT)"
+        )
+        # 一次載入所有紀錄，續跑時的判斷都在記憶體中完成
+        rows = self._conn.execute(f"SELECT {', '.join(_COLUMNS)} FROM pages").fetchall()
+        self._entries = {row[0]: JournalEntry(*row) for row in rows}
+        # 處理中頁面的提示詞雜湊（finish 時才寫入紀錄）
+        self._running_prompts = {}
+
+    @classmethod
+    def for_output(cls, output_path):
+        """開啟輸出位置對應的日誌"""
+        return cls(journal_path_for(output_path))
+
+    def get(self, name):
+        with self._lock:
+            return self._entries.get(name)
+
+    def _save(self, entry):
+        values = [getattr(entry, column) for column in _COLUMNS]
+        with self._lock:
+            self._entries[entry.name] = entry
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO pages ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})",
+                values
+            )
+
+    def should_skip(self, page, output, prompt_hash):
+        """
+        判斷頁面是否已翻譯且仍為最新
+
+        Args:
+            page: archive.Page
+            output: FolderOutput / ArchiveOutput
+            prompt_hash: 目前的有效提示詞雜湊
+
+        Returns:
+            True 代表可沿用現有輸出
+        """
+        if not output.exists(page):
+            return False
+
+        entry = self.get(page.name)
+        if entry is not None and entry.status == STATUS_DONE:
+            if entry.prompt_hash != prompt_hash:
+                return False
+            if page.fingerprint is not None and entry.fingerprint == page.fingerprint:
+                return True
+            # 指紋改變（touch、複製），內容相同時仍可沿用
+            if hash_bytes(page.read()) != entry.input_hash:
+                return False
+            entry.fingerprint = page.fingerprint
+            self._save(entry)
+            return True
+
+        # 沒有完成紀錄但輸出已存在：舊版輸出，或寫入後來不及記錄就中斷
+        # 有紀錄時只在同一份輸入中斷（非失敗）的情況下沿用，避免把舊頁面的輸出當成新輸入的結果
+        if entry is not None and (
+            entry.status == STATUS_FAILED
+            or entry.prompt_hash not in (None, prompt_hash)
+            or not self._same_input(entry, page)
+        ):
+            return False
+        if not output.verify(page):
+            logger.warning(f"輸出檔不完整，將重新翻譯: {output.output_path(page)}")
+            return False
+        self._save(JournalEntry(
+            name=page.name,
+            status=STATUS_DONE,
+            fingerprint=page.fingerprint,
+            input_hash=hash_bytes(page.read()),
+            prompt_hash=prompt_hash,
+            output_name=output.output_path(page),
+            attempts=entry.attempts if entry is not None else 0,
+            finished_at=time.time(),
+        ))
+        return True
+
+    @staticmethod
+    def _same_input(entry, page):
+        """紀錄中的輸入指紋或內容雜湊是否與目前頁面相同（兩者都沒有時視為不同）"""
+        if entry.fingerprint is not None and page.fingerprint is not None:
+            return entry.fingerprint == page.fingerprint
+        if entry.input_hash is not None:
+            return entry.input_hash == hash_bytes(page.read())
+        return False
+
+    def start(self, page, prompt_hash):
+        """
+        記錄開始處理（嘗試次數加一）
+
+        輸入指紋、內容雜湊與提示詞雜湊保留上次完成時的值，直到 finish 才更新：
+        處理中斷後續跑時，現有輸出只有在與上次完成時的輸入相同時才會沿用，
+        不會因為這裡先寫入新的指紋而把舊翻譯當成新輸入的結果。
+        """
+        entry = self.get(page.name)
+        if entry is None:
+            entry = JournalEntry(name=page.name, status=STATUS_RUNNING)
+        with self._lock:
+            self._running_prompts[page.name] = prompt_hash
+        self._save(JournalEntry(
+            name=page.name,
+            status=STATUS_RUNNING,
+            fingerprint=entry.fingerprint,
+            input_hash=entry.input_hash,
+            prompt_hash=entry.prompt_hash,
+            output_name=entry.output_name,
+            attempts=entry.attempts + 1,
+            started_at=time.time(),
+        ))
+
+    def finish(self, page, status, input_hash=None, output_name=None, error=None):
+        """
+        記錄處理結果（成功時須在輸出寫入完成後才呼叫）
+
+        只有成功時才更新輸入指紋、內容雜湊與提示詞雜湊；失敗時保留上次完成時的值，
+        讓這些欄位始終描述現有輸出是由哪一份輸入翻譯而來。
+
+        Args:
+            status: done / failed
+        """
+        entry = self.get(page.name) or JournalEntry(name=page.name, status=status)
+        with self._lock:
+            prompt_hash = self._running_prompts.pop(page.name, entry.prompt_hash)
+        entry.status = status
+        if status == STATUS_DONE:
+            entry.fingerprint = page.fingerprint
+            entry.input_hash = input_hash or entry.input_hash
+            entry.prompt_hash = prompt_hash
+            entry.output_name = output_name
+        entry.error = error
+        entry.finished_at = time.time()
+        if entry.started_at is not None:
+            entry.duration_s = entry.finished_at - entry.started_at
+        self._save(entry)
+
+    def summary(self):
+        """各狀態的頁數"""
+        with self._lock:
+            counts = {}
+            for entry in self._entries.values():
+                counts[entry.status] = counts.get(entry.status, 0) + 1
+            return counts
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
@@ -0,0 +1,215 @@
+"""
+多組 Gemini API Key 的金鑰池
+
+單一金鑰的配額（RPM / TPM）就是整體吞吐量的上限。金鑰池讓每次呼叫挑選目前最空閒的金鑰：
+- 每把金鑰有自己的配額限流器（以金鑰雜湊分桶，跨行程共用）與 genai.Client
+- 依「處理中的請求數、最近使用時間」平均分配
+- 回應 429 的金鑰進入冷卻（連續觸發時加倍，有上限），冷卻中的金鑰只在全部都冷卻時才使用
+- 各金鑰的請求數、成功、失敗、429 次數可供 /api/health 與 CLI 回報
+
+設定方式：GEMINI_API_KEYS（逗號或換行分隔），並與 GEMINI_API_KEY 合併（去除重複）。
+
+冷卻與統計狀態必須跨請求保留，服務端以 KeyPool.shared 取得行程內共用的金鑰池，
+重新設定（例如每次 /api/config）或重建引擎時不會重置。
+"""
+import logging
+import os
+import re
+import threading
+import time
+
+from src.metrics import METRIC_PREFIX, metrics
+from src.rate_limiter import RateLimiter, bucket_name_for_key
+from src.retry import get_status_code
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_KEY_COOLDOWN = 60.0
+MAX_KEY_COOLDOWN = 600.0
+
+
+def parse_api_keys(value):
+    """解析以逗號、分號或換行分隔的金鑰清單"""
+    if not value:
+        return []
+    return [key.strip() for key in re.split(r"[,;\s]+", value) if key.strip()]
+
+
+def api_keys_from_env():
+    """
+    依環境變數取得所有金鑰（GEMINI_API_KEY 排第一，去除重複）
+
+    GEMINI_API_KEY / GEMINI_API_KEYS
+    """
+    keys = parse_api_keys(os.getenv("GEMINI_API_KEY")) + parse_api_keys(os.getenv("GEMINI_API_KEYS"))
+    return list(dict.fromkeys(keys))
+
+
+def mask_key(api_key):
+    """遮蔽金鑰（只保留末四碼，供日誌與統計顯示）"""
+    return f"…{api_key[-4:]}" if len(api_key) > 4 else "…"
+
+
+class PooledKey:
+    """金鑰池中的一把金鑰與其使用狀態"""
+
+    def __init__(self, api_key, rate_limiter=None):
+        self.key = api_key
+        self.bucket = bucket_name_for_key(api_key)
+        self.label = mask_key(api_key)
+        self.rate_limiter = rate_limiter
+        self.in_flight = 0
+        self.requests = 0
+        self.successes = 0
+        self.failures = 0
+        self.rate_limited = 0
+        self.consecutive_rate_limits = 0
+        self.cooldown_until = 0.0
+        self.last_acquired = 0.0
+
+    def __repr__(self):
+        return f"<PooledKey {self.label}>"
+
+
+class KeyPool:
+    """
+    金鑰池（執行緒安全）
+
+    Args:
+        api_keys: 金鑰清單
+        rate_limiter_factory: 依桶子名稱建立限流器的函式 factory(bucket)，回傳 None 代表不限流
+        cooldown: 回應 429 後的冷卻秒數（連續觸發時加倍，最多 MAX_KEY_COOLDOWN）
+    """
+
+    _shared = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, api_keys, rate_limiter_factory=None, cooldown=DEFAULT_KEY_COOLDOWN):
+        api_keys = list(dict.fromkeys(api_keys))
+        if not api_keys:
+            raise ValueError("未找到 GEMINI_API_KEY，請檢查 .env 檔案。")
+        self.cooldown = cooldown
+        self.keys = [
+            PooledKey(key, rate_limiter_factory(bucket_name_for_key(key)) if rate_limiter_factory else None)
+            for key in api_keys
+        ]
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, api_keys=None, rate_limiter=None):
+        """
+        依環境變數建立金鑰池
+
+        Args:
+            api_keys: 金鑰清單（預設依 GEMINI_API_KEY / GEMINI_API_KEYS）
+            rate_limiter: None: 每把金鑰依 GEMINI_RPM / GEMINI_TPM 各自限流；False: 不限流；
+                RateLimiter 實例: 所有金鑰共用同一個限流器
+        """
+        if rate_limiter is None:
+            factory = lambda bucket: RateLimiter.from_env(bucket=bucket)
+        else:
+            factory = lambda bucket: rate_limiter or None
+        try:
+            cooldown = float(os.getenv("GEMINI_KEY_COOLDOWN", DEFAULT_KEY_COOLDOWN))
+        except ValueError:
+            cooldown = DEFAULT_KEY_COOLDOWN
+        return cls(api_keys or api_keys_from_env(), factory, cooldown)
+
+    @classmethod
+    def shared(cls, api_keys=None):
+        """
+        取得同一組金鑰在本行程內共用的金鑰池（依環境變數限流，見 from_env）
+
+        Args:
+            api_keys: 金鑰清單（預設依 GEMINI_API_KEY / GEMINI_API_KEYS）
+        """
+        api_keys = list(dict.fromkeys(api_keys or api_keys_from_env()))
+        # 金鑰只以雜湊值作為索引
+        slot = bucket_name_for_key(",".join(api_keys))
+        with cls._shared_lock:
+            pool = cls._shared.get(slot)
+            if pool is None:
+                pool = cls.from_env(api_keys=api_keys)
+                cls._shared[slot] = pool
+            return pool
+
+    @property
+    def primary(self):
+        return self.keys[0]
+
+    def acquire(self):
+        """
+        取得本次呼叫使用的金鑰（呼叫端完成後須呼叫 release）
+
+        優先選擇未冷卻、處理中請求最少、最久未使用的金鑰；全部冷卻時選最快恢復的。
+        """
+        now = time.monotonic()
+        with self._lock:
+            key = min(
+                self.keys,
+                key=lambda k: (
+                    k.cooldown_until if k.cooldown_until > now else 0.0,
+                    k.in_flight,
+                    k.last_acquired,
+                )
+            )
+            key.in_flight += 1
+            key.requests += 1
+            key.last_acquired = now
+        metrics.inc(f"{METRIC_PREFIX}_key_requests_total", key=key.bucket)
+        return key
+
+    def release(self, key, error=None):
+        """
+        歸還金鑰並記錄結果
+
+        Args:
+            error: 呼叫失敗時的例外；HTTP 429 會讓金鑰進入冷卻
+        """
+        rate_limited = error is not None and get_status_code(error) == 429
+        delay = None
+        with self._lock:
+            key.in_flight -= 1
+            if error is None:
+                key.successes += 1
+                key.consecutive_rate_limits = 0
+                key.cooldown_until = 0.0
+                return
+            key.failures += 1
+            now = time.monotonic()
+            # 同時送出的其他請求也收到 429 時已在冷卻中，不重複加倍
+            if rate_limited and key.cooldown_until <= now:
+                key.consecutive_rate_limits += 1
+                delay = min(self.cooldown * 2 ** (key.consecutive_rate_limits - 1), MAX_KEY_COOLDOWN)
+                key.cooldown_until = now + delay
+            if rate_limited:
+                key.rate_limited += 1
+        if rate_limited:
+            metrics.inc(f"{METRIC_PREFIX}_key_rate_limited_total", key=key.bucket)
+        if delay is not None and len(self.keys) > 1:
+            logger.warning(f"API Key {key.label} 觸發配額限制，暫停使用 {delay:.0f} 秒")
+
+    def stats(self):
+        """各金鑰的使用統計（金鑰以末四碼表示）"""
+        now = time.monotonic()
+        with self._lock:
+            rows = [
+                {
+                    "key": key.label,
+                    "bucket": key.bucket,
+                    "requests": key.requests,
+                    "successes": key.successes,
+                    "failures": key.failures,
+                    "rate_limited": key.rate_limited,
+                    "in_flight": key.in_flight,
+                    "cooldown_s": round(max(0.0, key.cooldown_until - now), 1),
+                }
+                for key in self.keys
+            ]
+        for row, key in zip(rows, self.keys):
+            row["quota"] = key.rate_limiter.fill_level() if key.rate_limiter is not None else None
+        return rows
+
+
+metrics.describe(f"{METRIC_PREFIX}_key_requests_total", "各 API Key 送出的請求數（依金鑰雜湊）")
+metrics.describe(f"{METRIC_PREFIX}_key_rate_limited_total", "各 API Key 觸發配額限制（429）的次數")
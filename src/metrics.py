@@ -0,0 +1,280 @@
+"""
+處理流程的分段計時與計數（行程內共用，可輸出 Prometheus 文字格式）
+
+分段（stage）：
+- read: 讀取輸入（磁碟 / 壓縮檔 / PDF 頁面）
+- textless: 本機判斷頁面是否沒有文字
+- regions: 本機找出文字區域並裁切（區域模式）
+- prompt: 組合提示詞
+- prepare: 上傳前正規化（解碼、縮小、重新編碼）
+- cache: 查詢翻譯快取
+- dedupe: 計算感知雜湊並查詢近似重複頁面
+- rate_limit_wait: 等待配額
+- concurrency_wait: 等待自適應並行度的名額
+- model: 模型 API 呼叫（每次嘗試）
+- finalize: 解碼模型輸出並依設定編碼
+- write: 寫入輸出
+
+不依賴 prometheus_client；所有操作皆為執行緒安全。
+"""
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+from src.backends import NoImageReturned
+from src.retry import get_status_code
+
+METRIC_PREFIX = "comic_translate"
+
+# 分段耗時直方圖的上界（秒）
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+# 目前上下文的分段耗時監聽函式（例如推送工作進度），以 bind_context 提交的分塊執行緒也會沿用
+_stage_listener = contextvars.ContextVar("stage_listener", default=None)
+
+
+@contextmanager
+def stage_listener(callback):
+    """
+    在此區塊內每完成一個分段就呼叫 callback(stage, seconds)
+
+    callback 可能在其他執行緒呼叫，須為執行緒安全；其例外會被忽略，不影響處理流程。
+    """
+    token = _stage_listener.set(callback)
+    try:
+        yield
+    finally:
+        _stage_listener.reset(token)
+
+
+def classify_error(error):
+    """
+    將例外分類為固定的失敗類別（避免以錯誤訊息當標籤造成高基數）
+
+    Returns:
+        rate_limited / server_error / client_error / timeout / connection / no_image / other
+    """
+    status = get_status_code(error)
+    if status == 429:
+        return "rate_limited"
+    if status is not None and status >= 500:
+        return "server_error"
+    if status is not None and status >= 400:
+        return "client_error"
+    if isinstance(error, TimeoutError) or "Timeout" in type(error).__name__:
+        return "timeout"
+    if isinstance(error, ConnectionError) or "Connect" in type(error).__name__:
+        return "connection"
+    if isinstance(error, NoImageReturned):
+        return "no_image"
+    return "other"
+
+
+class _Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+
+    def quantile(self, q):
+        """依直方圖估計分位數（取所在桶的上界）"""
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    body = ",".join(f'{name}="{_escape(value)}"' for name, value in labels)
+    return "{" + body + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class MetricsRegistry:
+    """
+    計數器、量表與分段直方圖
+
+    計數器與量表以 (名稱, 標籤) 為鍵；量表也可登錄回呼函式，在輸出時才取值（例如佇列深度）。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+        self._gauge_callbacks = {}
+        self._stages = {}
+        self._help = {}
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def describe(self, name, help_text):
+        """設定指標說明（輸出於 # HELP）"""
+        self._help[name] = help_text
+
+    def inc(self, name, amount=1, **labels):
+        """累加計數器"""
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def set_gauge(self, name, value, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._gauges[key] = value
+
+    def add_gauge(self, name, amount, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._gauges[key] = self._gauges.get(key, 0) + amount
+
+    def register_gauge(self, name, callback, **labels):
+        """登錄輸出時才取值的量表（callback 回傳數值）"""
+        with self._lock:
+            self._gauge_callbacks[self._key(name, labels)] = callback
+
+    def observe_stage(self, stage, seconds):
+        with self._lock:
+            histogram = self._stages.get(stage)
+            if histogram is None:
+                histogram = self._stages[stage] = _Histogram(STAGE_BUCKETS)
+            histogram.observe(seconds)
+        listener = _stage_listener.get()
+        if listener is not None:
+            try:
+                listener(stage, seconds)
+            except Exception:
+                pass
+
+    @contextmanager
+    def time_stage(self, stage):
+        """計時區塊，結束（含例外）時記錄到該分段"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe_stage(stage, time.perf_counter() - started)
+
+    def record_failure(self, error, stage="model"):
+        """依類別累計失敗次數"""
+        self.inc(f"{METRIC_PREFIX}_failures_total", stage=stage, reason=classify_error(error))
+
+    def counter_value(self, name, **labels):
+        with self._lock:
+            return self._counters.get(self._key(name, labels), 0)
+
+    def counter_series(self, name):
+        """取得某計數器的所有序列 [(標籤字典, 值), ...]"""
+        with self._lock:
+            return [
+                (dict(labels), value)
+                for (series_name, labels), value in self._counters.items()
+                if series_name == name
+            ]
+
+    def stage_summary(self):
+        """
+        各分段的統計（供 CLI 摘要表）
+
+        Returns:
+            [{"stage", "count", "total_s", "mean_s", "p95_s", "max_s"}, ...]
+        """
+        with self._lock:
+            return [
+                {
+                    "stage": stage,
+                    "count": histogram.count,
+                    "total_s": histogram.sum,
+                    "mean_s": histogram.sum / histogram.count if histogram.count else 0.0,
+                    "p95_s": histogram.quantile(0.95),
+                    "max_s": histogram.max,
+                }
+                for stage, histogram in self._stages.items()
+            ]
+
+    def render_prometheus(self):
+        """輸出 Prometheus 文字格式（text/plain; version=0.0.4）"""
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            callbacks = dict(self._gauge_callbacks)
+            stages = {
+                stage: (list(h.counts), h.count, h.sum) for stage, h in self._stages.items()
+            }
+
+        for key, callback in callbacks.items():
+            try:
+                gauges[key] = callback()
+            except Exception:
+                continue
+
+        lines = []
+        for kind, series in (("counter", counters), ("gauge", gauges)):
+            for name in sorted({name for name, _ in series}):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+                for (series_name, labels), value in sorted(series.items()):
+                    if series_name == name:
+                        lines.append(f"{name}{_format_labels(labels)} {value:g}")
+
+        if stages:
+            name = f"{METRIC_PREFIX}_stage_seconds"
+            lines.append(f"# HELP {name} {self._help.get(name, '各處理分段的耗時（秒）')}")
+            lines.append(f"# TYPE {name} histogram")
+            for stage, (counts, count, total) in sorted(stages.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(STAGE_BUCKETS, counts):
+                    cumulative += bucket_count
+                    labels = _format_labels((("le", f"{bound:g}"), ("stage", stage)))
+                    lines.append(f"{name}_bucket{labels} {cumulative}")
+                labels = _format_labels((("le", "+Inf"), ("stage", stage)))
+                lines.append(f"{name}_bucket{labels} {count}")
+                stage_label = _format_labels((("stage", stage),))
+                lines.append(f"{name}_sum{stage_label} {total:g}")
+                lines.append(f"{name}_count{stage_label} {count}")
+
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        """清除所有紀錄（保留量表回呼與說明）"""
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._stages.clear()
+
+
+# 全域指標實例
+metrics = MetricsRegistry()
+
+metrics.describe(f"{METRIC_PREFIX}_pages_total", "處理完成的頁數（依結果）")
+metrics.describe(f"{METRIC_PREFIX}_requests_total", "送出的模型 API 請求數（含重試，依後端）")
+metrics.describe(f"{METRIC_PREFIX}_failures_total", "失敗次數（依分段與失敗類別）")
+metrics.describe(f"{METRIC_PREFIX}_bytes_total", "處理的位元組數（input: 原始輸入, upload: 實際上傳, output: 最終輸出）")
+metrics.describe(f"{METRIC_PREFIX}_cache_total", "翻譯快取查詢次數（依結果）")
+metrics.describe(f"{METRIC_PREFIX}_in_flight", "處理中的頁數")
+metrics.describe(f"{METRIC_PREFIX}_queue_depth", "背景工作佇列中的工作數（依狀態）")
+metrics.describe(f"{METRIC_PREFIX}_stage_seconds", "各處理分段的耗時（秒）")
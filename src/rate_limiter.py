@@ -0,0 +1,221 @@
+"""
+跨行程的 Gemini 配額限流器（Token Bucket）
+
+CLI、Flask、FastAPI 在同一台機器上使用同一把 API Key 時，彼此看不到對方的流量。
+這裡把桶子狀態放在一個小型 SQLite 檔案，以 BEGIN IMMEDIATE 取得跨行程寫入鎖，
+讓所有 AIEngine 共同遵守每分鐘請求數 (RPM) 與每分鐘 token 數 (TPM) 的上限。
+預設停用，設定 GEMINI_RPM 或 GEMINI_TPM 後才啟用（各帳號的配額不同，無法給出安全的預設值）。
+"""
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+# 專案根目錄（src 的上一層），讓不同工作目錄啟動的前端共用同一個狀態檔
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_DB_PATH = os.path.join(PROJECT_ROOT, ".rate_limit.sqlite")
+
+DEFAULT_RPM = 0  # 0 代表不限制（預設停用）
+DEFAULT_TPM = 0  # 0 代表不限制
+# 單張圖片輸入約佔的 token 數（無法事先得知時的估計值，回應後會依實際用量校正）
+DEFAULT_IMAGE_TOKENS = 1120
+
+# 單次等待的最長睡眠秒數，讓其他行程釋出的額度能及時被看見
+_MAX_SLEEP = 5.0
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitTimeout(RuntimeError):
+    """等待配額超過上限"""
+
+
+def bucket_name_for_key(api_key):
+    """以 API Key 的雜湊作為桶子名稱（不將金鑰明文寫入磁碟）"""
+    return "key-" + hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
+
+class RateLimiter:
+    """以 SQLite 共享狀態的雙桶限流器（請求數 + token 數）"""
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, requests_per_minute=DEFAULT_RPM,
+                 tokens_per_minute=DEFAULT_TPM, bucket="default", max_wait=300.0):
+        self.db_path = os.path.abspath(db_path)
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.bucket = bucket
+        self.max_wait = max_wait
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    @classmethod
+    def from_env(cls, bucket="default"):
+        """
+        依環境變數建立限流器，RPM 與 TPM 皆為 0 時回傳 None（停用）
+
+        GEMINI_RPM / GEMINI_TPM / GEMINI_RATE_LIMIT_DB / GEMINI_RATE_LIMIT_MAX_WAIT
+        """
+        try:
+            rpm = float(os.getenv("GEMINI_RPM", DEFAULT_RPM))
+            tpm = float(os.getenv("GEMINI_TPM", DEFAULT_TPM))
+            max_wait = float(os.getenv("GEMINI_RATE_LIMIT_MAX_WAIT", 300))
+        except ValueError:
+            logger.warning("GEMINI_RPM / GEMINI_TPM 設定無效，使用預設值")
+            rpm, tpm, max_wait = DEFAULT_RPM, DEFAULT_TPM, 300.0
+
+        if rpm <= 0 and tpm <= 0:
+            return None
+
+        db_path = os.getenv("GEMINI_RATE_LIMIT_DB") or DEFAULT_DB_PATH
+        return cls(db_path, rpm, tpm, bucket=bucket, max_wait=max_wait)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        if not self._initialized:
+            with self._init_lock:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS buckets ("
+                    " name TEXT PRIMARY KEY,"
+                    " requests REAL NOT NULL,"
+                    " tokens REAL NOT NULL,"
+                    " updated_at REAL NOT NULL)"
+                )
+                self._initialized = True
+        return conn
+
+    def _refill(self, conn, now):
+        """
+        讀取並補充桶子（呼叫端需已在交易中）
+
+        Returns:
+            (requests, tokens) 目前可用額度
+        """
+        row = conn.execute(
+            "SELECT requests, tokens, updated_at FROM buckets WHERE name = ?", (self.bucket,)
+        ).fetchone()
+        if row is None:
+            return float(self.requests_per_minute), float(self.tokens_per_minute)
+
+        requests, tokens, updated_at = row
+        elapsed = max(0.0, now - updated_at)
+        requests = min(self.requests_per_minute, requests + elapsed * self.requests_per_minute / 60.0)
+        tokens = min(self.tokens_per_minute, tokens + elapsed * self.tokens_per_minute / 60.0)
+        return requests, tokens
+
+    def _store(self, conn, requests, tokens, now):
+        conn.execute(
+            "INSERT INTO buckets (name, requests, tokens, updated_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET requests = excluded.requests, "
+            "tokens = excluded.tokens, updated_at = excluded.updated_at",
+            (self.bucket, requests, tokens, now)
+        )
+
+    def acquire(self, tokens=0, reserve=0.0):
+        """
+        取得一次請求的額度，額度不足時阻塞等待
+
+        Args:
+            tokens: 預估此請求消耗的 token 數
+            reserve: 須保留給較高優先等級的桶子比例（0~1），
+                例如 0.2 代表取用後桶子仍要剩下兩成容量
+
+        Returns:
+            實際等待秒數
+
+        Raises:
+            RateLimitTimeout: 等待超過 max_wait
+        """
+        # 超過桶子容量的請求永遠等不到，改為要求整桶
+        if self.tokens_per_minute > 0:
+            tokens = min(tokens, self.tokens_per_minute)
+        # 保留量（容量不足時最多保留到剛好能取得一次額度）
+        reserved_requests = min(reserve * self.requests_per_minute, max(0.0, self.requests_per_minute - 1))
+        reserved_tokens = min(reserve * self.tokens_per_minute, max(0.0, self.tokens_per_minute - tokens))
+
+        start = time.monotonic()
+        while True:
+            conn = self._connect()
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                now = time.time()
+                available_requests, available_tokens = self._refill(conn, now)
+
+                waits = []
+                needed_requests = 1 + reserved_requests
+                needed_tokens = tokens + reserved_tokens
+                if self.requests_per_minute > 0 and available_requests < needed_requests:
+                    waits.append((needed_requests - available_requests) * 60.0 / self.requests_per_minute)
+                if self.tokens_per_minute > 0 and available_tokens < needed_tokens:
+                    waits.append((needed_tokens - available_tokens) * 60.0 / self.tokens_per_minute)
+
+                if not waits:
+                    if self.requests_per_minute > 0:
+                        available_requests -= 1
+                    if self.tokens_per_minute > 0:
+                        available_tokens -= tokens
+                    self._store(conn, available_requests, available_tokens, now)
+                    conn.execute("COMMIT")
+                    return time.monotonic() - start
+
+                self._store(conn, available_requests, available_tokens, now)
+                conn.execute("COMMIT")
+            except BaseException:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+            finally:
+                conn.close()
+
+            waited = time.monotonic() - start
+            wait = max(waits)
+            if waited + wait > self.max_wait:
+                raise RateLimitTimeout(f"等待 Gemini 配額超過 {self.max_wait:.0f} 秒")
+            time.sleep(min(wait, _MAX_SLEEP))
+
+    def settle(self, estimated_tokens, actual_tokens):
+        """
+        以實際用量校正 token 桶（允許變成負值，代表之後的請求要多等一下）
+        """
+        if self.tokens_per_minute <= 0 or actual_tokens is None:
+            return
+        delta = actual_tokens - estimated_tokens
+        if delta == 0:
+            return
+
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            requests, tokens = self._refill(conn, now)
+            self._store(conn, requests, tokens - delta, now)
+            conn.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def fill_level(self):
+        """
+        取得目前桶子水位
+
+        Returns:
+            {"requests": 可用請求數, "requests_capacity": RPM,
+             "tokens": 可用 token 數, "tokens_capacity": TPM}
+        """
+        conn = self._connect()
+        try:
+            requests, tokens = self._refill(conn, time.time())
+        finally:
+            conn.close()
+        return {
+            "bucket": self.bucket,
+            "requests": round(requests, 2),
+            "requests_capacity": self.requests_per_minute,
+            "tokens": round(tokens, 2),
+            "tokens_capacity": self.tokens_per_minute,
+        }
@@ -0,0 +1,230 @@
+"""
+對話框區域模式：只送出文字區域，翻譯後貼回原圖
+
+整頁送出時模型會重新生成整張圖，對話框以外的畫面也可能被改動或劣化，
+上傳與回傳的位元組也是整頁。區域模式：
+1. 在本機找出類文字區塊（與無文字頁面偵測相同的判斷，見 src/text_detect.py）
+2. 每個區塊加上邊距（讓模型看得到對話框輪廓）後合併重疊的區塊，過小的區域放大到最小尺寸後再合併一次
+3. 各區域並行翻譯（各自走快取、限流與重試）
+4. 翻譯後的區域縮放回原大小，以羽化邊緣貼回未經修改的原圖
+
+找不到文字區塊、區塊過多或合計面積過大時（省不了多少），改為整頁翻譯。
+"""
+import io
+import logging
+import os
+from dataclasses import dataclass, field
+
+from PIL import Image, ImageDraw, ImageFilter
+
+from src.image_processing import env_flag
+from src.text_detect import find_text_boxes
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REGION_PADDING = 32
+DEFAULT_REGION_MIN_SIZE = 384
+DEFAULT_MAX_REGIONS = 12
+DEFAULT_MAX_COVERAGE = 0.6
+DEFAULT_REGION_WORKERS = 4
+# 貼回時羽化邊緣的寬度上限（像素，實際不超過邊距的一半）
+MAX_FEATHER = 12
+
+
+@dataclass
+class RegionOptions:
+    """
+    對話框區域模式設定
+
+    Attributes:
+        enabled: 是否啟用
+        padding: 文字區塊外加的邊距（像素）
+        min_size: 每個區域的最小寬高（像素，過小的區域模型難以辨識）
+        max_regions: 區域數超過此值時改為整頁翻譯
+        max_coverage: 區域合計面積超過頁面的此比例時改為整頁翻譯
+        workers: 單頁內同時翻譯的區域數
+    """
+
+    enabled: bool = False
+    padding: int = DEFAULT_REGION_PADDING
+    min_size: int = DEFAULT_REGION_MIN_SIZE
+    max_regions: int = DEFAULT_MAX_REGIONS
+    max_coverage: float = DEFAULT_MAX_COVERAGE
+    workers: int = DEFAULT_REGION_WORKERS
+
+    def __post_init__(self):
+        self.padding = max(0, self.padding)
+        self.min_size = max(64, self.min_size)
+        self.max_regions = max(1, self.max_regions)
+        if not 0 < self.max_coverage <= 1:
+            raise ValueError("max_coverage 需介於 0 與 1 之間")
+        self.workers = max(1, self.workers)
+
+    @classmethod
+    def from_env(cls):
+        """
+        依環境變數建立設定
+
+        REGION_MODE / REGION_PADDING / REGION_MIN_SIZE / REGION_MAX_REGIONS /
+        REGION_MAX_COVERAGE / REGION_WORKERS
+        """
+        try:
+            return cls(
+                enabled=env_flag("REGION_MODE", False),
+                padding=int(os.getenv("REGION_PADDING", DEFAULT_REGION_PADDING)),
+                min_size=int(os.getenv("REGION_MIN_SIZE", DEFAULT_REGION_MIN_SIZE)),
+                max_regions=int(os.getenv("REGION_MAX_REGIONS", DEFAULT_MAX_REGIONS)),
+                max_coverage=float(os.getenv("REGION_MAX_COVERAGE", DEFAULT_MAX_COVERAGE)),
+                workers=int(os.getenv("REGION_WORKERS", DEFAULT_REGION_WORKERS)),
+            )
+        except ValueError as e:
+            logger.warning(f"對話框區域設定無效，使用預設值: {e}")
+            return cls(enabled=env_flag("REGION_MODE", False))
+
+
+@dataclass
+class RegionPage:
+    """切出文字區域的頁面：原圖與各區域的外框 (left, top, right, bottom)"""
+
+    image: Image.Image = field(repr=False)
+    boxes: list[tuple[int, int, int, int]]
+    crops: list[Image.Image] = field(repr=False)
+
+    @property
+    def size(self):
+        return self.image.size
+
+    @property
+    def coverage(self):
+        width, height = self.image.size
+        return sum((r - l) * (b - t) for l, t, r, b in self.boxes) / (width * height)
+
+
+def _pad(box, padding, size):
+    """加上邊距（不超出頁面）"""
+    width, height = size
+    left, top, right, bottom = box
+    return max(0, left - padding), max(0, top - padding), min(width, right + padding), min(height, bottom + padding)
+
+
+def _grow(box, min_size, size):
+    """放大到最小尺寸（以原區域為中心，不超出頁面）"""
+    width, height = size
+    left, top, right, bottom = box
+
+    def grow(low, high, limit):
+        missing = min(min_size, limit) - (high - low)
+        if missing > 0:
+            low -= missing // 2
+            high += missing - missing // 2
+        # 超出頁面時往內平移
+        if low < 0:
+            high, low = high - low, 0
+        if high > limit:
+            low, high = max(0, low - (high - limit)), limit
+        return low, high
+
+    left, right = grow(left, right, width)
+    top, bottom = grow(top, bottom, height)
+    return left, top, right, bottom
+
+
+def _overlaps(a, b):
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+def merge_boxes(boxes):
+    """反覆合併互相重疊的外框，直到沒有重疊為止"""
+    boxes = list(boxes)
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(boxes)):
+            for j in range(i + 1, len(boxes)):
+                if _overlaps(boxes[i], boxes[j]):
+                    a, b = boxes[i], boxes.pop(j)
+                    boxes[i] = (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+                    merged = True
+                    break
+            if merged:
+                break
+    return sorted(boxes, key=lambda box: (box[1], box[0]))
+
+
+def plan_regions(image, options):
+    """
+    規劃要送出的區域
+
+    Returns:
+        外框清單；不適合區域模式（找不到文字、區域過多或面積過大）時回傳 None
+    """
+    boxes = find_text_boxes(image)
+    if not boxes:
+        return None
+    # 先以邊距合併（筆畫零碎的對話框會併入同一區域），再將過小的區域放大後合併一次
+    boxes = merge_boxes(_pad(box, options.padding, image.size) for box in boxes)
+    boxes = merge_boxes(_grow(box, options.min_size, image.size) for box in boxes)
+    width, height = image.size
+    coverage = sum((r - l) * (b - t) for l, t, r, b in boxes) / (width * height)
+    if len(boxes) > options.max_regions or coverage > options.max_coverage:
+        logger.info(f"文字區域 {len(boxes)} 個、佔頁面 {coverage:.0%}，改為整頁翻譯")
+        return None
+    return boxes
+
+
+def split_regions(image_bytes, options):
+    """
+    依設定切出文字區域
+
+    Returns:
+        RegionPage；未啟用、無法解析或不適合區域模式時回傳 None
+    """
+    if not options.enabled:
+        return None
+    try:
+        image = Image.open(io.BytesIO(image_bytes))
+        image.load()
+        boxes = plan_regions(image, options)
+    except Exception as e:
+        logger.warning(f"無法解析圖片，不使用區域模式: {e}")
+        return None
+    if boxes is None:
+        return None
+    image = image.convert("RGB")
+    return RegionPage(image=image, boxes=boxes, crops=[image.crop(box) for box in boxes])
+
+
+def _feather_mask(size, feather):
+    """邊緣漸層透明的遮罩，貼回時不會出現硬邊"""
+    mask = Image.new("L", size, 0)
+    ImageDraw.Draw(mask).rectangle(
+        (feather, feather, size[0] - 1 - feather, size[1] - 1 - feather), fill=255
+    )
+    return mask.filter(ImageFilter.GaussianBlur(feather / 2)) if feather > 0 else mask
+
+
+def composite_regions(page, region_data, padding=DEFAULT_REGION_PADDING):
+    """
+    將翻譯後的區域貼回原圖
+
+    模型回傳的尺寸可能與原區域不同，先縮放回原區域大小；邊緣在邊距範圍內羽化，
+    文字區塊本身一定完整貼上。
+
+    Args:
+        page: split_regions 回傳的 RegionPage
+        region_data: 各區域翻譯後的圖片位元組（與 page.boxes 順序相同）
+        padding: 切割時使用的邊距
+
+    Returns:
+        合成後的 Pillow 影像（RGB）
+    """
+    canvas = page.image.copy()
+    feather = min(MAX_FEATHER, padding // 2)
+    for box, data in zip(page.boxes, region_data):
+        size = (box[2] - box[0], box[3] - box[1])
+        with Image.open(io.BytesIO(data)) as translated:
+            region = translated.convert("RGB")
+        if region.size != size:
+            region = region.resize(size, Image.LANCZOS)
+        canvas.paste(region, box[:2], _feather_mask(size, feather))
+    return canvas
@@ -0,0 +1,212 @@
+"""
+翻譯結果快取（內容定址）
+
+以 hash(圖片位元組 + 完整提示詞 + 模型名稱) 為鍵，將模型回傳的圖片存到磁碟。
+同一份快取目錄可由 CLI、Flask、FastAPI 多個行程共用：
+- 寫入採「暫存檔 + os.replace」，其他行程不會讀到寫到一半的檔案
+- LRU 以檔案 mtime 表示，命中時更新 mtime，超過容量上限時淘汰最舊的項目
+"""
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+
+# 專案根目錄（src 的上一層），讓不同工作目錄啟動的前端共用同一份快取
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CACHE_DIR = os.path.join(PROJECT_ROOT, ".translation_cache")
+DEFAULT_MAX_MB = 1024
+
+# 淘汰時清到容量上限的比例，避免每次寫入都觸發淘汰
+_EVICT_TARGET_RATIO = 0.9
+_ENTRY_SUFFIX = ".bin"
+
+
+class ResultCache:
+    """磁碟 LRU 快取，執行緒安全，可跨行程共用"""
+
+    _shared = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_MB * 1024 * 1024):
+        self.logger = logging.getLogger(__name__)
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._total_bytes = self._scan_total_bytes()
+
+    @classmethod
+    def shared(cls, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_MB * 1024 * 1024):
+        """取得同一目錄在本行程內共用的快取實例（命中統計也會共用）"""
+        key = os.path.abspath(cache_dir)
+        with cls._shared_lock:
+            cache = cls._shared.get(key)
+            if cache is None:
+                cache = cls(key, max_bytes)
+                cls._shared[key] = cache
+            else:
+                cache.max_bytes = max_bytes
+            return cache
+
+    @classmethod
+    def from_env(cls, cache_dir=None, max_mb=None):
+        """
+        依環境變數建立共用快取
+
+        TRANSLATION_CACHE_ENABLED: 設為 false/0/no 時停用（回傳 None）
+        TRANSLATION_CACHE_DIR: 快取目錄（預設為專案根目錄下的 .translation_cache）
+        TRANSLATION_CACHE_MAX_MB: 容量上限（MB）
+
+        Args:
+            cache_dir: 快取目錄（優先於環境變數）
+            max_mb: 容量上限 MB（優先於環境變數）
+        """
+        enabled = os.getenv("TRANSLATION_CACHE_ENABLED", "true").strip().lower()
+        if enabled in ("0", "false", "no", "off"):
+            return None
+
+        cache_dir = cache_dir or os.getenv("TRANSLATION_CACHE_DIR") or DEFAULT_CACHE_DIR
+        if max_mb is None:
+            try:
+                max_mb = int(os.getenv("TRANSLATION_CACHE_MAX_MB", DEFAULT_MAX_MB))
+            except ValueError:
+                max_mb = DEFAULT_MAX_MB
+        return cls.shared(cache_dir, max_mb * 1024 * 1024)
+
+    @staticmethod
+    def make_key(image_bytes, prompt, model_name):
+        """計算快取鍵（各欄位加上長度前綴，避免拼接造成碰撞）"""
+        digest = hashlib.sha256()
+        for part in (model_name.encode("utf-8"), prompt.encode("utf-8"), image_bytes):
+            digest.update(len(part).to_bytes(8, "big"))
+            digest.update(part)
+        return digest.hexdigest()
+
+    def _entry_path(self, key):
+        # 以前兩碼分子目錄，避免單一目錄檔案過多
+        return os.path.join(self.cache_dir, key[:2], key + _ENTRY_SUFFIX)
+
+    def get(self, key, record=True):
+        """
+        讀取快取，未命中回傳 None
+
+        Args:
+            record: 是否計入命中 / 未命中統計（一頁查詢多個鍵時由呼叫端以 record_lookup 計一次）
+        """
+        path = self._entry_path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            if record:
+                self.record_lookup(False)
+            return None
+
+        try:
+            # 更新 mtime 作為 LRU 的最近使用時間
+            os.utime(path, None)
+        except OSError:
+            pass
+
+        if record:
+            self.record_lookup(True)
+        return data
+
+    def record_lookup(self, hit):
+        """記錄一次查詢的結果"""
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def put(self, key, data):
+        """寫入快取（原子寫入），超過容量時淘汰最久未使用的項目"""
+        path = self._entry_path(key)
+        directory = os.path.dirname(path)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                # 覆寫既有項目時只計入大小差異
+                try:
+                    replaced = os.path.getsize(path)
+                except OSError:
+                    replaced = 0
+                os.replace(tmp_path, path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+        except OSError as e:
+            self.logger.warning(f"寫入翻譯快取失敗: {e}")
+            return
+
+        with self._lock:
+            self._total_bytes += len(data) - replaced
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _iter_entries(self):
+        """列出磁碟上的所有快取項目 (path, size, mtime)"""
+        try:
+            shards = list(os.scandir(self.cache_dir))
+        except OSError:
+            return
+        for shard in shards:
+            if not shard.is_dir():
+                continue
+            try:
+                for entry in os.scandir(shard.path):
+                    if entry.name.endswith(_ENTRY_SUFFIX):
+                        try:
+                            st = entry.stat()
+                        except OSError:
+                            continue
+                        yield entry.path, st.st_size, st.st_mtime
+            except OSError:
+                continue
+
+    def _scan_total_bytes(self):
+        return sum(size for _, size, _ in self._iter_entries())
+
+    def _evict(self):
+        """
+        重新掃描磁碟（含其他行程寫入的項目），依 mtime 由舊到新刪除
+        呼叫端需持有 self._lock
+        """
+        entries = sorted(self._iter_entries(), key=lambda e: e[2])
+        total = sum(size for _, size, _ in entries)
+        target = int(self.max_bytes * _EVICT_TARGET_RATIO)
+
+        for path, size, _ in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                self.evictions += 1
+            except OSError:
+                continue
+
+        self._total_bytes = total
+
+    def stats(self):
+        """取得快取統計"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "size_bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+            }
@@ -0,0 +1,187 @@
+"""
+Gemini API 重試策略
+
+將例外分類為「可重試」（429、5xx、逾時、連線中斷）或「不可重試」（金鑰錯誤、請求格式錯誤等），
+可重試的錯誤以指數退避 + 隨機抖動重送，並遵守伺服器回傳的 Retry-After / RetryInfo。
+"""
+import logging
+import os
+import random
+import re
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+try:
+    from google.genai import errors as genai_errors
+except ImportError:  # pragma: no cover - 僅在未安裝 google-genai 時發生
+    genai_errors = None
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover - httpx 為 google-genai 的相依套件
+    httpx = None
+
+
+# 可重試的 HTTP 狀態碼：逾時、限流、伺服器暫時性錯誤
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RetryRecord:
+    """單次重試紀錄"""
+
+    attempt: int
+    error: str
+    status_code: Optional[int]
+    delay: float
+
+
+def get_status_code(error):
+    """取得例外對應的 HTTP 狀態碼（無法判斷時回傳 None）"""
+    if genai_errors is not None and isinstance(error, genai_errors.APIError):
+        return error.code
+    code = getattr(error, "code", None) or getattr(error, "status_code", None)
+    return code if isinstance(code, int) else None
+
+
+def _parse_duration(value):
+    """解析 "37s"、"1.5s" 或純數字秒數"""
+    if value is None:
+        return None
+    match = re.fullmatch(r"\s*([0-9]*\.?[0-9]+)\s*s?\s*", str(value))
+    return float(match.group(1)) if match else None
+
+
+def get_retry_after(error):
+    """
+    取得伺服器建議的等待秒數
+
+    依序檢查 HTTP Retry-After 標頭與 Gemini 錯誤內容中的 google.rpc.RetryInfo
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers is not None:
+        try:
+            delay = _parse_duration(headers.get("retry-after"))
+        except Exception:
+            delay = None
+        if delay is not None:
+            return delay
+
+    details = getattr(error, "details", None)
+    if isinstance(details, dict):
+        items = details.get("error", {}).get("details", [])
+        for item in items if isinstance(items, list) else []:
+            if isinstance(item, dict) and item.get("@type", "").endswith("google.rpc.RetryInfo"):
+                delay = _parse_duration(item.get("retryDelay"))
+                if delay is not None:
+                    return delay
+    return None
+
+
+def is_retryable(error):
+    """判斷例外是否為暫時性錯誤"""
+    status_code = get_status_code(error)
+    if status_code is not None:
+        return status_code in RETRYABLE_STATUS_CODES
+
+    if httpx is not None and isinstance(error, (httpx.TimeoutException, httpx.TransportError)):
+        return True
+
+    return isinstance(error, (ConnectionError, TimeoutError))
+
+
+@dataclass
+class RetryPolicy:
+    """
+    重試策略
+
+    Attributes:
+        max_attempts: 每頁最多嘗試次數（含第一次）
+        base_delay: 第一次重試的退避基準秒數
+        max_delay: 單次等待上限秒數
+        time_budget: 每頁總時間預算（秒），超過即不再重試
+    """
+
+    max_attempts: int = 4
+    base_delay: float = 2.0
+    max_delay: float = 60.0
+    time_budget: float = 300.0
+
+    @classmethod
+    def from_env(cls):
+        """
+        依環境變數建立重試策略
+
+        GEMINI_MAX_ATTEMPTS / GEMINI_RETRY_BASE_DELAY / GEMINI_RETRY_MAX_DELAY / GEMINI_RETRY_BUDGET
+        """
+        defaults = cls()
+
+        def read(name, default, cast):
+            try:
+                return cast(os.getenv(name, default))
+            except ValueError:
+                logger.warning(f"{name} 設定無效，使用預設值 {default}")
+                return default
+
+        return cls(
+            max_attempts=max(1, read("GEMINI_MAX_ATTEMPTS", defaults.max_attempts, int)),
+            base_delay=read("GEMINI_RETRY_BASE_DELAY", defaults.base_delay, float),
+            max_delay=read("GEMINI_RETRY_MAX_DELAY", defaults.max_delay, float),
+            time_budget=read("GEMINI_RETRY_BUDGET", defaults.time_budget, float),
+        )
+
+    def compute_delay(self, attempt, retry_after=None):
+        """
+        計算第 attempt 次失敗後的等待秒數
+
+        使用 full jitter：在 [0, min(max_delay, base * 2^(attempt-1))] 間隨機取值，
+        讓並行的請求錯開重送時間；伺服器指定 Retry-After 時以其為下限。
+        """
+        ceiling = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        delay = random.uniform(0, ceiling)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    def run(self, func, on_retry=None, sleep=time.sleep):
+        """
+        執行 func，遇到可重試錯誤時退避後重送
+
+        Args:
+            func: 無參數的呼叫
+            on_retry: 每次重試前的回呼 on_retry(RetryRecord)
+            sleep: 等待函式（可替換以便測試）
+
+        Returns:
+            func 的回傳值
+
+        Raises:
+            最後一次的例外（不可重試、次數用盡或超出時間預算時）
+        """
+        start = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                return func()
+            except Exception as e:
+                if not is_retryable(e) or attempt >= self.max_attempts:
+                    raise
+
+                retry_after = get_retry_after(e)
+                delay = self.compute_delay(attempt, retry_after)
+                if time.monotonic() - start + delay > self.time_budget:
+                    raise
+
+                if on_retry is not None:
+                    on_retry(RetryRecord(
+                        attempt=attempt,
+                        error=str(e),
+                        status_code=get_status_code(e),
+                        delay=delay,
+                    ))
+                sleep(delay)
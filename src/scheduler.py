@@ -0,0 +1,186 @@
+"""
+優先等級與加權公平排程
+
+互動式的單頁請求（Flask /upload、FastAPI /api/translate）不應排在上千頁的批次後面，
+也不應與批次盲目搶同一份配額。這裡定義三個優先等級，並提供各處共用的排程元件：
+- interactive：使用者正在等結果的單頁請求
+- batch：整本 / 整章的批次（CLI 預設）
+- background：補翻舊資料等不急的工作
+
+優先等級經由 contextvars 傳遞到引擎，影響三個地方：
+1. FastAPI 工作佇列：依等級取工作，同一等級內以 FairQueue 在各流量（使用者）間加權公平分配
+2. 自適應並行度：名額不足時，高優先等級的呼叫先取得名額
+3. 配額限流器（跨行程）：低優先等級的請求要在桶子中保留一定比例給較高等級，
+   批次長時間跑滿配額時，互動請求仍能立即取得額度
+"""
+import contextvars
+import logging
+import os
+import re
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_BATCH = "batch"
+PRIORITY_BACKGROUND = "background"
+# 依優先順序排列（索引即為等級，數字越小越優先）
+PRIORITY_CLASSES = (PRIORITY_INTERACTIVE, PRIORITY_BATCH, PRIORITY_BACKGROUND)
+DEFAULT_PRIORITY = PRIORITY_BATCH
+
+# 各等級取得配額時須保留給較高等級的桶子比例
+DEFAULT_QUOTA_RESERVE = {
+    PRIORITY_INTERACTIVE: 0.0,
+    PRIORITY_BATCH: 0.2,
+    PRIORITY_BACKGROUND: 0.4,
+}
+
+# 流量權重的下限（避免除以零）
+MIN_WEIGHT = 0.01
+# 記錄的流量數超過此值時，清除已落後虛擬時間的流量
+_PRUNE_THRESHOLD = 1024
+
+_current_priority = contextvars.ContextVar("priority", default=None)
+_default_priority = DEFAULT_PRIORITY
+
+
+def normalize_priority(value, default=DEFAULT_PRIORITY):
+    """
+    正規化優先等級名稱
+
+    Raises:
+        ValueError: 不支援的等級
+    """
+    if value is None or not str(value).strip():
+        return default
+    priority = str(value).strip().lower()
+    if priority not in PRIORITY_CLASSES:
+        raise ValueError(f"不支援的優先等級: {value}（可用: {', '.join(PRIORITY_CLASSES)}）")
+    return priority
+
+
+def priority_rank(priority):
+    """優先等級的順位（0 最優先）"""
+    return PRIORITY_CLASSES.index(normalize_priority(priority))
+
+
+def configure_default_priority(priority):
+    """設定本行程未指定優先等級時的預設值（例如 CLI 的 --priority）"""
+    global _default_priority
+    _default_priority = normalize_priority(priority)
+
+
+def current_priority():
+    """目前上下文的優先等級（未指定時為行程預設值）"""
+    return _current_priority.get() or _default_priority
+
+
+@contextmanager
+def priority_context(priority):
+    """在此區塊內（含以 bind_context 提交到其他執行緒的工作）使用指定的優先等級"""
+    token = _current_priority.set(normalize_priority(priority))
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+def quota_reserve(priority=None):
+    """
+    指定等級須保留給較高等級的配額比例
+
+    SCHEDULER_BATCH_RESERVE / SCHEDULER_BACKGROUND_RESERVE
+    """
+    priority = normalize_priority(priority or current_priority())
+    default = DEFAULT_QUOTA_RESERVE[priority]
+    if priority == PRIORITY_INTERACTIVE:
+        return default
+    try:
+        reserve = float(os.getenv(f"SCHEDULER_{priority.upper()}_RESERVE", default))
+    except ValueError:
+        return default
+    return min(max(reserve, 0.0), 0.9)
+
+
+def parse_weights(value):
+    """解析流量權重設定，例如 "alice=3,bob=1"（無效的項目略過）"""
+    weights = {}
+    for item in re.split(r"[,;\s]+", value or ""):
+        name, sep, weight = item.partition("=")
+        if not sep or not name.strip():
+            continue
+        try:
+            weights[name.strip()] = float(weight)
+        except ValueError:
+            logger.warning(f"略過無效的流量權重: {item}")
+    return weights
+
+
+class FairQueue:
+    """
+    加權公平排程（Start-time Fair Queuing）的排序標籤（執行緒安全）
+
+    每個等級各有一個虛擬時間。工作排入時取得開始標籤
+    S = max(虛擬時間, 同流量上一筆工作的完成標籤)，完成標籤為 S + 成本 / 權重；
+    依 S 由小到大取出工作，取出時將虛擬時間推進到 S。
+    權重 2 的流量取得的處理次數約是權重 1 的兩倍；閒置後回來的流量不會累積優先權。
+
+    Args:
+        weights: 流量名稱 -> 權重（未列出的流量為 1）
+    """
+
+    def __init__(self, weights=None):
+        self.weights = dict(weights or {})
+        self._virtual_time = {}
+        self._finish = {}
+        self._lock = threading.Lock()
+
+    def weight(self, flow):
+        return max(self.weights.get(flow, 1.0), MIN_WEIGHT)
+
+    def tag(self, priority, flow, cost=1.0):
+        """
+        取得新工作的排序標籤
+
+        Args:
+            priority: 優先等級
+            flow: 流量名稱（使用者、用戶端等）
+            cost: 工作成本（預設每頁 1）
+
+        Returns:
+            開始標籤（同一等級內由小到大處理）
+        """
+        rank = priority_rank(priority)
+        with self._lock:
+            start = max(self._virtual_time.get(rank, 0.0), self._finish.get((rank, flow), 0.0))
+            self._finish[(rank, flow)] = start + cost / self.weight(flow)
+        return start
+
+    def advance(self, priority, tag):
+        """工作開始處理時推進該等級的虛擬時間"""
+        rank = priority_rank(priority)
+        with self._lock:
+            virtual_time = max(self._virtual_time.get(rank, 0.0), tag)
+            self._virtual_time[rank] = virtual_time
+            if len(self._finish) > _PRUNE_THRESHOLD:
+                # 完成標籤已不超過虛擬時間的流量，下次排入時等同新流量
+                self._finish = {
+                    key: finish for key, finish in self._finish.items()
+                    if finish > self._virtual_time.get(key[0], 0.0)
+                }
+
+    def restore(self, priority, flow, first_tag, last_tag, cost=1.0):
+        """
+        依持久化的排隊工作還原狀態（服務重啟時）
+
+        Args:
+            first_tag: 該流量排隊中工作的最小標籤
+            last_tag: 該流量排隊中工作的最大標籤
+        """
+        rank = priority_rank(priority)
+        with self._lock:
+            finish = last_tag + cost / self.weight(flow)
+            self._finish[(rank, flow)] = max(self._finish.get((rank, flow), 0.0), finish)
+            current = self._virtual_time.get(rank)
+            self._virtual_time[rank] = first_tag if current is None else min(current, first_tag)
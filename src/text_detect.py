@@ -0,0 +1,319 @@
+"""
+無文字頁面偵測（本機 CPU 預先判斷）
+
+跨頁大圖、空白頁、純插圖頁沒有需要翻譯的文字，送出去只是付出完整的延遲與費用。
+送出前先以 Pillow 做幾項便宜的判斷（縮小到約 1200 像素，單頁約 0.1 秒）：
+1. 空白 / 單色：灰階標準差極低
+2. 平坦：邊緣密度極低（幾乎沒有線條）
+3. 類文字區塊：文字是白底上密集的細小深色筆畫。將「緊鄰白底的深色像素」依 8x8 格統計，
+   筆畫比例落在文字範圍內的格子以 8 連通合併成區塊，只計入大小與填滿率像文字欄的區塊；
+   類文字格子少於門檻才視為無文字
+
+判斷偏向保守：誤判為有文字只是照常送出，誤判為無文字才會漏翻，因此網點、線稿較多的頁面多半仍會送出。
+在 translation_config.txt 中有特定圖片要求的頁面一律送出。
+
+模式（TEXTLESS_MODE）：
+- off: 不判斷（預設）
+- log: 只記錄判斷結果，照常送出（可先用來評估準確度）
+- skip: 無文字頁面不送出，直接以原圖輸出（套用輸出格式設定）
+"""
+import io
+import logging
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+
+from PIL import Image, ImageChops, ImageFilter, ImageStat
+
+from src.metrics import METRIC_PREFIX, metrics
+
+logger = logging.getLogger(__name__)
+
+TEXTLESS_OFF = "off"
+TEXTLESS_LOG = "log"
+TEXTLESS_SKIP = "skip"
+TEXTLESS_MODES = (TEXTLESS_OFF, TEXTLESS_LOG, TEXTLESS_SKIP)
+
+DEFAULT_MIN_TEXT_CELLS = 12
+
+# 分析用縮圖的長邊（長條頁面改以寬度為準）
+ANALYSIS_LONG_EDGE = 1200
+ANALYSIS_STRIP_WIDTH = 800
+# 灰階標準差低於此值視為空白頁
+BLANK_STDDEV = 4.0
+# 邊緣強度門檻與「平坦」頁面的邊緣像素比例上限
+EDGE_LEVEL = 64
+FLAT_EDGE_DENSITY = 0.002
+# 深色筆畫與白底的灰階門檻
+DARK_LEVEL = 128
+PAPER_LEVEL = 200
+# 統計格大小，以及類文字格的筆畫比例範圍與周圍白底比例下限
+CELL_SIZE = 8
+STROKE_MIN = 0.06
+STROKE_MAX = 0.45
+PAPER_MIN = 0.35
+# 類文字區塊：最少格數、外框填滿率下限、外框最長邊佔頁面的比例上限
+COMPONENT_MIN_CELLS = 3
+COMPONENT_MIN_FILL = 0.35
+COMPONENT_MAX_EXTENT = 0.5
+
+
+@dataclass
+class TextlessOptions:
+    """
+    無文字頁面偵測設定
+
+    Attributes:
+        mode: off / log / skip
+        min_text_cells: 類文字格子數少於此值視為無文字（越大越容易略過）
+    """
+
+    mode: str = TEXTLESS_OFF
+    min_text_cells: int = DEFAULT_MIN_TEXT_CELLS
+
+    def __post_init__(self):
+        self.mode = (self.mode or TEXTLESS_OFF).strip().lower()
+        if self.mode not in TEXTLESS_MODES:
+            raise ValueError(f"不支援的無文字頁面模式: {self.mode}（可用: {', '.join(TEXTLESS_MODES)}）")
+        self.min_text_cells = max(1, self.min_text_cells)
+
+    @property
+    def enabled(self):
+        return self.mode != TEXTLESS_OFF
+
+    @classmethod
+    def from_env(cls):
+        """
+        依環境變數建立設定
+
+        TEXTLESS_MODE / TEXTLESS_MIN_TEXT_CELLS
+        """
+        try:
+            return cls(
+                mode=os.getenv("TEXTLESS_MODE", TEXTLESS_OFF),
+                min_text_cells=int(os.getenv("TEXTLESS_MIN_TEXT_CELLS", DEFAULT_MIN_TEXT_CELLS)),
+            )
+        except ValueError as e:
+            logger.warning(f"無文字頁面偵測設定無效，停用: {e}")
+            return cls()
+
+
+@dataclass
+class TextAnalysis:
+    """
+    判斷結果
+
+    Attributes:
+        textless: 是否判斷為無文字
+        reason: blank / flat / no_text_regions / text
+        text_cells: 類文字格子數
+        edge_density: 邊緣像素比例
+        size: 原始圖片尺寸
+        elapsed: 判斷耗時（秒）
+    """
+
+    textless: bool
+    reason: str
+    text_cells: int = 0
+    edge_density: float = 0.0
+    size: tuple[int, int] = (0, 0)
+    elapsed: float = 0.0
+
+
+def _analysis_size(size):
+    width, height = size
+    if height > width * 2:
+        scale = min(1.0, ANALYSIS_STRIP_WIDTH / width)
+    else:
+        scale = min(1.0, ANALYSIS_LONG_EDGE / max(width, height))
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def _fraction_at_least(image, level):
+    """灰階圖中數值 >= level 的像素比例"""
+    histogram = image.histogram()
+    return sum(histogram[level:]) / max(1, image.width * image.height)
+
+
+def _text_components(cells, grid_width, grid_height):
+    """
+    將類文字格以 8 連通合併，只保留形狀像文字區塊的部分
+
+    Returns:
+        [(格子數, (left, top, right, bottom)), ...]（格座標，右、下不含）
+    """
+    max_width = max(1, int(grid_width * COMPONENT_MAX_EXTENT))
+    max_height = max(1, int(grid_height * COMPONENT_MAX_EXTENT))
+    remaining = set(cells)
+    components = []
+    while remaining:
+        start = remaining.pop()
+        queue = deque([start])
+        count = 0
+        left = right = start[0]
+        top = bottom = start[1]
+        while queue:
+            x, y = queue.popleft()
+            count += 1
+            left, right = min(left, x), max(right, x)
+            top, bottom = min(top, y), max(bottom, y)
+            for dx in (-1, 0, 1):
+                for dy in (-1, 0, 1):
+                    neighbor = (x + dx, y + dy)
+                    if neighbor in remaining:
+                        remaining.remove(neighbor)
+                        queue.append(neighbor)
+        box_width, box_height = right - left + 1, bottom - top + 1
+        if (
+            count >= COMPONENT_MIN_CELLS
+            and count / (box_width * box_height) >= COMPONENT_MIN_FILL
+            and box_width <= max_width
+            and box_height <= max_height
+        ):
+            components.append((count, (left, top, right + 1, bottom + 1)))
+    return components
+
+
+def _load_gray(image):
+    """將 Pillow 影像縮小為分析用的灰階圖"""
+    target = _analysis_size(image.size)
+    # JPEG 可在解碼時直接縮小
+    image.draft("L", target)
+    gray = image.convert("L")
+    if gray.size != target:
+        gray = gray.resize(target, Image.BILINEAR)
+    return gray
+
+
+def _find_components(gray):
+    """在分析用灰階圖中找出類文字區塊（格座標）"""
+    # 緊鄰白底（2 像素內）的深色像素 = 白底上的筆畫；大片黑色或網點灰階區域不會計入
+    dark = gray.point(lambda v: 255 if v < DARK_LEVEL else 0)
+    paper = gray.point(lambda v: 255 if v >= PAPER_LEVEL else 0)
+    stroke = ImageChops.multiply(dark, paper.filter(ImageFilter.MaxFilter(5)))
+
+    grid = (max(1, -(-gray.width // CELL_SIZE)), max(1, -(-gray.height // CELL_SIZE)))
+    stroke_cells = stroke.resize(grid, Image.BOX).getdata()
+    # 白底比例以較大範圍（含相鄰格）計算，文字格本身筆畫多、白底少
+    paper_cells = paper.resize(grid, Image.BOX).filter(ImageFilter.BoxBlur(1)).getdata()
+
+    cells = [
+        (index % grid[0], index // grid[0])
+        for index, (stroke_level, paper_level) in enumerate(zip(stroke_cells, paper_cells))
+        if STROKE_MIN * 255 <= stroke_level <= STROKE_MAX * 255 and paper_level >= PAPER_MIN * 255
+    ]
+    return _text_components(cells, *grid)
+
+
+def find_text_boxes(image):
+    """
+    找出頁面中的類文字區塊（對話框、旁白等）
+
+    Args:
+        image: Pillow 影像
+
+    Returns:
+        原圖座標的外框 [(left, top, right, bottom), ...]（未加邊距、未合併）
+    """
+    width, height = image.size
+    gray = _load_gray(image)
+    scale_x = width / gray.width * CELL_SIZE
+    scale_y = height / gray.height * CELL_SIZE
+    return [
+        (
+            int(left * scale_x),
+            int(top * scale_y),
+            min(width, int(right * scale_x + 0.5)),
+            min(height, int(bottom * scale_y + 0.5)),
+        )
+        for _, (left, top, right, bottom) in _find_components(gray)
+    ]
+
+
+def analyze_page(image_bytes, options=None):
+    """
+    判斷頁面是否可能沒有文字
+
+    Args:
+        image_bytes: 圖片內容
+        options: TextlessOptions（只使用 min_text_cells）
+
+    Returns:
+        TextAnalysis
+
+    Raises:
+        OSError / PIL.UnidentifiedImageError: 無法解碼的圖片
+    """
+    options = options or TextlessOptions()
+    started = time.perf_counter()
+
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        size = image.size
+        gray = _load_gray(image)
+
+    def finish(textless, reason, text_cells=0, edge_density=0.0):
+        return TextAnalysis(textless, reason, text_cells, edge_density, size, time.perf_counter() - started)
+
+    if ImageStat.Stat(gray).stddev[0] < BLANK_STDDEV:
+        return finish(True, "blank")
+
+    edge_density = _fraction_at_least(gray.filter(ImageFilter.FIND_EDGES), EDGE_LEVEL)
+    if edge_density < FLAT_EDGE_DENSITY:
+        return finish(True, "flat", edge_density=edge_density)
+
+    text_cells = sum(count for count, _ in _find_components(gray))
+    if text_cells < options.min_text_cells:
+        return finish(True, "no_text_regions", text_cells, edge_density)
+    return finish(False, "text", text_cells, edge_density)
+
+
+class TextlessStats:
+    """無文字頁面判斷的累計統計（執行緒安全）"""
+
+    def __init__(self):
+        self.checked = 0
+        self.textless = 0
+        self.skipped = 0
+        self.detect_seconds = 0.0
+        self.saved_seconds = 0.0
+        self.reasons = {}
+        self._lock = threading.Lock()
+
+    def record(self, analysis, skipped, estimated_latency=None):
+        """
+        記錄一頁的判斷結果
+
+        Args:
+            analysis: TextAnalysis
+            skipped: 是否因此未送出
+            estimated_latency: 略過時估計省下的模型呼叫秒數（未知時為 None）
+        """
+        with self._lock:
+            self.checked += 1
+            self.detect_seconds += analysis.elapsed
+            if analysis.textless:
+                self.textless += 1
+                self.reasons[analysis.reason] = self.reasons.get(analysis.reason, 0) + 1
+            if skipped:
+                self.skipped += 1
+                self.saved_seconds += estimated_latency or 0.0
+        metrics.inc(
+            f"{METRIC_PREFIX}_textless_total",
+            result="skipped" if skipped else ("textless" if analysis.textless else "text")
+        )
+
+    def summary(self):
+        with self._lock:
+            return {
+                "checked": self.checked,
+                "textless": self.textless,
+                "skipped": self.skipped,
+                "reasons": dict(self.reasons),
+                "detect_seconds": round(self.detect_seconds, 3),
+                "saved_seconds": round(self.saved_seconds, 1),
+            }
+
+
+metrics.describe(f"{METRIC_PREFIX}_textless_total", "無文字頁面判斷結果（skipped 代表未送出，省下一次模型呼叫）")
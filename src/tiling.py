@@ -0,0 +1,217 @@
+"""
+長條漫畫（Webtoon）分塊處理
+
+整張 800×20000 的長條圖直接送出時，模型常會拒絕、回傳縮小後的結果，而且無法並行。
+分塊模式將長頁面切成多塊：
+- 優先在分格之間的留白（整列近乎單色的區域）切開，切口不會穿過文字
+- 找不到留白時以固定高度切開，相鄰兩塊保留重疊區，縫合時漸層混合以消除接縫
+
+各塊翻譯完成後依原始位置縫合回同一張圖，尺寸與原頁面相同。
+"""
+import io
+import logging
+import os
+from dataclasses import dataclass, field
+
+from PIL import Image
+
+from src.image_processing import env_flag
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TILE_HEIGHT = 1600
+DEFAULT_TILE_OVERLAP = 96
+DEFAULT_MIN_ASPECT = 2.5
+DEFAULT_TILE_WORKERS = 4
+
+# 視為留白的最少連續列數，以及單列內最亮與最暗像素的容許差值
+GUTTER_MIN_RUN = 12
+GUTTER_TOLERANCE = 12
+
+# 在每塊下半部（tile_height 的此比例範圍內）尋找留白，確保每塊不會過矮
+GUTTER_SEARCH_RATIO = 0.5
+
+
+@dataclass
+class TilingOptions:
+    """
+    分塊設定
+
+    Attributes:
+        enabled: 是否啟用分塊模式
+        tile_height: 每塊的最大高度（像素）
+        overlap: 固定高度切割時相鄰兩塊的重疊高度（像素）
+        min_aspect: 高寬比超過此值的頁面才分塊
+        split_at_gutters: 是否優先在分格留白處切開
+        workers: 單頁內同時翻譯的塊數
+    """
+
+    enabled: bool = False
+    tile_height: int = DEFAULT_TILE_HEIGHT
+    overlap: int = DEFAULT_TILE_OVERLAP
+    min_aspect: float = DEFAULT_MIN_ASPECT
+    split_at_gutters: bool = True
+    workers: int = DEFAULT_TILE_WORKERS
+
+    def __post_init__(self):
+        if self.tile_height < 256:
+            raise ValueError("分塊高度至少需要 256 像素")
+        # 重疊區過大會讓切割無法前進
+        if not 0 <= self.overlap <= self.tile_height // 4:
+            raise ValueError(f"重疊高度需介於 0 與 {self.tile_height // 4} 之間")
+        self.workers = max(1, self.workers)
+
+    @classmethod
+    def from_env(cls):
+        """
+        依環境變數建立設定
+
+        TILING_ENABLED / TILE_HEIGHT / TILE_OVERLAP / TILE_MIN_ASPECT /
+        TILE_SPLIT_AT_GUTTERS / TILE_WORKERS
+        """
+        try:
+            return cls(
+                enabled=env_flag("TILING_ENABLED", False),
+                tile_height=int(os.getenv("TILE_HEIGHT", DEFAULT_TILE_HEIGHT)),
+                overlap=int(os.getenv("TILE_OVERLAP", DEFAULT_TILE_OVERLAP)),
+                min_aspect=float(os.getenv("TILE_MIN_ASPECT", DEFAULT_MIN_ASPECT)),
+                split_at_gutters=env_flag("TILE_SPLIT_AT_GUTTERS", True),
+                workers=int(os.getenv("TILE_WORKERS", DEFAULT_TILE_WORKERS)),
+            )
+        except ValueError as e:
+            logger.warning(f"分塊設定無效，使用預設值: {e}")
+            return cls(enabled=env_flag("TILING_ENABLED", False))
+
+
+@dataclass
+class TiledPage:
+    """切割後的頁面：原始尺寸與每塊的垂直範圍 (top, bottom)"""
+
+    size: tuple[int, int]
+    spans: list[tuple[int, int]]
+    tiles: list[Image.Image] = field(repr=False)
+
+
+def needs_tiling(size, options):
+    """依頁面尺寸判斷是否需要分塊"""
+    width, height = size
+    return (
+        options.enabled
+        and height > options.tile_height
+        and height >= width * options.min_aspect
+    )
+
+
+def _is_blank_row(gray, y):
+    low, high = gray.crop((0, y, gray.width, y + 1)).getextrema()
+    return high - low <= GUTTER_TOLERANCE
+
+
+def find_gutter(gray, start, end):
+    """
+    在 [start, end) 範圍內尋找分格留白
+
+    留白是連續至少 GUTTER_MIN_RUN 列、每列近乎單色（白底或黑底皆可）的區域。
+    有多處時取最接近 end 的一處，讓每塊盡量接近最大高度。
+
+    Returns:
+        留白中央的列座標，找不到時回傳 None
+    """
+    run_end = None
+    for y in range(end - 1, start - 1, -1):
+        if _is_blank_row(gray, y):
+            if run_end is None:
+                run_end = y + 1
+        elif run_end is not None:
+            if run_end - (y + 1) >= GUTTER_MIN_RUN:
+                return (y + 1 + run_end) // 2
+            run_end = None
+    if run_end is not None and run_end - start >= GUTTER_MIN_RUN:
+        return (start + run_end) // 2
+    return None
+
+
+def plan_tiles(image, options):
+    """
+    規劃切割位置
+
+    Returns:
+        每塊的垂直範圍 [(top, bottom), ...]；固定高度切割的相鄰兩塊會互相重疊
+    """
+    width, height = image.size
+    gray = image.convert("L") if options.split_at_gutters else None
+
+    spans = []
+    top = 0
+    while height - top > options.tile_height:
+        limit = top + options.tile_height
+        cut = None
+        if gray is not None:
+            search_from = limit - int(options.tile_height * GUTTER_SEARCH_RATIO)
+            cut = find_gutter(gray, search_from, limit)
+
+        if cut is not None:
+            spans.append((top, cut))
+            top = cut
+        else:
+            spans.append((top, limit))
+            top = limit - options.overlap
+    spans.append((top, height))
+    return spans
+
+
+def split_page(image_bytes, options):
+    """
+    依設定切割頁面
+
+    Returns:
+        TiledPage；頁面不需分塊或無法解析時回傳 None
+    """
+    try:
+        image = Image.open(io.BytesIO(image_bytes))
+        if not needs_tiling(image.size, options):
+            return None
+        image.load()
+    except Exception as e:
+        logger.warning(f"無法解析圖片，不進行分塊: {e}")
+        return None
+
+    spans = plan_tiles(image, options)
+    tiles = [image.crop((0, top, image.width, bottom)) for top, bottom in spans]
+    return TiledPage(size=image.size, spans=spans, tiles=tiles)
+
+
+def stitch_tiles(page, tile_data):
+    """
+    將翻譯後的各塊縫合回原始尺寸
+
+    模型回傳的尺寸可能與原塊不同，先縮放回原塊大小；
+    重疊區以由上而下的線性漸層混合，避免出現硬接縫。
+
+    Args:
+        page: split_page 回傳的 TiledPage
+        tile_data: 各塊翻譯後的圖片位元組（與 page.spans 順序相同）
+
+    Returns:
+        縫合後的 Pillow 影像（RGB）
+    """
+    width, height = page.size
+    canvas = Image.new("RGB", (width, height), (255, 255, 255))
+    previous_bottom = 0
+
+    for (top, bottom), data in zip(page.spans, tile_data):
+        with Image.open(io.BytesIO(data)) as translated:
+            tile = translated.convert("RGB")
+        if tile.size != (width, bottom - top):
+            tile = tile.resize((width, bottom - top), Image.LANCZOS)
+
+        overlap = previous_bottom - top
+        if overlap > 0:
+            mask = Image.new("L", tile.size, 255)
+            mask.paste(Image.linear_gradient("L").resize((width, overlap)), (0, 0))
+            canvas.paste(tile, (0, top), mask)
+        else:
+            canvas.paste(tile, (0, top))
+        previous_bottom = bottom
+
+    return canvas
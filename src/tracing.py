@@ -0,0 +1,375 @@
+"""
+請求追蹤（span）
+
+從 API 入口（或 CLI 的每一頁）建立 trace，經由 contextvars 傳遞到服務層與引擎，
+再經由工作佇列中保存的 traceparent 延續到背景工作者，讓慢回應可以對應到上游的每個分段：
+上傳存檔、排隊等待、模型呼叫、輸出寫入。
+
+匯出方式（TRACING_EXPORTER）：
+- none: 停用（預設，span 為空操作，幾乎沒有額外成本）
+- file: 每個 span 一行 JSON，寫入 TRACING_FILE（預設 traces.jsonl）
+- otlp: 以 OTLP/HTTP JSON 批次送到 OTEL_EXPORTER_OTLP_ENDPOINT（預設 http://localhost:4318）
+
+trace 與 span ID、traceparent 標頭皆遵循 W3C Trace Context 格式。
+"""
+import contextvars
+import json
+import logging
+import os
+import queue
+import secrets
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SERVICE_NAME = "comic-translator"
+DEFAULT_TRACE_FILE = "traces.jsonl"
+DEFAULT_OTLP_ENDPOINT = "http://localhost:4318"
+
+# OTLP 批次匯出：每批最多幾個 span、最長等待秒數
+OTLP_BATCH_SIZE = 256
+OTLP_FLUSH_INTERVAL = 2.0
+OTLP_QUEUE_SIZE = 8192
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """一個已開始的 span"""
+
+    __slots__ = (
+        "name", "trace_id", "span_id", "parent_id", "start_ns", "end_ns",
+        "attributes", "status", "status_message",
+    )
+
+    def __init__(self, name, trace_id, parent_id=None, start_ns=None, attributes=None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.start_ns = start_ns or time.time_ns()
+        self.end_ns = None
+        self.attributes = dict(attributes or {})
+        self.status = "UNSET"
+        self.status_message = None
+
+    @property
+    def traceparent(self):
+        """W3C traceparent 標頭值"""
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def record_error(self, error):
+        """標記為失敗（error 可為例外或錯誤訊息）"""
+        self.status = "ERROR"
+        self.status_message = error if isinstance(error, str) else f"{type(error).__name__}: {error}"
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": (self.end_ns - self.start_ns) / 1e6 if self.end_ns else None,
+            "attributes": self.attributes,
+            "status": self.status,
+            "status_message": self.status_message,
+        }
+
+
+class _NoopSpan:
+    """停用追蹤時回傳的空 span"""
+
+    traceparent = None
+
+    def set_attribute(self, key, value):
+        pass
+
+    def record_error(self, error):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def parse_traceparent(value):
+    """
+    解析 W3C traceparent 標頭
+
+    Returns:
+        (trace_id, parent_span_id)，格式不正確時回傳 None
+    """
+    if not value:
+        return None
+    parts = value.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        int(parts[1], 16)
+        int(parts[2], 16)
+    except ValueError:
+        return None
+    if parts[1] == "0" * 32 or parts[2] == "0" * 16:
+        return None
+    return parts[1], parts[2]
+
+
+class FileSpanExporter:
+    """每個 span 一行 JSON 附加寫入檔案（跨執行緒安全）"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+    def export(self, span):
+        line = json.dumps(span.to_dict(), ensure_ascii=False)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+    def shutdown(self):
+        pass
+
+
+class OtlpHttpExporter:
+    """
+    以 OTLP/HTTP JSON 批次匯出到 collector
+
+    span 先放入有上限的佇列，由背景執行緒分批送出；collector 無法連線時丟棄並記錄警告，
+    不會拖慢翻譯流程。
+    """
+
+    def __init__(self, endpoint=DEFAULT_OTLP_ENDPOINT, service_name=DEFAULT_SERVICE_NAME, timeout=5.0):
+        endpoint = endpoint.rstrip("/")
+        self.url = endpoint if endpoint.endswith("/v1/traces") else f"{endpoint}/v1/traces"
+        self.service_name = service_name
+        self.timeout = timeout
+        self._queue = queue.Queue(maxsize=OTLP_QUEUE_SIZE)
+        self._stopping = threading.Event()
+        self._last_warning = 0.0
+        self._thread = threading.Thread(target=self._run, name="otlp-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, span):
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            pass
+
+    def shutdown(self):
+        self._stopping.set()
+        self._thread.join(timeout=self.timeout + OTLP_FLUSH_INTERVAL)
+
+    def _run(self):
+        while not (self._stopping.is_set() and self._queue.empty()):
+            batch = []
+            deadline = time.monotonic() + OTLP_FLUSH_INTERVAL
+            while len(batch) < OTLP_BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            if batch:
+                self._send(batch)
+
+    def _send(self, spans):
+        body = json.dumps(self._encode(spans)).encode("utf-8")
+        request = urllib.request.Request(
+            self.url, data=body, headers={"Content-Type": "application/json"}, method="POST"
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                response.read()
+        except Exception as e:
+            now = time.monotonic()
+            if now - self._last_warning > 60:
+                self._last_warning = now
+                logger.warning(f"OTLP 匯出失敗，已丟棄 {len(spans)} 個 span: {e}")
+
+    def _encode(self, spans):
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [_otlp_attribute("service.name", self.service_name)]},
+                "scopeSpans": [{
+                    "scope": {"name": "comic-translator"},
+                    "spans": [
+                        {
+                            "traceId": span.trace_id,
+                            "spanId": span.span_id,
+                            "parentSpanId": span.parent_id or "",
+                            "name": span.name,
+                            "kind": 1,
+                            "startTimeUnixNano": str(span.start_ns),
+                            "endTimeUnixNano": str(span.end_ns),
+                            "attributes": [_otlp_attribute(key, value) for key, value in span.attributes.items()],
+                            "status": {
+                                "code": 2 if span.status == "ERROR" else 0,
+                                "message": span.status_message or "",
+                            },
+                        }
+                        for span in spans
+                    ],
+                }],
+            }]
+        }
+
+
+def _otlp_attribute(key, value):
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+
+class Tracer:
+    """建立與匯出 span（未設定匯出器時為空操作）"""
+
+    def __init__(self):
+        self.exporter = None
+
+    @property
+    def enabled(self):
+        return self.exporter is not None
+
+    def configure(self, exporter):
+        """設定匯出器（None 為停用），並關閉先前的匯出器"""
+        previous, self.exporter = self.exporter, exporter
+        if previous is not None:
+            previous.shutdown()
+
+    def _start(self, name, parent, start_ns, attributes):
+        if parent is None:
+            parent = _current_span.get()
+        if isinstance(parent, Span):
+            trace_id, parent_id = parent.trace_id, parent.span_id
+        else:
+            parsed = parse_traceparent(parent) if isinstance(parent, str) else None
+            trace_id, parent_id = parsed if parsed else (secrets.token_hex(16), None)
+        return Span(name, trace_id, parent_id, start_ns, attributes)
+
+    @contextmanager
+    def span(self, name, parent=None, **attributes):
+        """
+        開始一個 span 並設為目前的 span
+
+        Args:
+            name: span 名稱
+            parent: 上層 Span 或 traceparent 字串（預設為目前的 span）
+            attributes: span 屬性
+        """
+        if self.exporter is None:
+            yield _NOOP_SPAN
+            return
+
+        span = self._start(name, parent, None, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_error(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            self._finish(span)
+
+    def record_span(self, name, start_ns, end_ns, parent=None, **attributes):
+        """記錄已發生的區間（例如排隊等待時間，由時間戳回推）"""
+        if self.exporter is None:
+            return
+        span = self._start(name, parent, start_ns, attributes)
+        span.end_ns = end_ns
+        span.status = "OK"
+        self._export(span)
+
+    def _finish(self, span):
+        span.end_ns = time.time_ns()
+        if span.status == "UNSET":
+            span.status = "OK"
+        self._export(span)
+
+    def _export(self, span):
+        try:
+            self.exporter.export(span)
+        except Exception as e:
+            logger.debug(f"匯出 span 失敗: {e}")
+
+    def current_traceparent(self):
+        """目前 span 的 traceparent（沒有進行中的 span 時為 None）"""
+        span = _current_span.get()
+        return span.traceparent if isinstance(span, Span) else None
+
+
+# 全域追蹤器
+tracer = Tracer()
+
+
+def configure_tracing(exporter="none", path=None, endpoint=None, service_name=None):
+    """
+    設定追蹤匯出方式
+
+    Args:
+        exporter: none / file / otlp
+        path: file 匯出的檔案路徑
+        endpoint: OTLP collector 位址
+        service_name: 服務名稱（OTLP resource 屬性）
+    """
+    exporter = (exporter or "none").strip().lower()
+    if exporter == "file":
+        tracer.configure(FileSpanExporter(path or DEFAULT_TRACE_FILE))
+        logger.info(f"追蹤已啟用，寫入: {path or DEFAULT_TRACE_FILE}")
+    elif exporter == "otlp":
+        endpoint = endpoint or DEFAULT_OTLP_ENDPOINT
+        tracer.configure(OtlpHttpExporter(endpoint, service_name or DEFAULT_SERVICE_NAME))
+        logger.info(f"追蹤已啟用，匯出至 OTLP: {endpoint}")
+    elif exporter == "none":
+        tracer.configure(None)
+    else:
+        raise ValueError(f"未知的追蹤匯出方式: {exporter}（可用: none、file、otlp）")
+
+
+def configure_tracing_from_env(service_name=None):
+    """
+    依環境變數設定追蹤
+
+    TRACING_EXPORTER / TRACING_FILE / OTEL_EXPORTER_OTLP_ENDPOINT / OTEL_SERVICE_NAME
+    """
+    try:
+        configure_tracing(
+            exporter=os.getenv("TRACING_EXPORTER", "none"),
+            path=os.getenv("TRACING_FILE"),
+            endpoint=os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT"),
+            service_name=os.getenv("OTEL_SERVICE_NAME") or service_name
+        )
+    except ValueError as e:
+        logger.warning(f"追蹤設定無效，停用追蹤: {e}")
+
+
+def span(name, parent=None, **attributes):
+    """以全域追蹤器開始 span"""
+    return tracer.span(name, parent, **attributes)
+
+
+def current_traceparent():
+    return tracer.current_traceparent()
+
+
+def bind_context(func):
+    """讓 func 在提交到其他執行緒時沿用目前的追蹤上下文（每次呼叫使用獨立副本，可並行執行）"""
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.copy().run(func, *args, **kwargs)
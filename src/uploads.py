@@ -0,0 +1,85 @@
+"""
+上傳檔案的串流儲存
+
+以固定大小的區塊把上傳內容寫到磁碟，邊寫邊檢查大小上限，
+每個請求佔用的記憶體只有一個區塊，而不是整個檔案。
+"""
+import os
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024  # 1MB
+
+# 常見圖片格式的檔頭（magic bytes）
+_IMAGE_SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"\xff\xd8\xff", "jpeg"),
+)
+
+
+class UploadTooLarge(ValueError):
+    """上傳檔案超過大小上限"""
+
+    def __init__(self, max_bytes):
+        super().__init__(f"檔案過大，最大限制: {max_bytes / 1024 / 1024:.1f}MB")
+        self.max_bytes = max_bytes
+
+
+class InvalidUpload(ValueError):
+    """上傳內容不是支援的圖片格式"""
+
+
+def sniff_image_type(head):
+    """
+    依檔頭判斷圖片格式
+
+    Returns:
+        "png" / "jpeg" / "webp"，無法辨識時回傳 None
+    """
+    for signature, kind in _IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return kind
+    if len(head) >= 12 and head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
+def save_stream(stream, dest_path, max_bytes, chunk_size=DEFAULT_CHUNK_SIZE, validate=None):
+    """
+    以區塊方式將串流寫入檔案
+
+    Args:
+        stream: 具有 read(size) 的檔案物件
+        dest_path: 目的檔案路徑
+        max_bytes: 大小上限（位元組）
+        chunk_size: 區塊大小
+        validate: 收到第一個區塊時呼叫的檢查函式 validate(head)，可拋出例外提早中止
+
+    Returns:
+        寫入的位元組數
+
+    Raises:
+        UploadTooLarge: 超過大小上限（已寫入的部分檔案會被刪除）
+    """
+    written = 0
+    try:
+        with open(dest_path, "wb") as f:
+            while True:
+                chunk = stream.read(chunk_size)
+                if not chunk:
+                    break
+                if written == 0 and validate is not None:
+                    validate(chunk)
+                written += len(chunk)
+                if written > max_bytes:
+                    raise UploadTooLarge(max_bytes)
+                f.write(chunk)
+    except BaseException:
+        if os.path.exists(dest_path):
+            os.remove(dest_path)
+        raise
+    return written
+
+
+def require_image(head):
+    """save_stream 用的檢查函式：檔頭必須是支援的圖片格式"""
+    if sniff_image_type(head) is None:
+        raise InvalidUpload("檔案內容不是有效的 PNG、JPEG 或 WebP 圖片")
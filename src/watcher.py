@@ -0,0 +1,179 @@
+"""
+監看資料夾（hot folder）：新頁面寫入完成後立即通知
+
+- 安裝 watchdog 時使用系統的檔案通知（Linux inotify、macOS FSEvents、Windows ReadDirectoryChangesW），
+  不需反覆列出目錄
+- 未安裝時退回定期輪詢（每次掃描一次目錄，只比對大小與 mtime）
+
+掃描器或網路磁碟可能分多次寫入同一個檔案，因此收到通知後要等檔案「穩定」
+（大小與 mtime 在 settle 秒內都沒有變化）才視為寫入完成。
+"""
+import logging
+import os
+import threading
+import time
+
+from src.archive import is_image_name, natural_sort_key
+
+DEFAULT_SETTLE_SECONDS = 2.0
+DEFAULT_POLL_INTERVAL = 2.0
+# 檢查待定檔案是否已穩定的間隔
+_CHECK_INTERVAL = 0.5
+# 代表內容可能有變化的 watchdog 事件
+_WRITE_EVENTS = ("created", "modified", "moved", "closed")
+
+logger = logging.getLogger(__name__)
+
+
+def _stat_signature(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+class FolderWatcher:
+    """
+    監看資料夾中新增或修改的圖片（不含子資料夾）
+
+    Args:
+        path: 監看的資料夾
+        on_ready: 檔案寫入完成時的回呼 on_ready(檔名)，在監看執行緒中呼叫
+        settle_seconds: 檔案需保持不變的秒數
+        poll_interval: 未安裝 watchdog 時的輪詢間隔
+        include_existing: 啟動時是否將資料夾中既有的圖片也視為新檔案
+    """
+
+    def __init__(self, path, on_ready, settle_seconds=DEFAULT_SETTLE_SECONDS,
+                 poll_interval=DEFAULT_POLL_INTERVAL, include_existing=True):
+        self.path = os.path.abspath(path)
+        self.on_ready = on_ready
+        self.settle_seconds = settle_seconds
+        self.poll_interval = poll_interval
+        self.include_existing = include_existing
+        self.mode = None
+        self._lock = threading.Lock()
+        # 檔名 -> (最後一次看到變化的時間, 大小與 mtime)
+        self._pending = {}
+        # 各檔案最後看到的大小與 mtime（輪詢模式比對用）
+        self._known = {}
+        self._stopping = threading.Event()
+        self._threads = []
+        self._observer = None
+
+    def _accepts(self, name):
+        # 略過隱藏檔與暫存檔（例如原子寫入時的 .xxx.partial）
+        return is_image_name(name) and not name.startswith(".")
+
+    def notify(self, path):
+        """登記可能有變化的檔案（檔案通知或輪詢時呼叫）"""
+        if os.path.dirname(os.path.abspath(path)) != self.path:
+            return
+        name = os.path.basename(path)
+        if not self._accepts(name):
+            return
+        with self._lock:
+            self._pending[name] = (time.monotonic(), _stat_signature(path))
+
+    def start(self):
+        try:
+            self._start_observer()
+            self.mode = "events"
+        except ImportError:
+            logger.info("未安裝 watchdog，改用定期輪詢監看資料夾（pip install watchdog 可改用檔案通知）")
+            self.mode = "polling"
+
+        with os.scandir(self.path) as it:
+            for entry in it:
+                if not entry.is_file() or not self._accepts(entry.name):
+                    continue
+                stat = entry.stat()
+                self._known[entry.name] = (stat.st_size, stat.st_mtime_ns)
+                if self.include_existing:
+                    self.notify(entry.path)
+
+        self._spawn(self._settle_loop, "watch-settle")
+        if self.mode == "polling":
+            self._spawn(self._poll_loop, "watch-poll")
+        logger.info(f"開始監看資料夾: {self.path}（{self.mode}）")
+        return self
+
+    def _start_observer(self):
+        from watchdog.events import FileSystemEventHandler
+        from watchdog.observers import Observer
+
+        watcher = self
+
+        class Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                # 只看寫入類事件（讀取檔案本身也會產生 opened / closed_no_write）
+                if event.is_directory or event.event_type not in _WRITE_EVENTS:
+                    return
+                # 移入的檔案以目的路徑為準（例如先寫暫存檔再改名）
+                watcher.notify(getattr(event, "dest_path", None) or event.src_path)
+
+        self._observer = Observer()
+        self._observer.schedule(Handler(), self.path, recursive=False)
+        self._observer.start()
+
+    def _spawn(self, target, name):
+        thread = threading.Thread(target=target, name=name, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def _poll_loop(self):
+        while not self._stopping.wait(self.poll_interval):
+            seen = {}
+            try:
+                with os.scandir(self.path) as it:
+                    for entry in it:
+                        if entry.is_file() and self._accepts(entry.name):
+                            stat = entry.stat()
+                            seen[entry.name] = (stat.st_size, stat.st_mtime_ns)
+            except OSError as e:
+                logger.warning(f"無法列出監看資料夾: {e}")
+                continue
+            with self._lock:
+                changed = [name for name, signature in seen.items() if self._known.get(name) != signature]
+                self._known = seen
+            for name in changed:
+                self.notify(os.path.join(self.path, name))
+
+    def _settle_loop(self):
+        while not self._stopping.wait(_CHECK_INTERVAL):
+            now = time.monotonic()
+            ready = []
+            with self._lock:
+                for name, (changed_at, signature) in list(self._pending.items()):
+                    current = _stat_signature(os.path.join(self.path, name))
+                    if current is None:
+                        # 檔案已被刪除或移走
+                        del self._pending[name]
+                    elif current != signature:
+                        self._pending[name] = (now, current)
+                    elif now - changed_at >= self.settle_seconds:
+                        del self._pending[name]
+                        # 記下完成時的狀態，輪詢時不會再把同一次寫入當成新變化
+                        self._known[name] = current
+                        ready.append(name)
+            for name in sorted(ready, key=natural_sort_key):
+                try:
+                    self.on_ready(name)
+                except Exception as e:
+                    logger.error(f"處理新檔案失敗 ({name}): {e}")
+
+    def stop(self):
+        self._stopping.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+        for thread in self._threads:
+            thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
@@ -0,0 +1,58 @@
+"""CBZ 輸出中斷時的保留行為"""
+import zipfile
+
+from src.archive import ArchiveOutput, Page
+
+
+def _page(index):
+    return Page(index, f"p{index}.png", lambda: b"")
+
+
+def _names(path):
+    with zipfile.ZipFile(path) as zf:
+        return {info.filename: zf.read(info) for info in zf.infolist()}
+
+
+def _full_archive(path):
+    output = ArchiveOutput(path)
+    for index in range(4):
+        output.write(_page(index), b"old%d" % index)
+    output.close()
+
+
+def test_interrupted_rerun_keeps_unprocessed_pages(tmp_path):
+    path = str(tmp_path / "book.cbz")
+    _full_archive(path)
+
+    output = ArchiveOutput(path)
+    output.write(_page(0), b"new0")
+    output.keep(_page(1))
+    output.close(completed=False)
+
+    assert _names(path) == {"p0.jpg": b"new0", "p1.jpg": b"old1", "p2.jpg": b"old2", "p3.jpg": b"old3"}
+    assert not (tmp_path / "book.cbz.partial").exists()
+
+
+def test_interrupted_before_any_page_leaves_archive_untouched(tmp_path):
+    path = str(tmp_path / "book.cbz")
+    _full_archive(path)
+
+    ArchiveOutput(path).close(completed=False)
+
+    assert len(_names(path)) == 4
+    assert not (tmp_path / "book.cbz.partial").exists()
+
+
+def test_completed_run_drops_failed_pages(tmp_path):
+    path = str(tmp_path / "book.cbz")
+    _full_archive(path)
+
+    output = ArchiveOutput(path)
+    for index in range(4):
+        if index == 2:
+            output.skip(_page(index))
+        else:
+            output.keep(_page(index))
+    output.close()
+
+    assert set(_names(path)) == {"p0.jpg", "p1.jpg", "p3.jpg"}
@@ -0,0 +1,101 @@
+"""批次日誌續跑判斷的回歸測試"""
+import io
+import os
+
+from PIL import Image
+
+from src.archive import FolderOutput, folder_page
+from src.journal import STATUS_DONE, STATUS_FAILED, BatchJournal, hash_bytes
+
+PROMPT_HASH = "prompt-v1"
+
+
+def _image_bytes(color):
+    buffer = io.BytesIO()
+    Image.new("RGB", (8, 8), color).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _write_input(directory, data, mtime):
+    path = os.path.join(directory, "p1.png")
+    with open(path, "wb") as f:
+        f.write(data)
+    os.utime(path, (mtime, mtime))
+    return folder_page(directory, "p1.png", 0)
+
+
+def _translate(journal, output, page):
+    """完整翻譯一頁：start、寫出輸出、finish"""
+    journal.start(page, PROMPT_HASH)
+    output_path = output.write(page, _image_bytes("blue"))
+    journal.finish(page, STATUS_DONE, hash_bytes(page.read()), output_name=output_path)
+
+
+def _setup(tmp_path):
+    input_dir = tmp_path / "in"
+    output_dir = tmp_path / "out"
+    input_dir.mkdir()
+    page = _write_input(str(input_dir), _image_bytes("white"), 1_000_000)
+    output = FolderOutput(str(output_dir))
+    with BatchJournal.for_output(str(output_dir)) as journal:
+        _translate(journal, output, page)
+    return str(input_dir), str(output_dir)
+
+
+def test_unchanged_page_is_skipped(tmp_path):
+    input_dir, output_dir = _setup(tmp_path)
+    page = folder_page(input_dir, "p1.png", 0)
+    with BatchJournal.for_output(output_dir) as journal:
+        assert journal.should_skip(page, FolderOutput(output_dir), PROMPT_HASH)
+
+
+def test_changed_input_crash_while_running_is_not_adopted(tmp_path):
+    input_dir, output_dir = _setup(tmp_path)
+    page = _write_input(input_dir, _image_bytes("black"), 2_000_000)
+
+    # 開始重新翻譯後中斷（沒有 finish）
+    with BatchJournal.for_output(output_dir) as journal:
+        assert not journal.should_skip(page, FolderOutput(output_dir), PROMPT_HASH)
+        journal.start(page, PROMPT_HASH)
+
+    with BatchJournal.for_output(output_dir) as journal:
+        assert not journal.should_skip(page, FolderOutput(output_dir), PROMPT_HASH)
+
+
+def test_changed_input_failed_then_crash_is_not_adopted(tmp_path):
+    input_dir, output_dir = _setup(tmp_path)
+    page = _write_input(input_dir, _image_bytes("black"), 2_000_000)
+
+    with BatchJournal.for_output(output_dir) as journal:
+        journal.start(page, PROMPT_HASH)
+        journal.finish(page, STATUS_FAILED, hash_bytes(page.read()), error="boom")
+    with BatchJournal.for_output(output_dir) as journal:
+        journal.start(page, PROMPT_HASH)
+
+    with BatchJournal.for_output(output_dir) as journal:
+        assert not journal.should_skip(page, FolderOutput(output_dir), PROMPT_HASH)
+
+
+def test_changed_prompt_crash_while_running_is_not_adopted(tmp_path):
+    input_dir, output_dir = _setup(tmp_path)
+    page = folder_page(input_dir, "p1.png", 0)
+
+    with BatchJournal.for_output(output_dir) as journal:
+        journal.start(page, "prompt-v2")
+
+    with BatchJournal.for_output(output_dir) as journal:
+        assert not journal.should_skip(page, FolderOutput(output_dir), "prompt-v2")
+
+
+def test_unchanged_input_crash_after_write_is_adopted(tmp_path):
+    input_dir, output_dir = _setup(tmp_path)
+    page = folder_page(input_dir, "p1.png", 0)
+
+    # 同一份輸入重新處理，寫出輸出後來不及 finish 就中斷
+    with BatchJournal.for_output(output_dir) as journal:
+        journal.start(page, PROMPT_HASH)
+        FolderOutput(output_dir).write(page, _image_bytes("blue"))
+
+    with BatchJournal.for_output(output_dir) as journal:
+        assert journal.should_skip(page, FolderOutput(output_dir), PROMPT_HASH)
+        assert journal.get("p1.png").status == STATUS_DONE
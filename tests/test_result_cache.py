@@ -0,0 +1,21 @@
+"""翻譯結果快取的容量與統計"""
+from src.result_cache import ResultCache
+
+KEY = "ab" * 32
+
+
+def test_overwrite_counts_size_difference_only(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=10_000)
+    cache.put(KEY, b"x" * 100)
+    cache.put(KEY, b"x" * 150)
+
+    assert cache.stats()["size_bytes"] == 150
+
+
+def test_unrecorded_lookups_are_counted_once(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    for model in ("a", "b", "c"):
+        assert cache.get(ResultCache.make_key(b"page", "prompt", model), record=False) is None
+    cache.record_lookup(False)
+
+    assert cache.stats()["misses"] == 1